@@ -1,6 +1,6 @@
 import os
 import streamlit as st
-from openai import OpenAI
+import llm_gateway
 import json
 from datetime import datetime
 
@@ -13,8 +13,6 @@ if not api_key:
     st.error("⚠️ Please set OPENAI_API_KEY environment variable or add it to .streamlit/secrets.toml")
     st.stop()
 
-client = OpenAI(api_key=api_key)
-
 st.set_page_config(page_title="📋 Account Summary", layout="wide")
 
 st.title("📋 Account 360° Summary")
@@ -291,8 +289,9 @@ Generate a {summary_format} that helps the account team understand this customer
 
     with st.spinner("📝 Generating comprehensive account summary..."):
         try:
-            response = client.chat.completions.create(
+            response = llm_gateway.chat(
                 model="gpt-4",
+                api_key=api_key,
                 messages=[
                     {
                         "role": "system", 
@@ -306,7 +305,7 @@ Generate a {summary_format} that helps the account team understand this customer
                 temperature=0.0
             )
             
-            output = response.choices[0].message.content
+            output = response.content
             
             # Store in session state
             st.session_state.account_data = account_data
@@ -422,8 +421,9 @@ Provide a helpful, data-driven answer.
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    chat_response = client.chat.completions.create(
+                    chat_response = llm_gateway.chat(
                         model="gpt-4",
+                        api_key=api_key,
                         messages=[
                             {"role": "system", "content": "You are a helpful account management assistant. You only use provided data and never hallucinate."},
                             {"role": "user", "content": context}
@@ -431,7 +431,7 @@ Provide a helpful, data-driven answer.
                         temperature=0.0
                     )
                     
-                    assistant_message = chat_response.choices[0].message.content
+                    assistant_message = chat_response.content
                     st.markdown(assistant_message)
                     st.session_state.messages.append({"role": "assistant", "content": assistant_message})
                     
@@ -0,0 +1,187 @@
+"""
+Adaptive quiz planning for the quiz tab.
+
+A StudentModel holds, for every completed topic, the student's mastery (the
+same moving average database.save_quiz_result keeps in topic_mastery), when
+the topic was last practised, and a precomputed base weight and review
+interval. Planning a quiz only adds the time-dependent review term to each
+base weight and samples from the result, so it is pure in-memory work
+(microseconds for a grade's worth of topics). After a quiz is submitted,
+update() refreshes just the answered topics.
+
+Topics are weighted towards weak areas and towards topics whose spaced
+review interval has run out; stronger topics get longer intervals. Each
+picked topic gets a difficulty from its mastery.
+"""
+
+import heapq
+import random
+from collections import namedtuple
+from datetime import datetime
+
+# Same defaults as database.MASTERY_ALPHA / MASTERY_PRIOR; load_student_model passes the real ones
+DEFAULT_ALPHA = 0.3
+DEFAULT_PRIOR = 0.5
+
+WEAKNESS_WEIGHT = 1.0        # weight per unit of (1 - mastery)
+REVIEW_WEIGHT = 0.6          # weight per review interval elapsed
+MAX_OVERDUE = 3.0            # intervals; caps the review term for long-forgotten topics
+MIN_WEIGHT = 0.05            # every completed topic stays pickable
+REVIEW_BASE_DAYS = 1.0       # review interval at mastery 0 ...
+REVIEW_MAX_DAYS = 14.0       # ... growing linearly to this at mastery 1
+WEAK_MASTERY = 0.6
+
+MAX_TOPICS = 3
+
+# Difficulty by mastery: below 0.45 Easy, below 0.75 Medium, otherwise Hard
+DIFFICULTY_BANDS = ((0.45, "Easy"), (0.75, "Medium"), (float("inf"), "Hard"))
+
+TopicPick = namedtuple('TopicPick', ['topic', 'difficulty', 'count', 'mastery', 'reason'])
+
+
+def difficulty_for(mastery):
+    """Quiz difficulty for a topic at this mastery"""
+    for upper, difficulty in DIFFICULTY_BANDS:
+        if mastery < upper:
+            return difficulty
+
+
+class StudentModel:
+    """Per-student topic weights for one grade, kept in memory between quizzes"""
+
+    def __init__(self, grade, alpha=DEFAULT_ALPHA, prior=DEFAULT_PRIOR):
+        self.grade = grade
+        self.alpha = alpha
+        self.prior = prior
+        # subject -> topic -> [mastery, attempts, last_seen (epoch seconds or None), base, interval_s]
+        self.topics = {}
+
+    def set_topic(self, subject, topic, mastery=None, attempts=0, last_seen=None):
+        """Add or replace a topic; last_seen is a datetime or None"""
+        mastery = self.prior if mastery is None else mastery
+        state = [mastery, attempts, last_seen.timestamp() if last_seen else None, 0.0, 0.0]
+        self._refresh(state)
+        self.topics.setdefault(subject, {})[topic] = state
+
+    @staticmethod
+    def _refresh(state):
+        # The parts of the weight that only change when the topic is answered
+        mastery = state[0]
+        state[3] = MIN_WEIGHT + WEAKNESS_WEIGHT * (1 - mastery)
+        state[4] = (REVIEW_BASE_DAYS + (REVIEW_MAX_DAYS - REVIEW_BASE_DAYS) * mastery) * 86400
+
+    def weights(self, subject, now=None):
+        """{topic: weight} for a subject at time now"""
+        now_ts = (now or datetime.now()).timestamp()
+        weights = {}
+        for topic, (mastery, attempts, last_seen, base, interval) in self.topics.get(subject, {}).items():
+            overdue = MAX_OVERDUE if last_seen is None else min((now_ts - last_seen) / interval, MAX_OVERDUE)
+            weights[topic] = base + REVIEW_WEIGHT * overdue
+        return weights
+
+    def plan(self, subject, num_questions, max_topics=MAX_TOPICS, now=None, rng=random):
+        """
+        Pick topics, difficulties and question counts for an adaptive quiz.
+
+        Topics are sampled without replacement in proportion to their weight
+        (Efraimidis-Spirakis keys), and questions are split across the picked
+        topics in proportion to weight, at least one each.
+
+        Returns:
+            List of TopicPick, highest weight first (empty if nothing is completed)
+        """
+        weights = self.weights(subject, now)
+        k = min(max_topics, len(weights), num_questions)
+        if k == 0:
+            return []
+
+        picked = heapq.nlargest(k, weights, key=lambda t: rng.random() ** (1.0 / weights[t]))
+        picked.sort(key=lambda t: -weights[t])
+
+        # Largest remainder split of the questions left after one per topic
+        total = sum(weights[t] for t in picked)
+        extra = num_questions - k
+        shares = {t: extra * weights[t] / total for t in picked}
+        counts = {t: 1 + int(shares[t]) for t in picked}
+        for t in sorted(picked, key=lambda t: shares[t] - int(shares[t]), reverse=True)[:num_questions - sum(counts.values())]:
+            counts[t] += 1
+
+        now_ts = (now or datetime.now()).timestamp()
+        plan = []
+        for topic in picked:
+            mastery, attempts, last_seen, _, interval = self.topics[subject][topic]
+            if attempts == 0 and last_seen is None:
+                reason = "new"
+            elif mastery < WEAK_MASTERY:
+                reason = "weak"
+            elif last_seen is None or now_ts - last_seen >= interval:
+                reason = "review due"
+            else:
+                reason = "practice"
+            plan.append(TopicPick(topic, difficulty_for(mastery), counts[topic], mastery, reason))
+        return plan
+
+    def update(self, subject, answers, now=None):
+        """
+        Fold submitted answers into the model, in question order - the same
+        moving average save_quiz_result applies to topic_mastery.
+
+        Args:
+            answers: Dicts with topic and is_correct
+        """
+        now_ts = (now or datetime.now()).timestamp()
+        topics = self.topics.setdefault(subject, {})
+        for answer in answers:
+            state = topics.get(answer['topic'])
+            if state is None:
+                self.set_topic(subject, answer['topic'])
+                state = topics[answer['topic']]
+            state[0] += self.alpha * ((1.0 if answer['is_correct'] else 0.0) - state[0])
+            state[1] += 1
+            state[2] = now_ts
+            self._refresh(state)
+
+
+def buckets(plan):
+    """A plan as {difficulty: {topic: count}}, the shape quiz_bank.stream_buckets takes"""
+    result = {}
+    for pick in plan:
+        result.setdefault(pick.difficulty, {})[pick.topic] = pick.count
+    return result
+
+
+def build_model(grade, completed, syllabus_index, mastery=None, topic_scores=None,
+                alpha=DEFAULT_ALPHA, prior=DEFAULT_PRIOR):
+    """
+    StudentModel over the completed topics of a grade.
+
+    Args:
+        mastery: {topic: topic_mastery row} from database.get_topic_mastery
+        topic_scores: {topic: quiz %} from database.get_topic_quiz_scores, used
+                      as the starting mastery for topics with no answer rows yet
+    """
+    mastery = mastery or {}
+    topic_scores = topic_scores or {}
+    model = StudentModel(grade, alpha, prior)
+    for subject, topics in syllabus_index.raw.get(grade, {}).items():
+        for topic in syllabus_index.completed_in(grade, subject, completed):
+            row = mastery.get(topic)
+            if row and row['subject'] == subject:
+                model.set_topic(subject, topic, row['mastery'], row['attempts'], row['last_answered_at'])
+            elif topic in topic_scores:
+                model.set_topic(subject, topic, topic_scores[topic] / 100.0)
+            else:
+                model.set_topic(subject, topic)
+    return model
+
+
+def load_student_model(student_id, grade, completed, syllabus_index):
+    """build_model with the student's topic_mastery rows and recent quiz_results, in two queries"""
+    import database as db
+
+    return build_model(
+        grade, completed, syllabus_index,
+        mastery=db.get_topic_mastery([student_id]).get(student_id, {}),
+        topic_scores=db.get_topic_quiz_scores([student_id], syllabus_index=syllabus_index).get(student_id, {}),
+        alpha=db.MASTERY_ALPHA, prior=db.MASTERY_PRIOR
+    )
@@ -1,6 +1,9 @@
 import os
 import streamlit as st
-from openai import OpenAI
+import llm_gateway
+import churn_scoring
+import churn_batch
+import scoring_bands
 import json
 from datetime import datetime
 from audio_recorder_streamlit import audio_recorder
@@ -12,7 +15,8 @@ if not api_key:
     st.error("⚠️ Please set OPENAI_API_KEY environment variable")
     st.stop()
 
-client = OpenAI(api_key=api_key)
+# Shared pooled client; chat calls go through llm_gateway.chat (cached)
+client = llm_gateway.get_client(api_key)
 
 st.set_page_config(page_title="📊 Account Churn Prediction", layout="wide")
 
@@ -43,8 +47,8 @@ with st.sidebar:
     st.markdown("""
     1. Enter real account metrics
     2. System validates data quality
-    3. AI analyzes patterns
-    4. Get prediction with confidence & reasoning
+    3. Weighted health formula scores the account
+    4. Get risk tier, health score & numeric drivers
     5. Ask follow-up questions via text or voice
     """)
     
@@ -90,6 +94,12 @@ additional_context = st.text_area(
     placeholder="e.g., 'User contacted support about pricing 3 times', 'Downgraded from Pro to Basic last month'"
 )
 
+phrase_recommendations = st.checkbox(
+    "✍️ Add GPT-4 recommendations",
+    value=False,
+    help="The score, tier and drivers are computed locally; GPT-4 is only used to phrase next steps"
+)
+
 if st.button("🔍 Predict Churn Risk", type="primary"):
     # Create structured data object
     account_data = {
@@ -116,142 +126,15 @@ if st.button("🔍 Predict Churn Risk", type="primary"):
     # Data validation
     data_quality_issues = []
 
-    context_prompt_churn_prediction = """
-You are an expert Sales Operations AI that evaluates customer account health and churn risk.
-
-Your tasks:
-1. Calculate the final health_score (0–100) using the defined weighted scoring method.
-2. Determine the risk_tier ("Low", "Medium", or "High") using the predefined thresholds.
-3. Identify exactly 3 numeric drivers explaining why the score and tier were assigned.
-4. Provide 1–3 short, actionable recommendations to reduce churn or strengthen the account.
-
-**REQUIRED OUTPUT FORMAT:**
-Provide your analysis in the following structure:
-
-1. **Churn Risk Level**: [LOW / MEDIUM / HIGH / CRITICAL]
-2. **Confidence Score**: [0-100]% (0 = lowest confidence, 100 = highest confidence)
-3. **Drivers**: [short numeric driver 1, short numeric driver 2, short numeric driver 3]
-4. **Recommendations**: [actionable recommendation 1, actionable recommendation 2, optional recommendation 3]
-
-Remember: Your analysis must be traceable to the actual data provided. No assumptions, no hallucinations.
-
-
-======================================================
-NUMERIC RULES YOU MUST FOLLOW
-======================================================
-
-Inputs are numeric fields inside an "account_metrics" JSON object, for example:
-- usage_30d_change (float, e.g. -0.18 for -18%)
-- active_users (int)
-- licensed_seats (int)
-- days_since_last_meeting (int)
-- meetings_last_30d (int)
-- emails_last_30d (int)
-- open_critical_tickets (int)
-- open_tickets_total (int)
-- csat_score_current (float, 1–5)
-- nps_current (int, -100 to 100)
-- renewal_days_out (int)
-- invoices_overdue_count (int)
-- spend_trend_yoy (float, e.g. 0.12 for +12%)
-- last_exec_sponsor_touch_days (int)
-- key_contacts_changed_6m (int)
-- feature_adoption_score (float, 0–1)
-Some fields may be missing or null; ignore missing ones rather than guessing.
-
-1) USAGE DECLINE (contributes up to 25 points to health_score)
-- usage_30d_change < -0.20  → very high churn risk → low contribution
-- -0.20 ≤ change < -0.05    → high churn risk
-- -0.05 ≤ change ≤ +0.05    → neutral
-- > +0.05                   → healthy
-
-2) SEAT UTILIZATION (up to 15 points)
-Let utilization = active_users / max(licensed_seats, 1)
-- utilization < 0.50        → high churn risk
-- 0.50–0.70                 → medium
-- 0.70–0.90                 → healthy
-- > 0.90                    → very healthy / expansion-leaning
-
-3) ENGAGEMENT (up to 20 points)
-Use days_since_last_meeting, meetings_last_30d, emails_last_30d:
-- days_since_last_meeting > 30  → high risk
-- 15–30                         → medium
-- < 15                          → healthy
-- meetings_last_30d = 0         → high risk
-- very low emails_last_30d      → low engagement
-
-4) SUPPORT & SENTIMENT (up to 20 points)
-Use open_critical_tickets, open_tickets_total, csat_score_current, nps_current:
-- open_critical_tickets ≥ 2     → very high risk
-- open_critical_tickets = 1     → high risk
-- open_critical_tickets = 0     → healthy
-- csat_score_current < 3.5      → high risk
-- nps_current < 0               → high risk
-- higher CSAT / NPS → healthier
-
-5) RENEWAL TIMING (up to 10 points)
-Use renewal_days_out:
-- < 30 days                     → critical churn window
-- 30–90 days                    → high churn risk window
-- > 180 days                    → safe from immediate churn
-
-6) BILLING (up to 5 points)
-Use invoices_overdue_count:
-- ≥ 2 overdue invoices          → strong churn signal
-- 1 overdue invoice             → moderate risk
-- 0 overdue invoices            → healthy
-
-7) RELATIONSHIP (up to 5 points)
-Use last_exec_sponsor_touch_days, key_contacts_changed_6m:
-- last_exec_sponsor_touch_days > 60 → major relationship risk
-- key_contacts_changed_6m ≥ 2       → high organizational instability
-- healthy sponsor engagement and low contact churn → better health
-
-======================================================
-SCORING LOGIC
-======================================================
-
-1) For each category above, derive a sub-score between 0 and 100 based on the rules.
-2) Combine them into a single health_score using these weights:
-   - Usage decline     = 25%
-   - Seat utilization  = 15%
-   - Engagement        = 20%
-   - Support & sentiment = 20%
-   - Renewal timing    = 10%
-   - Billing           = 5%
-   - Relationship      = 5%
-
-   health_score = weighted sum of sub-scores, then clamp to 0–100 and round to nearest integer.
-
-3) Map health_score to risk_tier:
-   - health_score ≥ 75 → "Low"
-   - 50 ≤ health_score < 75 → "Medium"
-   - health_score < 50 → "High"
-
-======================================================
-DRIVERS & RECOMMENDATIONS
-======================================================
-
-- drivers: list of exactly 3 short strings that explicitly reference numeric signals
-  Examples:
-  - "Usage dropped 22% in the last 30 days."
-  - "2 critical support tickets are currently open."
-  - "No meetings in the last 35 days and renewal is in 25 days."
-
-- recommendations: 1–3 short, action-focused strings
-  Examples:
-  - "Escalate critical tickets and ensure resolution this week."
-  - "Schedule a QBR with the executive sponsor within 14 days."
-  - "Provide training to drive adoption of key features."
-
-======================================================
-CONSTRAINTS
-======================================================
+    # Scoring is deterministic (churn_scoring); the LLM only phrases recommendations when asked
+    context_prompt_recommendations = """
+You are an expert Sales Operations AI. An account has already been scored by a fixed formula;
+you are given its metrics, health_score (0-100), risk_tier and the 3 numeric drivers behind it.
 
-- Use ONLY the metrics provided in the input JSON.
-- If a metric is missing or null, ignore it instead of making up a value.
-- Do NOT invent any numbers or events.
-- Always return ONLY the JSON object described above, with valid JSON syntax.
+Write 1-3 short, actionable recommendations to reduce churn or strengthen the account.
+- Base every recommendation on the drivers and metrics provided.
+- Do NOT change the score or tier, and do NOT invent numbers or events.
+- Return only the recommendations, one per line, each starting with "- ".
 """
     
     # Check for data inconsistencies
@@ -277,58 +160,72 @@ CONSTRAINTS
             st.error(issue)
         st.warning("Please correct the data before proceeding. This prevents hallucinated predictions.")
     else:
-        # Create a strict prompt that prevents hallucination
-        prompt = f"""
-Evaluate the following customer account using the numeric rules and scoring logic provided in the system prompt.
-
-Account Metrics (JSON):
-{json.dumps(account_data, indent=2)}
-
+        # Local scoring: the weighted formula runs in microseconds, no LLM round trip
+        metrics = scoring_bands.flatten_metrics(account_data)
+        metrics["utilization"] = utilization / 100  # slider is a percentage
+        score = churn_scoring.score_account(metrics)
+        
+        recommendations = None
+        if phrase_recommendations:
+            with st.spinner("✍️ Writing recommendations..."):
+                try:
+                    response = llm_gateway.chat(
+                        model="gpt-4",
+                        api_key=api_key,
+                        messages=[
+                            {"role": "system", "content": context_prompt_recommendations},
+                            {"role": "user", "content": json.dumps({"account_data": account_data, **score}, indent=2)}
+                        ],
+                        temperature=0.1
+                    )
+                    recommendations = response.content
+                except Exception as e:
+                    st.warning(f"⚠️ Recommendations unavailable: {str(e)}")
+        
+        drivers_md = "\n".join(f"   - {d}" for d in score["drivers"]) or "   - No metrics provided"
+        output = f"""1. **Churn Risk Level**: {score['risk_tier'].upper()}
+2. **Health Score**: {score['health_score']}/100 (data coverage {score['coverage']:.0%})
+3. **Drivers**:
+{drivers_md}
 """
-
-        with st.spinner("🔄 Analyzing account data..."):
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {
-                            "role": "system", 
-                           ## "content": "You are a data-driven churn prediction analyst.You only make predictions based on provided data, never hallucinate or assume information not given. You avoid bias by focusing solely on behavioral metrics."
-                           "content": context_prompt_churn_prediction
-                        },
-                        {
-                            "role": "user", 
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.1
-                )
-                
-                output = response.choices[0].message.content
-                
-                # Store in session state for chatbot context
-                st.session_state.account_data = account_data
-                st.session_state.prediction_result = output
-                st.session_state.messages = []  # Reset chat history for new prediction
-                
-                # Display results
-                st.success("✅ Analysis Complete")
-                
-                # Show the input data for transparency
-                with st.expander("📊 Input Data Used for Prediction"):
-                    st.json(account_data)
-                
-                # Show the prediction
-                st.markdown("---")
-                st.markdown("### 🎯 Churn Prediction Results")
-                st.markdown(output)
-                
-                # Timestamp for audit trail
-                st.markdown("---")
-                st.caption(f"Analysis generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # Download report option
-                report = f"""ACCOUNT CHURN PREDICTION REPORT
+        if recommendations:
+            output += f"4. **Recommendations**:\n{recommendations}\n"
+        
+        # Store in session state for chatbot context
+        st.session_state.account_data = account_data
+        st.session_state.prediction_result = output
+        st.session_state.messages = []  # Reset chat history for new prediction
+        
+        # Display results
+        st.success("✅ Analysis Complete")
+        
+        # Show the input data for transparency
+        with st.expander("📊 Input Data Used for Prediction"):
+            st.json(account_data)
+        
+        # Show the prediction
+        st.markdown("---")
+        st.markdown("### 🎯 Churn Prediction Results")
+        col_s1, col_s2, col_s3 = st.columns(3)
+        col_s1.metric("Health Score", f"{score['health_score']}/100")
+        col_s2.metric("Risk Tier", score['risk_tier'])
+        col_s3.metric("Data Coverage", f"{score['coverage']:.0%}")
+        st.markdown(output)
+        
+        with st.expander("📐 Category Sub-scores"):
+            for key, label, weight in churn_scoring.CATEGORIES:
+                sub_score = score['category_scores'][key]
+                if sub_score is None:
+                    st.caption(f"{label} ({weight}%): no data")
+                else:
+                    st.progress(sub_score / 100, text=f"{label} ({weight}%): {sub_score:.0f}/100")
+        
+        # Timestamp for audit trail
+        st.markdown("---")
+        st.caption(f"Analysis generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        # Download report option
+        report = f"""ACCOUNT CHURN PREDICTION REPORT
 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 ACCOUNT DATA:
@@ -337,15 +234,12 @@ ACCOUNT DATA:
 ANALYSIS:
 {output}
 """
-                st.download_button(
-                    label="📥 Download Report",
-                    data=report,
-                    file_name=f"churn_prediction_{account_id}_{datetime.now().strftime('%Y%m%d')}.txt",
-                    mime="text/plain"
-                )
-                
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)}")
+        st.download_button(
+            label="📥 Download Report",
+            data=report,
+            file_name=f"churn_prediction_{account_id}_{datetime.now().strftime('%Y%m%d')}.txt",
+            mime="text/plain"
+        )
 
 # Chatbot section - only show if prediction has been made
 if st.session_state.prediction_result is not None:
@@ -457,8 +351,9 @@ Provide a helpful, data-driven answer that helps the seller take action to retai
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    chat_response = client.chat.completions.create(
+                    chat_response = llm_gateway.chat(
                         model="gpt-4",
+                        api_key=api_key,
                         messages=[
                             {
                                 "role": "system",
@@ -472,7 +367,7 @@ Provide a helpful, data-driven answer that helps the seller take action to retai
                         temperature=0.1
                     )
                     
-                    assistant_message = chat_response.choices[0].message.content
+                    assistant_message = chat_response.content
                     st.markdown(assistant_message)
                     
                     # Generate audio response if enabled
@@ -513,6 +408,73 @@ Provide a helpful, data-driven answer that helps the seller take action to retai
         with col_voice_settings:
             st.caption("🔊 Voice: Alloy | Model: Whisper + TTS-1")
 
+# Bulk scoring - whole book of business, same formula as the form above
+st.markdown("---")
+with st.expander("📂 Bulk Scoring (CSV / Parquet)"):
+    st.markdown(
+        "Upload one row per account with columns named like the metrics "
+        f"(`{'`, `'.join(churn_scoring.INPUT_COLUMNS)}`, plus an optional `account_id`). "
+        "`utilization` is a fraction (0-1); blank cells count as missing. "
+        "The file is scored in chunks and every input column is kept."
+    )
+    uploaded_accounts = st.file_uploader("Accounts file", type=["csv", "parquet", "pq"])
+    col_b1, col_b2 = st.columns(2)
+    with col_b1:
+        bulk_output_format = st.radio("Output format", ["csv", "parquet"], horizontal=True)
+    with col_b2:
+        bulk_driver_text = st.checkbox("Driver sentences instead of categories (slower)", value=False)
+
+    if uploaded_accounts is not None and st.button("📊 Score File", type="primary"):
+        progress_text = st.empty()
+
+        def show_progress(rows, elapsed):
+            progress_text.caption(f"Scored {rows:,} accounts ({rows / elapsed if elapsed else 0:,.0f} rows/s)...")
+
+        # Results are written to disk chunk by chunk, then offered for download
+        with tempfile.NamedTemporaryFile(suffix=f".{bulk_output_format}", delete=False) as scored_file:
+            scored_path = scored_file.name
+        try:
+            report = churn_batch.score_file(
+                uploaded_accounts, scored_path,
+                in_format=churn_batch.file_format(uploaded_accounts.name),
+                out_format=bulk_output_format,
+                driver_text=bulk_driver_text,
+                progress=show_progress
+            )
+            with open(scored_path, "rb") as f:
+                scored_data = f.read()
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
+            report = None
+        finally:
+            os.remove(scored_path)
+
+        if report is not None:
+            progress_text.empty()
+            st.success(f"✅ Scored {report.rows:,} accounts in {report.seconds:.2f}s ({report.rows_per_sec:,.0f} rows/s)")
+            col_t1, col_t2, col_t3 = st.columns(3)
+            col_t1.metric("🔴 High Risk", f"{report.tiers['High']:,}")
+            col_t2.metric("🟡 Medium Risk", f"{report.tiers['Medium']:,}")
+            col_t3.metric("🟢 Low Risk", f"{report.tiers['Low']:,}")
+            if report.no_data:
+                st.warning(f"⚠️ {report.no_data:,} accounts had no scorable metrics - marked Unknown and left out of the counts")
+            if report.invalid_cells:
+                st.warning(f"⚠️ {report.invalid_cells:,} cells could not be read as numbers and were treated as missing")
+
+            if report.riskiest:
+                st.markdown("#### Riskiest Accounts")
+                st.dataframe([
+                    {"Account": str(account), "Health Score": health_score, "Risk Tier": tier, "Drivers": "; ".join(drivers)}
+                    for health_score, tier, account, drivers in report.riskiest
+                ], use_container_width=True, hide_index=True)
+
+            st.download_button(
+                label="📥 Download Scored Accounts",
+                data=scored_data,
+                file_name=f"churn_scores_{datetime.now().strftime('%Y%m%d')}.{bulk_output_format}",
+                mime="text/csv" if bulk_output_format == "csv" else "application/octet-stream"
+            )
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Adaptive Quiz Planning Benchmark
+Times StudentModel.plan() and update() on a synthetic student who has
+completed every topic of a grade.
+
+Usage:
+    python bench_adaptive.py [--grade "Grade 8"] [--repeat 2000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import adaptive
+import syllabus
+
+
+def make_model(grade, syllabus_index, seed=42):
+    """Model with a random mix of new, weak, strong and overdue topics"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    completed = [t for topics in syllabus_index.raw[grade].values() for t in topics]
+    mastery = {}
+    for subject, topics in syllabus_index.raw[grade].items():
+        for topic in topics:
+            if rng.random() < 0.7:
+                mastery[topic] = {
+                    'subject': subject, 'mastery': rng.random(), 'attempts': rng.randint(1, 40),
+                    'last_answered_at': now - timedelta(days=rng.uniform(0, 60))
+                }
+    return adaptive.build_model(grade, completed, syllabus_index, mastery=mastery), now
+
+
+def run(grade, repeat):
+    syllabus_index = syllabus.load_syllabus()
+    model, now = make_model(grade, syllabus_index)
+    rng = random.Random(7)
+    subjects = list(model.topics)
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        model.plan(subjects[i % len(subjects)], 10, now=now, rng=rng)
+    plan_s = (time.perf_counter() - start) / repeat
+
+    answers = [{'topic': t, 'is_correct': rng.random() < 0.6} for t in list(model.topics[subjects[0]])[:10]]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.update(subjects[0], answers, now=now)
+    update_s = (time.perf_counter() - start) / repeat
+
+    topics = sum(len(t) for t in model.topics.values())
+    print(f"{grade}: {topics} completed topics across {len(subjects)} subjects")
+    print(f"plan(10 questions)   {plan_s * 1000:8.3f} ms")
+    print(f"update(10 answers)   {update_s * 1000:8.3f} ms")
+    for pick in model.plan(subjects[0], 10, now=now, rng=rng):
+        print(f"  {pick.topic:<35} {pick.difficulty:<7} x{pick.count}  mastery {pick.mastery:.2f}  ({pick.reason})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark adaptive quiz planning")
+    parser.add_argument("--grade", default="Grade 8")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.grade, args.repeat)
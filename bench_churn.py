@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Churn Scoring Benchmark
+Writes a synthetic book of business, then times churn_scoring.score_columns()
+in memory and churn_batch.score_file() end to end (CSV, and Parquet when
+pyarrow is installed), reporting rows/second and peak memory.
+
+Usage:
+    python bench_churn.py [--rows 200000] [--chunk-rows 50000] [--keep DIR]
+"""
+
+import argparse
+import csv
+import importlib.util
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import churn_batch
+import churn_scoring
+
+
+def make_accounts(count, seed=42, missing=0.05):
+    """Synthetic account columns covering every band, with a share of blank metrics"""
+    rng = np.random.default_rng(seed)
+    seats = rng.integers(5, 500, count)
+    columns = {
+        'account_id': np.array([f"ACC-{i:07d}" for i in range(1, count + 1)]),
+        'usage_30d_change': np.round(rng.normal(0.0, 0.15, count), 3),
+        'active_users': np.minimum(seats, rng.binomial(seats, rng.uniform(0.3, 1.0, count))),
+        'licensed_seats': seats,
+        'days_since_last_meeting': rng.integers(0, 90, count),
+        'meetings_last_30d': rng.poisson(2, count),
+        'emails_last_30d': rng.poisson(8, count),
+        'open_critical_tickets': rng.poisson(0.4, count),
+        'csat_score_current': np.round(rng.uniform(1, 5, count), 1),
+        'nps_current': rng.integers(-100, 101, count),
+        'renewal_days_out': rng.integers(0, 365, count),
+        'invoices_overdue_count': rng.poisson(0.3, count),
+        'last_exec_sponsor_touch_days': rng.integers(0, 120, count),
+        'key_contacts_changed_6m': rng.poisson(0.5, count),
+    }
+    for name, values in columns.items():
+        if name != 'account_id':
+            values = values.astype(float)
+            values[rng.random(count) < missing] = np.nan
+            columns[name] = values
+    return columns
+
+
+def write_csv(columns, path):
+    names = list(columns)
+    cells = [churn_batch._csv_cells(columns[name]) for name in names]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*cells))
+
+
+def write_parquet(columns, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.table({name: pa.array(values, from_pandas=True) for name, values in columns.items()}), path)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run(rows, chunk_rows, workdir):
+    columns = make_accounts(rows)
+    metrics = {name: values for name, values in columns.items() if name != 'account_id'}
+
+    start = time.perf_counter()
+    scores = churn_scoring.score_columns(metrics)
+    elapsed = time.perf_counter() - start
+    print(f"{rows:,} accounts, chunks of {chunk_rows:,}")
+    print(f"score_columns (in memory)  {elapsed:8.3f}s  {rows / elapsed:12,.0f} rows/s")
+
+    sample = min(rows, 2000)
+    start = time.perf_counter()
+    for row in range(sample):
+        churn_scoring.score_account({name: values[row] for name, values in metrics.items()})
+    per_account = (time.perf_counter() - start) / sample
+    print(f"score_account (one by one) {per_account * 1e6:8.1f}us {1 / per_account:12,.0f} rows/s")
+
+    formats = ["csv"] + (["parquet"] if importlib.util.find_spec("pyarrow") else [])
+    for fmt in formats:
+        source = os.path.join(workdir, f"accounts.{fmt}")
+        target = os.path.join(workdir, f"scored.{fmt}")
+        (write_csv if fmt == "csv" else write_parquet)(columns, source)
+        report = churn_batch.score_file(source, target, fmt, fmt, chunk_rows=chunk_rows)
+        print(f"score_file {fmt:<8}         {report.seconds:8.3f}s  {report.rows_per_sec:12,.0f} rows/s  "
+              f"({os.path.getsize(source) / 1e6:.1f} MB in, {os.path.getsize(target) / 1e6:.1f} MB out)")
+    if "parquet" not in formats:
+        print("score_file parquet         skipped (pyarrow not installed)")
+
+    tiers = dict(zip(*np.unique(scores.risk_tier, return_counts=True)))
+    print("tiers: " + "  ".join(f"{tier}: {int(tiers.get(tier, 0)):,}" for tier in ("Low", "Medium", "High")))
+    print(f"peak RSS {peak_rss_mb():.0f} MB (includes the synthetic columns held in memory)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark churn scoring")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-rows", type=int, default=churn_batch.CHUNK_ROWS)
+    parser.add_argument("--keep", help="Write the generated and scored files here instead of a temp dir")
+    args = parser.parse_args()
+
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        run(args.rows, args.chunk_rows, args.keep)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            run(args.rows, args.chunk_rows, workdir)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Insights Rules Benchmark
+Times insights.evaluate() on synthetic aggregates, reported per 1,000 students.
+
+Usage:
+    python bench_insights.py [--students 1000] [--repeat 20]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import insights
+
+
+def make_students(count, seed=42):
+    """Synthetic get_student_insights() rows covering every rule branch"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    students = {}
+    for student_id in range(1, count + 1):
+        subjects = rng.sample(insights.SUBJECTS, rng.randint(0, 3))
+        sessions_30d = rng.randint(0, 40)
+        quiz_count = rng.randint(0, 6)
+        students[student_id] = {
+            'student_id': student_id,
+            'sessions_7d': min(sessions_30d, rng.randint(0, 10)),
+            'sessions_14d': min(sessions_30d, rng.randint(0, 20)),
+            'sessions_30d': sessions_30d,
+            'minutes_30d': sessions_30d * rng.randint(10, 120),
+            'avg_duration_30d': rng.uniform(10, 120) if sessions_30d else None,
+            'recent_by_subject': {
+                s: {'session_count': rng.randint(1, 10), 'total_minutes': rng.randint(10, 600)}
+                for s in subjects
+            },
+            'last_session_at': now - timedelta(days=rng.randint(0, 30)) if sessions_30d else None,
+            'recent_quiz_count': quiz_count,
+            'recent_quiz_avg': rng.uniform(0, 100) if quiz_count else None,
+            'previous_quiz_avg': rng.uniform(0, 100) if quiz_count > 3 else None,
+            'data_version': now
+        }
+    return students
+
+
+def run(count, repeat):
+    students = make_students(count)
+    now = datetime.now()
+
+    # Uncached: every rule runs for every student
+    best = float('inf')
+    produced = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        produced = sum(len(insights.evaluate(d, f"Student {i}", now)) for i, d in students.items())
+        best = min(best, time.perf_counter() - start)
+
+    # Cached: first pass fills the memo, later passes are hits
+    insights.clear_cache()
+    for i, d in students.items():
+        insights.evaluate_cached(i, d['data_version'], d, f"Student {i}", now)
+    best_cached = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i, d in students.items():
+            insights.evaluate_cached(i, d['data_version'], d, f"Student {i}", now)
+        best_cached = min(best_cached, time.perf_counter() - start)
+
+    per_1000 = 1000.0 / count
+    print(f"Students: {count:,}  Rules: {len(insights.RULES)}  Insights produced: {produced:,}")
+    print(f"evaluate()        {best * per_1000 * 1000:8.2f} ms per 1,000 students")
+    print(f"evaluate_cached() {best_cached * per_1000 * 1000:8.2f} ms per 1,000 students (all hits)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Smart Insights rules")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Keep every synthetic student resident so the cached pass measures hits only
+    insights.CACHE_SIZE = max(insights.CACHE_SIZE, args.students)
+    run(args.students, args.repeat)
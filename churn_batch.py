@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Bulk churn scoring for a whole book of business.
+
+Streams a CSV or Parquet file in chunks, scores each chunk with
+churn_scoring.score_columns() and appends the results to the output as it
+goes, so memory depends on --chunk-rows rather than on the file size. Every
+input column is kept and these are added after it:
+
+    health_score, risk_tier, coverage, score_<category> (x7), driver_1..3
+
+Input columns are written back unchanged: CSV columns stay text in a
+Parquet output, so cells that could not be parsed remain visible next to
+the scores. Drivers are category labels by default; --driver-text writes
+the numeric sentences the single-account form shows instead (slower:
+formatted per row). Metric columns are named as in
+churn_scoring.INPUT_COLUMNS; utilization is a fraction, or is derived from
+active_users and licensed_seats. Blank or unparseable cells count as
+missing.
+
+    python churn_batch.py accounts.csv scored.csv
+    python churn_batch.py accounts.parquet scored.parquet --chunk-rows 100000
+    python churn_batch.py accounts.csv scored.parquet --top 20
+
+Parquet needs pyarrow (imported only when a .parquet file is involved).
+"""
+
+import argparse
+import csv
+import heapq
+import io
+import itertools
+import math
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import churn_scoring
+
+CHUNK_ROWS = 50_000
+TOP_ACCOUNTS = 10
+ID_COLUMN = "account_id"
+
+CATEGORY_LABELS = np.array([label for _, label, _ in churn_scoring.CATEGORIES] + [""])  # -1 -> ""
+SCORE_COLUMNS = (["health_score", "risk_tier", "coverage"]
+                 + [f"score_{key}" for key in churn_scoring.CATEGORY_KEYS]
+                 + [f"driver_{i + 1}" for i in range(churn_scoring.DRIVER_COUNT)])
+
+# tiers: counts of scored accounts; no_data: accounts with no scorable metric (tier Unknown, left out of
+# tiers and riskiest); riskiest: [(health_score, risk_tier, account id or row number, [driver sentences])],
+# lowest score first
+BatchReport = namedtuple('BatchReport', ['rows', 'seconds', 'rows_per_sec', 'tiers', 'no_data', 'invalid_cells',
+                                         'riskiest'])
+
+
+def file_format(name):
+    """'parquet' for .parquet / .pq names, otherwise 'csv'"""
+    return "parquet" if os.path.splitext(name)[1].lower() in (".parquet", ".pq") else "csv"
+
+
+# Readers: yield (column names, [column per name], row count) per chunk
+def csv_chunks(stream, chunk_rows):
+    reader = csv.reader(stream)
+    header = [name.strip() for name in next(reader, [])]
+    width = len(header)
+    while True:
+        batch = list(itertools.islice(reader, chunk_rows))
+        if not batch:
+            return
+        # Blank lines are not accounts; short rows are padded with blank cells
+        rows = [r if len(r) == width else (r + [""] * width)[:width]
+                for r in batch if any(cell.strip() for cell in r)]
+        if rows:
+            yield header, list(zip(*rows)), len(rows)
+
+
+def _parquet_chunks(source, chunk_rows):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source)
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+        yield batch.schema.names, batch.columns, batch.num_rows
+
+
+def to_float(values):
+    """Text cells -> float array; blank and unparseable cells become NaN. Returns (array, invalid count)"""
+    try:
+        return np.fromiter((float(v) if v and not v.isspace() else math.nan for v in values), float, len(values)), 0
+    except ValueError:
+        pass
+    out = np.full(len(values), np.nan)
+    invalid = 0
+    for i, cell in enumerate(values):
+        if not cell or cell.isspace():
+            continue
+        try:
+            out[i] = float(cell)
+        except ValueError:
+            invalid += 1
+    return out, invalid
+
+
+def _column_floats(column):
+    # Arrow numeric columns convert directly (nulls -> NaN); everything else is parsed as text
+    if hasattr(column, "to_numpy"):
+        import pyarrow as pa
+
+        if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            return column.cast(pa.float64()).to_numpy(zero_copy_only=False), 0
+        column = ["" if v is None else str(v) for v in column.to_pylist()]
+    return to_float(column)
+
+
+# Writers: write(names, columns) per chunk, close() at the end
+class _CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.header_written = False
+
+    def write(self, names, columns):
+        if not self.header_written:
+            self.writer.writerow(names)
+            self.header_written = True
+        columns = [c.to_pylist() if hasattr(c, "to_pylist") else c for c in columns]
+        self.writer.writerows(zip(*columns))
+
+    def close(self):
+        pass
+
+
+class _ParquetWriter:
+    def __init__(self, sink):
+        self.sink = sink
+        self.writer = None
+
+    def write(self, names, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: (c if isinstance(c, (pa.Array, pa.ChunkedArray)) else pa.array(c, from_pandas=True))
+                          for name, c in zip(names, columns)})
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.sink, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def score_chunk(names, columns, driver_text=False):
+    """
+    Score one chunk of input columns.
+
+    Returns:
+        (ChurnScores, [output column per SCORE_COLUMNS name], invalid cell count)
+    """
+    wanted = set(churn_scoring.INPUT_COLUMNS)
+    metrics, invalid = {}, 0
+    for name, column in zip(names, columns):
+        if name in wanted:
+            metrics[name], bad = _column_floats(column)
+            invalid += bad
+    n = len(columns[0]) if columns else 0
+    if not metrics:
+        metrics = {churn_scoring.SIGNAL_NAMES[0]: np.full(n, np.nan)}
+    scores = churn_scoring.score_columns(metrics)
+
+    category = np.round(scores.category_scores, 1)
+    # Unknown-tier accounts get a blank health_score, not 0
+    health_score = scores.health_score.astype(object)
+    health_score[scores.risk_tier == churn_scoring.UNKNOWN_TIER] = None
+    output = [health_score, scores.risk_tier, np.round(scores.coverage, 3)]
+    output += [category[:, c] for c in range(category.shape[1])]
+    if driver_text:
+        texts = [churn_scoring.driver_texts(scores, row) for row in range(n)]
+        output += [[t[i] if i < len(t) else "" for t in texts] for i in range(churn_scoring.DRIVER_COUNT)]
+    else:
+        output += [CATEGORY_LABELS[scores.drivers[:, i]] for i in range(churn_scoring.DRIVER_COUNT)]
+    return scores, output, invalid
+
+
+def _csv_cells(column):
+    # CSV output: plain Python values, NaN as a blank cell
+    values = column.tolist() if isinstance(column, np.ndarray) else column
+    if isinstance(column, np.ndarray) and column.dtype.kind == "f":
+        values = ["" if v != v else v for v in values]
+    return values
+
+
+def _riskiest(heap, top, scores, ids, offset):
+    # Keep the `top` lowest health scores seen so far: a min-heap on (-score, -row), earlier rows win ties
+    if top <= 0:
+        return
+    # Unknown-tier accounts sort after every real score and are never listed
+    health = np.where(scores.risk_tier == churn_scoring.UNKNOWN_TIER, 101, scores.health_score)
+    for row in np.argsort(health, kind="stable")[:top]:
+        key = (-int(health[row]), -(offset + int(row)))
+        if health[row] > 100 or (len(heap) == top and key <= heap[0][:2]):
+            break
+        if ids is None:
+            account = offset + int(row) + 1
+        else:
+            account = ids[int(row)].as_py() if hasattr(ids, "to_pylist") else ids[int(row)]
+        entry = key + (str(scores.risk_tier[row]), account, churn_scoring.driver_texts(scores, int(row)))
+        if len(heap) < top:
+            heapq.heappush(heap, entry)
+        else:
+            heapq.heapreplace(heap, entry)
+
+
+def score_file(source, sink, in_format="csv", out_format="csv", chunk_rows=CHUNK_ROWS,
+               driver_text=False, top=TOP_ACCOUNTS, progress=None):
+    """
+    Score every account in source and write them, with scores, to sink.
+
+    Args:
+        source: Path or binary file object
+        sink: Path or binary file object
+        progress: Optional callback(rows scored so far, elapsed seconds), called per chunk
+
+    Returns:
+        BatchReport
+    """
+    start = time.perf_counter()
+    opened, wrappers = [], []
+
+    def text_stream(target, mode, **kwargs):
+        # Text view over a path or a caller's binary file; the caller's file is left open
+        raw = target
+        if isinstance(target, (str, os.PathLike)):
+            raw = open(target, mode)
+            opened.append(raw)
+        wrapper = io.TextIOWrapper(raw, **kwargs)
+        wrappers.append(wrapper)
+        return wrapper
+
+    try:
+        if in_format == "parquet":
+            chunks = _parquet_chunks(source, chunk_rows)
+        else:
+            chunks = csv_chunks(text_stream(source, "rb", encoding="utf-8-sig", newline=""), chunk_rows)
+        if out_format == "parquet":
+            writer = _ParquetWriter(sink)
+        else:
+            writer = _CsvWriter(text_stream(sink, "wb", encoding="utf-8", newline=""))
+
+        rows = invalid = no_data = 0
+        tiers = {"Low": 0, "Medium": 0, "High": 0}
+        heap = []
+        for names, columns, n in chunks:
+            scores, output, bad = score_chunk(names, columns, driver_text)
+            invalid += bad
+            if out_format == "csv":
+                output = [_csv_cells(c) for c in output]
+            writer.write(list(names) + SCORE_COLUMNS, list(columns) + output)
+
+            tier_names, counts = np.unique(scores.risk_tier, return_counts=True)
+            for tier, count in zip(tier_names, counts):
+                if tier == churn_scoring.UNKNOWN_TIER:
+                    no_data += int(count)
+                else:
+                    tiers[str(tier)] += int(count)
+            ids = columns[list(names).index(ID_COLUMN)] if ID_COLUMN in names else None
+            _riskiest(heap, top, scores, ids, rows)
+
+            rows += n
+            if progress:
+                progress(rows, time.perf_counter() - start)
+        writer.close()
+    finally:
+        for wrapper in wrappers:
+            wrapper.detach()  # flushes
+        for handle in opened:
+            handle.close()
+
+    riskiest = [(-neg_score, tier, account, drivers)
+                for neg_score, _, tier, account, drivers in sorted(heap, reverse=True)]
+
+    seconds = time.perf_counter() - start
+    return BatchReport(rows, seconds, rows / seconds if seconds else 0.0, tiers, no_data, invalid, riskiest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of accounts for churn risk")
+    parser.add_argument("input", help="Accounts file (.csv, .parquet)")
+    parser.add_argument("output", help="Scored file (.csv, .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows read, scored and written at a time")
+    parser.add_argument("--driver-text", action="store_true", help="Write driver sentences instead of category labels")
+    parser.add_argument("--top", type=int, default=TOP_ACCOUNTS, help="Riskiest accounts to list at the end")
+    args = parser.parse_args()
+
+    def progress(rows, elapsed):
+        print(f"\r{rows:,} rows  {rows / elapsed if elapsed else 0:,.0f} rows/s", end="", flush=True)
+
+    report = score_file(args.input, args.output, file_format(args.input), file_format(args.output),
+                        chunk_rows=args.chunk_rows, driver_text=args.driver_text, top=args.top, progress=progress)
+    print(f"\rScored {report.rows:,} accounts in {report.seconds:.2f}s ({report.rows_per_sec:,.0f} rows/s) "
+          f"-> {args.output}")
+    print("  " + "  ".join(f"{tier}: {count:,}" for tier, count in report.tiers.items()))
+    if report.no_data:
+        print(f"  {report.no_data:,} accounts had no scorable metrics (risk_tier Unknown)")
+    if report.invalid_cells:
+        print(f"  {report.invalid_cells:,} unparseable cells treated as missing")
+    for health_score, tier, account, drivers in report.riskiest:
+        print(f"  {str(account):<16} {health_score:>3} {tier:<6} {'; '.join(drivers)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Deterministic churn health scoring for the churn prediction app (app.py).
+
+This is the weighted formula that used to be spelled out to GPT-4 in the
+churn system prompt, evaluated locally with NumPy:
+
+- Each category gets a 0-100 sub-score from its threshold bands. A
+  category is the mean of whichever of its signals are present.
+- The health_score is the weighted mean of the categories that have data:
+  usage 25, seats 15, engagement 20, support 20, renewal 10, billing 5 and
+  relationship 5. Missing metrics are ignored rather than guessed, so the
+  weights of absent categories are spread over the rest.
+- The score maps to a risk_tier: 75 and above is Low, 50-74 Medium, below
+  50 High. An account with no scorable metrics at all is "Unknown" (and its
+  health_score is None in the dict results) rather than a confident High.
+- The drivers are the three categories losing the most weighted points,
+  each described by its weakest signal.
+
+score_columns() evaluates column arrays, so a whole portfolio is scored in
+a few vectorized passes (about 2 microseconds an account). score_account()
+applies the same band table to one account in plain Python, which avoids
+NumPy's per-call overhead and takes microseconds.
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+import scoring_bands
+
+# (key, label, weight)
+CATEGORIES = (
+    ("usage", "Usage decline", 25),
+    ("seats", "Seat utilization", 15),
+    ("engagement", "Engagement", 20),
+    ("support", "Support & sentiment", 20),
+    ("renewal", "Renewal timing", 10),
+    ("billing", "Billing", 5),
+    ("relationship", "Relationship", 5),
+)
+CATEGORY_KEYS = tuple(key for key, _, _ in CATEGORIES)
+WEIGHTS = np.array([weight for _, _, weight in CATEGORIES], dtype=float)
+
+LOW_RISK_SCORE = 75
+MEDIUM_RISK_SCORE = 50
+UNKNOWN_TIER = "Unknown"    # no metric to score
+
+DRIVER_COUNT = 3
+
+
+# Threshold bands per metric: (op, threshold, sub-score) checked in order, else the default
+# (evaluated by scoring_bands)
+
+def _change_text(v):
+    return f"Usage {'dropped' if v < 0 else 'grew'} {abs(v) * 100:.0f}% in the last 30 days."
+
+
+# metric -> (category, bands, default sub-score (number or function of the value), driver text)
+SIGNALS = {
+    "usage_30d_change": ("usage", [('<', -0.20, 0), ('<', -0.05, 35), ('<=', 0.05, 70)], 100, _change_text),
+    "utilization": ("seats", [('<', 0.50, 20), ('<', 0.70, 55), ('<=', 0.90, 85)], 100,
+                    lambda v: f"License utilization is {v * 100:.0f}%."),
+    "days_since_last_meeting": ("engagement", [('>', 30, 10), ('>=', 15, 50)], 100,
+                                lambda v: f"{v:.0f} days since the last meeting."),
+    "meetings_last_30d": ("engagement", [('==', 0, 10), ('<', 3, 70)], 100,
+                          lambda v: f"{v:.0f} meetings in the last 30 days."),
+    "emails_last_30d": ("engagement", [('<', 3, 30), ('<', 10, 70)], 100,
+                        lambda v: f"{v:.0f} emails in the last 30 days."),
+    "open_critical_tickets": ("support", [('>=', 2, 0), ('==', 1, 40)], 100,
+                              lambda v: f"{v:.0f} critical support tickets are open."),
+    # Below 3.5 CSAT / 0 NPS is high risk; above that, higher is healthier
+    "csat_score_current": ("support", [('<', 3.5, 20)], lambda x: np.clip(60 + 40 * (x - 3.5) / 1.5, 60, 100),
+                           lambda v: f"CSAT is {v:.1f} out of 5."),
+    "nps_current": ("support", [('<', 0, 20)], lambda x: np.clip(60 + 40 * x / 100, 60, 100),
+                    lambda v: f"NPS is {v:.0f}."),
+    "renewal_days_out": ("renewal", [('<', 30, 0), ('<', 90, 40), ('<=', 180, 70)], 100,
+                         lambda v: f"Renewal is in {v:.0f} days."),
+    "invoices_overdue_count": ("billing", [('>=', 2, 0), ('==', 1, 50)], 100,
+                               lambda v: f"{v:.0f} invoices are overdue."),
+    "last_exec_sponsor_touch_days": ("relationship", [('>', 60, 20), ('>', 30, 70)], 100,
+                                     lambda v: f"{v:.0f} days since the last executive sponsor touch."),
+    "key_contacts_changed_6m": ("relationship", [('>=', 2, 20), ('==', 1, 70)], 100,
+                                lambda v: f"{v:.0f} key contacts changed in the last 6 months."),
+}
+SIGNAL_NAMES = tuple(SIGNALS)
+SIGNAL_CATEGORY = tuple(CATEGORY_KEYS.index(SIGNALS[name][0]) for name in SIGNAL_NAMES)
+INPUT_COLUMNS = SIGNAL_NAMES + ("active_users", "licensed_seats")
+UTILIZATION_INDEX = SIGNAL_NAMES.index("utilization")
+
+# Batch results: arrays with one row per account
+ChurnScores = namedtuple('ChurnScores', [
+    'health_score',     # int array, 0-100 (0 where risk_tier is Unknown)
+    'risk_tier',        # str array: Low / Medium / High, or Unknown without data
+    'coverage',         # share of the total weight backed by data, 0-1
+    'category_scores',  # (n, 7) float array in CATEGORIES order, NaN where no data
+    'signal_values',    # (n, 12) float array in SIGNAL_NAMES order
+    'signal_scores',    # (n, 12) float array
+    'drivers',          # (n, 3) category indexes, biggest weighted loss first (-1 if none)
+])
+
+
+def _signal_scores(name, x):
+    # Vectorized band lookup; NaN (missing) stays NaN
+    _, bands, default, _ = SIGNALS[name]
+    if callable(default):
+        default = default(x)
+    return scoring_bands.band_values(bands, x, default, np.nan)
+
+
+def _signal_score(name, v):
+    # Scalar band lookup for score_account
+    _, bands, default, _ = SIGNALS[name]
+    score = scoring_bands.band_value(bands, v, default)
+    return float(score(v)) if callable(score) else score
+
+
+def score_columns(columns):
+    """
+    Score many accounts at once.
+
+    Args:
+        columns: {metric: sequence of numbers}, all the same length; NaN or a
+                 missing column means "not provided". utilization is a
+                 fraction (0-1) and is derived from active_users /
+                 licensed_seats where both are given.
+
+    Returns:
+        ChurnScores
+    """
+    n = len(next(iter(columns.values()))) if columns else 0
+    utilization = scoring_bands.column(columns, "utilization", n)
+    active, seats = scoring_bands.column(columns, "active_users", n), scoring_bands.column(columns, "licensed_seats", n)
+    derived = ~np.isnan(active) & ~np.isnan(seats)
+    utilization = np.where(derived, active / np.maximum(seats, 1), utilization)
+
+    values = np.empty((n, len(SIGNAL_NAMES)))
+    scores = np.empty_like(values)
+    for i, name in enumerate(SIGNAL_NAMES):
+        values[:, i] = utilization if name == "utilization" else scoring_bands.column(columns, name, n)
+        scores[:, i] = _signal_scores(name, values[:, i])
+
+    # Category sub-score = mean of its present signals
+    category_scores = np.full((n, len(CATEGORIES)), np.nan)
+    for c in range(len(CATEGORIES)):
+        block = scores[:, [i for i, sc in enumerate(SIGNAL_CATEGORY) if sc == c]]
+        present = (~np.isnan(block)).sum(axis=1)
+        category_scores[:, c] = np.where(present > 0, np.nansum(block, axis=1) / np.maximum(present, 1), np.nan)
+
+    has_data = ~np.isnan(category_scores)
+    weight_present = (has_data * WEIGHTS).sum(axis=1)
+    weighted = np.nansum(category_scores * WEIGHTS, axis=1)
+    health = np.where(weight_present > 0, weighted / np.maximum(weight_present, 1e-9), 0.0)
+    health_score = np.clip(np.rint(health), 0, 100).astype(int)
+
+    risk_tier = np.select([weight_present == 0, health_score >= LOW_RISK_SCORE, health_score >= MEDIUM_RISK_SCORE],
+                          [UNKNOWN_TIER, "Low", "Medium"], "High")
+
+    # Drivers: weighted points lost per category, largest first
+    lost = np.where(has_data, WEIGHTS * (100 - np.nan_to_num(category_scores)), -1.0)
+    drivers = np.argsort(-lost, axis=1, kind="stable")[:, :DRIVER_COUNT]
+    drivers = np.where(np.take_along_axis(lost, drivers, axis=1) >= 0, drivers, -1)
+
+    return ChurnScores(health_score, risk_tier, weight_present / WEIGHTS.sum(), category_scores,
+                       values, scores, drivers)
+
+
+def _driver_text(category, values, scores):
+    # The weakest present signal explains the category
+    members = [i for i, c in enumerate(SIGNAL_CATEGORY) if c == category and not math.isnan(scores[i])]
+    worst = min(members, key=lambda i: scores[i])
+    return SIGNALS[SIGNAL_NAMES[worst]][3](values[worst])
+
+
+def _result(health_score, risk_tier, coverage, category_scores, drivers):
+    return {
+        'health_score': None if risk_tier == UNKNOWN_TIER else int(health_score),
+        'risk_tier': str(risk_tier),
+        'coverage': float(coverage),
+        'category_scores': {
+            key: (None if math.isnan(v) else round(float(v), 1))
+            for key, v in zip(CATEGORY_KEYS, category_scores)
+        },
+        'drivers': drivers,
+    }
+
+
+def driver_texts(scores, row):
+    """The numeric driver sentences for one account of a ChurnScores batch"""
+    return [_driver_text(c, scores.signal_values[row], scores.signal_scores[row])
+            for c in scores.drivers[row] if c >= 0]
+
+
+def result_for(scores, row):
+    """One account of a ChurnScores batch as a plain dict (same shape as score_account)"""
+    return _result(scores.health_score[row], scores.risk_tier[row], scores.coverage[row],
+                   scores.category_scores[row], driver_texts(scores, row))
+
+
+def score_account(metrics):
+    """
+    Score a single account with the same bands and weights as score_columns.
+
+    Args:
+        metrics: {metric: value}; None or absent metrics are ignored
+
+    Returns:
+        {'health_score', 'risk_tier', 'coverage', 'category_scores', 'drivers'}
+    """
+    def value(name):
+        v = metrics.get(name)
+        return math.nan if v is None else float(v)
+
+    values = [value(name) for name in SIGNAL_NAMES]
+    active, seats = value("active_users"), value("licensed_seats")
+    if not math.isnan(active) and not math.isnan(seats):
+        values[UTILIZATION_INDEX] = active / max(seats, 1)
+    scores = [math.nan if math.isnan(v) else _signal_score(name, v) for name, v in zip(SIGNAL_NAMES, values)]
+
+    category_scores = []
+    for c in range(len(CATEGORIES)):
+        present = [s for s, sc in zip(scores, SIGNAL_CATEGORY) if sc == c and not math.isnan(s)]
+        category_scores.append(sum(present) / len(present) if present else math.nan)
+
+    weights = [(w, s) for (_, _, w), s in zip(CATEGORIES, category_scores) if not math.isnan(s)]
+    weight_present = sum(w for w, _ in weights)
+    health = sum(w * s for w, s in weights) / weight_present if weight_present else 0.0
+    health_score = min(max(round(health), 0), 100)  # half-to-even, like np.rint
+    if not weight_present:
+        risk_tier = UNKNOWN_TIER
+    elif health_score >= LOW_RISK_SCORE:
+        risk_tier = "Low"
+    else:
+        risk_tier = "Medium" if health_score >= MEDIUM_RISK_SCORE else "High"
+
+    lost = [(-(w * (100 - s)), c) for c, ((_, _, w), s) in enumerate(zip(CATEGORIES, category_scores))
+            if not math.isnan(s)]
+    drivers = [_driver_text(c, values, scores) for _, c in sorted(lost)[:DRIVER_COUNT]]
+
+    return _result(health_score, risk_tier, weight_present / WEIGHTS.sum(), category_scores, drivers)
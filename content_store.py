@@ -0,0 +1,153 @@
+"""
+Versioned learning content for the Study Resources tab.
+
+Each topic's description, examples, strategy and tips live in their own JSON
+file under content/learning/, and manifest.json maps topic names to files and
+carries a version number. Only the manifest is read up front, and it is
+re-read whenever manifest.json's modification time changes; a topic's file
+is parsed the first time it is shown and kept in a bounded LRU cache. Bumping
+the manifest version (save_content does this) invalidates cached entries in
+running processes without a restart.
+
+Add or update content for a topic:
+    python content_store.py --missing            # syllabus topics without content
+    python content_store.py --add topic.json     # {"topic", "description", "examples", "strategy", "tips"}
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+
+import streamlit as st
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content", "learning")
+MANIFEST_FILE = "manifest.json"
+
+REQUIRED_FIELDS = ("description", "examples", "strategy", "tips")
+TOPIC_CACHE_SIZE = 128
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def read_manifest(content_dir=CONTENT_DIR):
+    """{'version': int, 'topics': {topic: filename}} straight from disk"""
+    path = os.path.join(content_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'version': 0, 'topics': {}}
+    return _read_json(path)
+
+
+def _manifest_mtime(content_dir):
+    try:
+        return os.stat(os.path.join(content_dir, MANIFEST_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+@st.cache_resource(max_entries=1)
+def _cached_manifest(content_dir, mtime_ns):
+    # mtime_ns is only part of the cache key, so an updated manifest.json is read again
+    return read_manifest(content_dir)
+
+
+def get_manifest():
+    """Manifest shared by the process, re-read when manifest.json changes on disk"""
+    return _cached_manifest(CONTENT_DIR, _manifest_mtime(CONTENT_DIR))
+
+
+@lru_cache(maxsize=TOPIC_CACHE_SIZE)
+def _load_topic(content_dir, version, filename):
+    # version is only part of the cache key, so a new manifest misses the old entries
+    return _read_json(os.path.join(content_dir, filename))
+
+
+def has_content(topic):
+    """True if the store has learning content for the topic"""
+    return topic in get_manifest()['topics']
+
+
+def get_content(topic):
+    """Learning content for one topic, or None to fall back to generic advice"""
+    manifest = get_manifest()
+    filename = manifest['topics'].get(topic)
+    if filename is None:
+        return None
+    return _load_topic(CONTENT_DIR, manifest['version'], filename)
+
+
+def validate_entry(entry):
+    """Raise ValueError unless entry has every field the Study Resources tab renders"""
+    missing = [field for field in ("topic",) + REQUIRED_FIELDS if not entry.get(field)]
+    if missing:
+        raise ValueError(f"Content entry missing {', '.join(missing)}")
+    if not isinstance(entry['examples'], list) or not isinstance(entry['strategy'], list):
+        raise ValueError("examples and strategy must be lists")
+
+
+def save_content(entry, content_dir=CONTENT_DIR):
+    """
+    Add or replace one topic's content and bump the manifest version.
+
+    Returns:
+        The new manifest version
+    """
+    validate_entry(entry)
+    manifest = read_manifest(content_dir)
+
+    filename = manifest['topics'].get(entry['topic'])
+    if filename is None:
+        filename = re.sub(r'[^a-z0-9]+', '-', entry['topic'].lower()).strip('-') + ".json"
+        if filename in manifest['topics'].values():
+            raise ValueError(f"File name {filename} is already used by another topic")
+
+    os.makedirs(content_dir, exist_ok=True)
+    _write_json(os.path.join(content_dir, filename), entry)
+
+    manifest['topics'][entry['topic']] = filename
+    manifest['version'] += 1
+    _write_json(os.path.join(content_dir, MANIFEST_FILE), manifest)
+    return manifest['version']
+
+
+def missing_topics(syllabus_index, content_dir=CONTENT_DIR):
+    """Syllabus topics with no content yet, as {subject: sorted topics}"""
+    covered = set(read_manifest(content_dir)['topics'])
+    missing = {}
+    for subjects in syllabus_index.raw.values():
+        for subject, topics in subjects.items():
+            missing.setdefault(subject, set()).update(t for t in topics if t not in covered)
+    return {subject: sorted(topics) for subject, topics in missing.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage Study Resources learning content")
+    parser.add_argument("--missing", action="store_true", help="List syllabus topics without content")
+    parser.add_argument("--add", metavar="FILE", help="Add or replace content from a JSON file")
+    args = parser.parse_args()
+
+    if args.add:
+        version = save_content(_read_json(args.add))
+        print(f"Saved; content version is now {version}")
+    elif args.missing:
+        import syllabus
+        for subject, topics in missing_topics(syllabus.load_syllabus()).items():
+            print(f"{subject} ({len(topics)} without content)")
+            for topic in topics:
+                print(f"  {topic}")
+    else:
+        manifest = read_manifest()
+        print(f"Content version {manifest['version']}: {len(manifest['topics'])} topics")
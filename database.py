@@ -1,10 +1,22 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import streamlit as st
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import time
 import bcrypt
 import re
+import csv
+import io
+import json
+from db_pool import ConnectionPool
+import migrations
+import syllabus
+
+# Pool sizing defaults (override with pool_min / pool_max / pool_max_idle under [database] in secrets.toml)
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 10
+POOL_MAX_IDLE_SECONDS = 300
 
 # Database connection with retry logic
 def get_db_connection():
@@ -44,170 +56,44 @@ def get_gyaan_db_connection():
             else:
                 raise Exception(f"Online Gyaan database connection failed: {str(e)}")
 
+@st.cache_resource
+def get_connection_pool():
+    """Process-wide connection pool, shared across all Streamlit sessions"""
+    db_config = st.secrets["database"]
+    return ConnectionPool(
+        get_db_connection,
+        minconn=int(db_config.get("pool_min", POOL_MIN_CONNECTIONS)),
+        maxconn=int(db_config.get("pool_max", POOL_MAX_CONNECTIONS)),
+        max_idle=int(db_config.get("pool_max_idle", POOL_MAX_IDLE_SECONDS))
+    )
+
+@contextmanager
+def get_connection():
+    """
+    Borrow a pooled connection for the duration of a with-block.
+    Rolls back on error and returns the connection to the pool on exit.
+    Used by both Olympic Planner and Online Gyaan (same database).
+    """
+    with get_connection_pool().connection() as conn:
+        yield conn
+
+@st.cache_resource
+def ensure_schema():
+    """Apply pending schema migrations once per process (see migrations.py)"""
+    with get_connection() as conn:
+        return migrations.run_migrations(conn)
+
 def initialize_database():
     """Initialize all database tables including multi-tenant support"""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Create families table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS families (
-                family_id SERIAL PRIMARY KEY,
-                family_name VARCHAR(100),
-                parent_email VARCHAR(255) UNIQUE NOT NULL,
-                parent_password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Create students table (if not exists)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS students (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100) NOT NULL,
-                grade VARCHAR(20) NOT NULL,
-                total_hours DECIMAL DEFAULT 0,
-                streak_days INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Add family_id to students table if it doesn't exist
-        cur.execute("""
-            DO $$ 
-            BEGIN
-                IF NOT EXISTS (
-                    SELECT 1 FROM information_schema.columns 
-                    WHERE table_name='students' AND column_name='family_id'
-                ) THEN
-                    ALTER TABLE students ADD COLUMN family_id INTEGER REFERENCES families(family_id);
-                END IF;
-            END $$;
-        """)
-        
-        # Drop old unique constraint if it exists (for multi-tenant support)
-        cur.execute("""
-            DO $$ 
-            BEGIN
-                IF EXISTS (
-                    SELECT 1 FROM pg_constraint 
-                    WHERE conname = 'students_student_name_grade_key'
-                ) THEN
-                    ALTER TABLE students DROP CONSTRAINT students_student_name_grade_key;
-                END IF;
-            END $$;
-        """)
-        
-        # Add new unique constraint for multi-tenant (student_name + grade + family_id)
-        cur.execute("""
-            DO $$ 
-            BEGIN
-                IF NOT EXISTS (
-                    SELECT 1 FROM pg_constraint 
-                    WHERE conname = 'students_name_grade_family_unique'
-                ) THEN
-                    ALTER TABLE students ADD CONSTRAINT students_name_grade_family_unique 
-                    UNIQUE (student_name, grade, family_id);
-                END IF;
-            END $$;
-        """)
-        
-        # Create completed_topics table (if not exists)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS completed_topics (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                topic TEXT,
-                subject VARCHAR(50),
-                completed_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Create study_sessions table (if not exists)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS study_sessions (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                topics TEXT,
-                duration_minutes INTEGER,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Create weekly_plans table (if not exists)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS weekly_plans (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                week_start DATE,
-                day_of_week VARCHAR(20),
-                subjects TEXT[],
-                topics TEXT[],
-                created_at TIMESTAMP DEFAULT NOW(),
-                UNIQUE(student_name, grade, week_start, day_of_week)
-            )
-        """)
-        
-        # Create quiz_results table (if not exists)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                score INTEGER,
-                num_questions INTEGER,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Create preset_topics table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS preset_topics (
-                id SERIAL PRIMARY KEY,
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                topic TEXT,
-                difficulty VARCHAR(20),
-                estimated_hours DECIMAL,
-                description TEXT
-            )
-        """)
-        
-        # Create mock_tests table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS mock_tests (
-                id SERIAL PRIMARY KEY,
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                test_name TEXT,
-                questions JSONB,
-                difficulty VARCHAR(20)
-            )
-        """)
-        
-        conn.commit()
-        cur.close()
+        ensure_schema()
         return True
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Database initialization failed: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 # Authentication operations
 def create_family(email, password, family_name):
     """Create a new family account"""
-    conn = None
     try:
         # Validate email
         email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -221,33 +107,26 @@ def create_family(email, password, family_name):
         # Hash password
         password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute(
-            "INSERT INTO families (parent_email, parent_password_hash, family_name) VALUES (%s, %s, %s) RETURNING family_id",
-            (email.lower(), password_hash, family_name)
-        )
-        family_id = cur.fetchone()['family_id']
-        conn.commit()
-        cur.close()
-        
-        return family_id
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            cur.execute(
+                "INSERT INTO families (parent_email, parent_password_hash, family_name) VALUES (%s, %s, %s) RETURNING family_id",
+                (email.lower(), password_hash, family_name)
+            )
+            family_id = cur.fetchone()['family_id']
+            conn.commit()
+            cur.close()
+            
+            return family_id
     except psycopg2.errors.UniqueViolation:
         raise ValueError("Email already registered")
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Failed to create family: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 def authenticate_family(email, password):
     """Authenticate family login"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
@@ -268,15 +147,10 @@ def authenticate_family(email, password):
                 'email': email
             }
         return None
-    finally:
-        if conn:
-            conn.close()
 
 def get_family_students(family_id):
     """Get all students for a family"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
@@ -287,15 +161,10 @@ def get_family_students(family_id):
         cur.close()
         
         return [dict(s) for s in students]
-    finally:
-        if conn:
-            conn.close()
 
 def add_student_to_family(family_id, student_name, grade):
     """Add a student to a family"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         # Check if student already exists for this family
@@ -319,16 +188,11 @@ def add_student_to_family(family_id, student_name, grade):
         cur.close()
         
         return student_id
-    finally:
-        if conn:
-            conn.close()
 
 # Student operations
 def get_or_create_student(name, grade, family_id=None):
     """Get student or create if doesn't exist"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         if family_id:
@@ -354,538 +218,1304 @@ def get_or_create_student(name, grade, family_id=None):
         
         cur.close()
         return dict(student) if student else None
-    finally:
-        if conn:
-            conn.close()
 
-def update_student_stats(name, grade, total_hours=None, streak_days=None):
+def resolve_student(name, grade, family_id=None):
+    """
+    Get the canonical student row for a name/grade, creating it if missing.
+    Progress tables (topics, sessions, quizzes, plans) reference this row's id,
+    so resolve once per session and pass student_id to the functions below.
+    With a family_id only that family's student matches; students with the
+    same name and grade in other families are never returned.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        # Lowest id wins - matches the student_id backfill in migrations.py
+        if family_id:
+            cur.execute(
+                "SELECT * FROM students WHERE student_name = %s AND grade = %s AND family_id = %s "
+                "ORDER BY id LIMIT 1",
+                (name, grade, family_id)
+            )
+        else:
+            cur.execute(
+                "SELECT * FROM students WHERE student_name = %s AND grade = %s ORDER BY id LIMIT 1",
+                (name, grade)
+            )
+        student = cur.fetchone()
+        
+        if not student:
+            cur.execute(
+                "INSERT INTO students (student_name, grade, family_id) VALUES (%s, %s, %s) RETURNING *",
+                (name, grade, family_id)
+            )
+            student = cur.fetchone()
+            conn.commit()
+        
+        cur.close()
+        return dict(student) if student else None
+
+def update_student_stats(student_id, total_hours=None, streak_days=None):
     """Update student statistics"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         if total_hours is not None:
             cur.execute(
-                "UPDATE students SET total_hours = %s WHERE student_name = %s AND grade = %s",
-                (total_hours, name, grade)
+                "UPDATE students SET total_hours = %s WHERE id = %s",
+                (total_hours, student_id)
             )
         
         if streak_days is not None:
             cur.execute(
-                "UPDATE students SET streak_days = %s WHERE student_name = %s AND grade = %s",
-                (streak_days, name, grade)
+                "UPDATE students SET streak_days = %s WHERE id = %s",
+                (streak_days, student_id)
             )
         
         conn.commit()
         cur.close()
-    finally:
-        if conn:
-            conn.close()
 
 # Topic operations
-def get_completed_topics(name, grade):
+def get_completed_topics(student_id):
     """Get all completed topics for a student"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
-            "SELECT topic, subject FROM completed_topics WHERE student_name = %s AND grade = %s",
-            (name, grade)
+            "SELECT topic, subject FROM completed_topics WHERE student_id = %s",
+            (student_id,)
         )
         topics = cur.fetchall()
         cur.close()
         
         return [dict(t) for t in topics]
-    finally:
-        if conn:
-            conn.close()
 
-def mark_topic_completed(name, grade, subject, topic):
+def get_completed_topic_names(student_ids):
+    """Completed topic names for several students, as {student_id: set}"""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(
+            "SELECT student_id, topic FROM completed_topics WHERE student_id = ANY(%s)",
+            (list(student_ids),)
+        )
+        completed = {}
+        for row in cur.fetchall():
+            completed.setdefault(row['student_id'], set()).add(row['topic'])
+        cur.close()
+        
+        return completed
+
+def mark_topic_completed(student_id, subject, topic):
     """Mark a topic as completed"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
+        # student_name/grade are still filled in for older readers of the table.
+        # The rollup count only moves when a row was actually inserted.
         cur.execute(
-            """INSERT INTO completed_topics (student_name, grade, subject, topic)
-               VALUES (%s, %s, %s, %s)
-               ON CONFLICT (student_name, grade, subject, topic) DO NOTHING""",
-            (name, grade, subject, topic)
+            """WITH inserted AS (
+                   INSERT INTO completed_topics (student_id, student_name, grade, subject, topic)
+                   SELECT id, student_name, grade, %s, %s FROM students WHERE id = %s
+                   ON CONFLICT (student_id, subject, topic) DO NOTHING
+                   RETURNING student_id
+               )
+               INSERT INTO student_rollups (student_id, topics_completed)
+               SELECT student_id, 1 FROM inserted
+               ON CONFLICT (student_id) DO UPDATE SET
+                   topics_completed = student_rollups.topics_completed + 1,
+                   updated_at = NOW()""",
+            (subject, topic, student_id)
         )
         conn.commit()
         cur.close()
-    finally:
-        if conn:
-            conn.close()
 
-def unmark_topic(name, grade, subject, topic):
+def unmark_topic(student_id, subject, topic):
     """Remove topic from completed list"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
-            "DELETE FROM completed_topics WHERE student_name = %s AND grade = %s AND subject = %s AND topic = %s",
-            (name, grade, subject, topic)
+            """WITH deleted AS (
+                   DELETE FROM completed_topics
+                   WHERE student_id = %s AND subject = %s AND topic = %s
+                   RETURNING student_id
+               )
+               UPDATE student_rollups r SET
+                   topics_completed = GREATEST(r.topics_completed - d.removed, 0),
+                   updated_at = NOW()
+               FROM (SELECT student_id, COUNT(*) AS removed FROM deleted GROUP BY student_id) d
+               WHERE r.student_id = d.student_id""",
+            (student_id, subject, topic)
         )
         conn.commit()
         cur.close()
-    finally:
-        if conn:
-            conn.close()
 
-# Study session operations
-def add_study_session(name, grade, subject, duration, topics=None):
-    """Log a study session"""
-    conn = None
-    try:
-        conn = get_db_connection()
+def update_completed_topics(student_id, subject, completed=(), uncompleted=()):
+    """
+    Apply a batch of checklist changes for one subject in a single statement.
+    
+    Args:
+        student_id: Student id
+        subject: Subject the topics belong to
+        completed: Topics to mark complete
+        uncompleted: Topics to unmark
+    
+    Returns:
+        (added, removed) - rows actually inserted and deleted
+    """
+    completed = list(completed)
+    uncompleted = list(uncompleted)
+    if not completed and not uncompleted:
+        return 0, 0
+    
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
-            """INSERT INTO study_sessions (student_name, grade, subject, duration_minutes, topics)
-               VALUES (%s, %s, %s, %s, %s)""",
-            (name, grade, subject, duration, topics)
+            """WITH inserted AS (
+                   INSERT INTO completed_topics (student_id, student_name, grade, subject, topic)
+                   SELECT s.id, s.student_name, s.grade, %(subject)s, t.topic
+                   FROM students s, unnest(%(completed)s::text[]) AS t(topic)
+                   WHERE s.id = %(student_id)s
+                   ON CONFLICT (student_id, subject, topic) DO NOTHING
+                   RETURNING 1
+               ), deleted AS (
+                   DELETE FROM completed_topics
+                   WHERE student_id = %(student_id)s AND subject = %(subject)s
+                     AND topic = ANY(%(uncompleted)s::text[])
+                   RETURNING 1
+               ), delta AS (
+                   SELECT (SELECT COUNT(*) FROM inserted) AS added, (SELECT COUNT(*) FROM deleted) AS removed
+               )
+               INSERT INTO student_rollups (student_id, topics_completed)
+               SELECT %(student_id)s, GREATEST(added - removed, 0) FROM delta
+               ON CONFLICT (student_id) DO UPDATE SET
+                   topics_completed = GREATEST(student_rollups.topics_completed
+                                               + (SELECT added - removed FROM delta), 0),
+                   updated_at = NOW()
+               RETURNING (SELECT added FROM delta) AS added, (SELECT removed FROM delta) AS removed""",
+            {'student_id': student_id, 'subject': subject,
+             'completed': completed, 'uncompleted': uncompleted}
         )
+        result = cur.fetchone()
+        conn.commit()
+        cur.close()
+        
+        return result['added'], result['removed']
+
+# Study session operations
+# Session insert, topic completion and rollup update as one statement.
+# Both rollup changes land in the single upsert at the end, since one statement
+# can't update the same rollup row twice.
+RECORD_SESSION_SQL = """
+    WITH inserted AS (
+        INSERT INTO study_sessions (student_id, student_name, grade, subject, duration_minutes, topics)
+        SELECT id, student_name, grade, %(subject)s, %(duration)s, %(topics_text)s FROM students WHERE id = %(student_id)s
+        RETURNING student_id, subject, duration_minutes, created_at
+    ), daily AS (
+        INSERT INTO student_daily_activity (student_id, activity_date, subject, session_count, minutes)
+        SELECT student_id, created_at::date, COALESCE(subject, ''), 1, COALESCE(duration_minutes, 0)
+        FROM inserted
+        ON CONFLICT (student_id, activity_date, subject) DO UPDATE SET
+            session_count = student_daily_activity.session_count + 1,
+            minutes = student_daily_activity.minutes + EXCLUDED.minutes
+    ), topics_added AS (
+        INSERT INTO completed_topics (student_id, student_name, grade, subject, topic)
+        SELECT s.id, s.student_name, s.grade, %(subject)s, t.topic
+        FROM students s, unnest(%(completed_topics)s::text[]) AS t(topic)
+        WHERE s.id = %(student_id)s
+        ON CONFLICT (student_id, subject, topic) DO NOTHING
+        RETURNING 1
+    )
+    INSERT INTO student_rollups (student_id, total_minutes, session_count, last_session_at,
+                                 streak_days, longest_streak, streak_last_date, topics_completed)
+    SELECT student_id, COALESCE(duration_minutes, 0), 1, created_at, 1, 1, created_at::date,
+           (SELECT COUNT(*) FROM topics_added)
+    FROM inserted
+    ON CONFLICT (student_id) DO UPDATE SET
+        total_minutes = student_rollups.total_minutes + EXCLUDED.total_minutes,
+        session_count = student_rollups.session_count + 1,
+        last_session_at = GREATEST(student_rollups.last_session_at, EXCLUDED.last_session_at),
+        topics_completed = student_rollups.topics_completed + EXCLUDED.topics_completed,
+        -- Same day keeps the streak, the next day extends it, a gap restarts it
+        streak_days = CASE
+            WHEN student_rollups.streak_last_date >= EXCLUDED.streak_last_date THEN student_rollups.streak_days
+            WHEN student_rollups.streak_last_date = EXCLUDED.streak_last_date - 1 THEN student_rollups.streak_days + 1
+            ELSE 1 END,
+        longest_streak = GREATEST(student_rollups.longest_streak, CASE
+            WHEN student_rollups.streak_last_date >= EXCLUDED.streak_last_date THEN student_rollups.streak_days
+            WHEN student_rollups.streak_last_date = EXCLUDED.streak_last_date - 1 THEN student_rollups.streak_days + 1
+            ELSE 1 END),
+        streak_last_date = GREATEST(student_rollups.streak_last_date, EXCLUDED.streak_last_date),
+        updated_at = NOW()
+    RETURNING *,
+              CASE WHEN streak_last_date >= CURRENT_DATE - 1 THEN streak_days ELSE 0 END AS current_streak,
+              (SELECT COUNT(*) FROM topics_added) AS topics_added
+"""
+
+def add_study_session(student_id, subject, duration, topics=None):
+    """Log a study session"""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(RECORD_SESSION_SQL, {
+            'student_id': student_id, 'subject': subject, 'duration': duration,
+            'topics_text': topics, 'completed_topics': []
+        })
+        conn.commit()
+        cur.close()
+
+def record_study_session(student_id, subject, duration, topics=()):
+    """
+    Log a finished study session and mark its topics complete in one transaction.
+    
+    Args:
+        student_id: Student id
+        subject: Subject studied
+        duration: Minutes studied
+        topics: Topics covered; stored on the session and marked complete
+    
+    Returns:
+        The student's updated rollup (as get_student_rollup) plus topics_added,
+        the number of topics that were newly completed
+    """
+    topics = list(topics)
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(RECORD_SESSION_SQL, {
+            'student_id': student_id, 'subject': subject, 'duration': duration,
+            'topics_text': ','.join(topics), 'completed_topics': topics
+        })
+        aggregates = cur.fetchone()
         conn.commit()
         cur.close()
-    finally:
-        if conn:
-            conn.close()
+        
+        if aggregates is None:
+            raise Exception(f"Student {student_id} not found")
+        return dict(aggregates)
 
-def get_recent_study_sessions(name, grade, limit=10):
+def get_recent_study_sessions(student_id, limit=10):
     """Get recent study sessions for a student"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
             """SELECT created_at, subject, duration_minutes, topics 
                FROM study_sessions 
-               WHERE student_name = %s AND grade = %s 
+               WHERE student_id = %s 
                ORDER BY created_at DESC 
                LIMIT %s""",
-            (name, grade, limit)
+            (student_id, limit)
         )
         sessions = cur.fetchall()
         cur.close()
         
         return [dict(s) for s in sessions]
-    finally:
-        if conn:
-            conn.close()
 
-def get_student_insights(name, grade):
+def get_student_insights(student_ids):
     """
-    Generate insights about student's study patterns
-    Returns analysis of sessions, quiz performance, and subject balance
+    Study-pattern summary for several students in one round trip.
+    Session windows come from student_daily_activity, quiz trend from the last 6 quizzes.
+    
+    Args:
+        student_ids: List of student ids
+    
+    Returns:
+        Dict keyed by student id with 7/14/30-day session counts, 30-day minutes and
+        average duration, 14-day per-subject totals, last session time, the
+        average of the latest 3 quizzes vs the 3 before them, and a data_version
+        that changes whenever the student's rollup is written
     """
-    conn = None
-    try:
-        conn = get_db_connection()
+    student_ids = list(dict.fromkeys(student_ids))
+    if not student_ids:
+        return {}
+    
+    with get_connection() as conn:
         cur = conn.cursor()
         
-        insights = {}
-        
-        # Get all sessions for last 30 days
         cur.execute("""
-            SELECT subject, duration_minutes, created_at
-            FROM study_sessions 
-            WHERE student_name = %s AND grade = %s 
-            AND created_at >= NOW() - INTERVAL '30 days'
-            ORDER BY created_at DESC
-        """, (name, grade))
-        all_sessions = cur.fetchall()
-        
-        # Get sessions by subject for last 14 days
-        cur.execute("""
-            SELECT subject, COUNT(*) as session_count, SUM(duration_minutes) as total_minutes
-            FROM study_sessions 
-            WHERE student_name = %s AND grade = %s 
-            AND created_at >= NOW() - INTERVAL '14 days'
-            GROUP BY subject
-        """, (name, grade))
-        recent_by_subject = cur.fetchall()
-        
-        # Get quiz performance trend (last 10 quizzes)
-        cur.execute("""
-            SELECT score, num_questions, subject, created_at
-            FROM quiz_results 
-            WHERE student_name = %s AND grade = %s 
-            ORDER BY created_at DESC 
-            LIMIT 10
-        """, (name, grade))
-        quiz_results = cur.fetchall()
-        
-        # Get last session date
-        cur.execute("""
-            SELECT MAX(created_at) as last_session
-            FROM study_sessions 
-            WHERE student_name = %s AND grade = %s
-        """, (name, grade))
-        last_session_result = cur.fetchone()
-        
+            WITH activity AS (
+                SELECT student_id,
+                       SUM(session_count) FILTER (WHERE activity_date >= CURRENT_DATE - 7)::int AS sessions_7d,
+                       SUM(session_count) FILTER (WHERE activity_date >= CURRENT_DATE - 14)::int AS sessions_14d,
+                       SUM(session_count)::int AS sessions_30d,
+                       SUM(minutes)::int AS minutes_30d
+                FROM student_daily_activity
+                WHERE student_id = ANY(%(ids)s) AND activity_date >= CURRENT_DATE - 30
+                GROUP BY student_id
+            ), subjects AS (
+                SELECT student_id,
+                       jsonb_object_agg(subject, jsonb_build_object(
+                           'session_count', session_count, 'total_minutes', total_minutes
+                       )) AS recent_by_subject
+                FROM (
+                    SELECT student_id, subject, SUM(session_count)::int AS session_count,
+                           SUM(minutes)::int AS total_minutes
+                    FROM student_daily_activity
+                    WHERE student_id = ANY(%(ids)s) AND activity_date >= CURRENT_DATE - 14
+                    GROUP BY student_id, subject
+                ) per_subject
+                GROUP BY student_id
+            )
+            SELECT s.id AS student_id,
+                   COALESCE(a.sessions_7d, 0) AS sessions_7d,
+                   COALESCE(a.sessions_14d, 0) AS sessions_14d,
+                   COALESCE(a.sessions_30d, 0) AS sessions_30d,
+                   COALESCE(a.minutes_30d, 0) AS minutes_30d,
+                   CAST(a.minutes_30d AS FLOAT) / NULLIF(a.sessions_30d, 0) AS avg_duration_30d,
+                   COALESCE(sub.recent_by_subject, '{}'::jsonb) AS recent_by_subject,
+                   r.last_session_at, r.updated_at AS data_version,
+                   q.recent_quiz_count, q.recent_quiz_avg, q.previous_quiz_avg
+            FROM unnest(%(ids)s::int[]) AS s(id)
+            LEFT JOIN activity a ON a.student_id = s.id
+            LEFT JOIN subjects sub ON sub.student_id = s.id
+            LEFT JOIN student_rollups r ON r.student_id = s.id
+            LEFT JOIN LATERAL (
+                SELECT COUNT(*)::int AS recent_quiz_count,
+                       AVG(percentage) FILTER (WHERE rn <= 3) AS recent_quiz_avg,
+                       AVG(percentage) FILTER (WHERE rn > 3) AS previous_quiz_avg
+                FROM (
+                    SELECT CAST(score AS FLOAT) / NULLIF(num_questions, 0) * 100 AS percentage,
+                           ROW_NUMBER() OVER (ORDER BY created_at DESC) AS rn
+                    FROM quiz_results
+                    WHERE student_id = s.id
+                    ORDER BY created_at DESC
+                    LIMIT 6
+                ) latest
+            ) q ON TRUE
+        """, {'ids': student_ids})
+        rows = cur.fetchall()
         cur.close()
         
-        insights['all_sessions'] = [dict(s) for s in all_sessions]
-        insights['recent_by_subject'] = {s['subject']: dict(s) for s in recent_by_subject}
-        insights['quiz_results'] = [dict(q) for q in quiz_results] if quiz_results else []
-        insights['last_session_date'] = last_session_result['last_session'] if last_session_result else None
+        return {row['student_id']: dict(row) for row in rows}
+
+def get_rollup_versions(student_ids):
+    """
+    student_rollups.updated_at per student, as {student_id: timestamp or None}.
+    A primary-key probe that changes whenever a session, topic or quiz is written,
+    so callers can cache get_student_insights() until it does.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    if not student_ids:
+        return {}
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-        return insights
+        cur.execute(
+            "SELECT student_id, updated_at FROM student_rollups WHERE student_id = ANY(%s)",
+            (student_ids,)
+        )
+        versions = {row['student_id']: row['updated_at'] for row in cur.fetchall()}
+        cur.close()
+    
+    return {student_id: versions.get(student_id) for student_id in student_ids}
+
+def get_total_study_hours(student_id):
+    """Total study hours from the student's rollup row"""
+    return float(get_student_rollup(student_id)['total_minutes']) / 60.0
+
+# Weekly plan operations
+PLAN_SELECT = """
+    SELECT id, student_id, plan_date, to_char(plan_date, 'FMDay') AS day_of_week,
+           subject, topics, duration_minutes, completed
+    FROM weekly_plans
+"""
+
+def week_start_for(day):
+    """Monday of the week containing day"""
+    return day - timedelta(days=day.weekday())
+
+def save_weekly_plan(student_id, plan_date, subject, topics, duration, completed=False):
+    """Add one planned session - allows multiple sessions per day"""
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-    finally:
-        if conn:
-            conn.close()
+        cur.execute(
+            """INSERT INTO weekly_plans (student_id, student_name, grade, plan_date, subject, topics, duration_minutes, completed)
+               SELECT id, student_name, grade, %s, %s, %s, %s, %s FROM students WHERE id = %s""",
+            (plan_date, subject, list(topics), duration, completed, student_id)
+        )
+        conn.commit()
+        cur.close()
 
-def get_total_study_hours(name, grade):
-    """Calculate total study hours from sessions"""
-    conn = None
-    try:
-        conn = get_db_connection()
+def save_week_plan(student_id, week_start, sessions):
+    """
+    Replace a whole week's plan in one transaction.
+    
+    Args:
+        student_id: Student id
+        week_start: Monday of the week (date)
+        sessions: List of dicts with plan_date, subject, topics, duration_minutes
+                  and optional completed
+    
+    Returns:
+        Number of sessions saved
+    """
+    return save_week_plans(week_start, {student_id: sessions})
+
+def save_week_plans(week_start, plans_by_student):
+    """
+    Replace one week's plan for many students: one delete and one bulk insert.
+    
+    Args:
+        week_start: Monday of the week (date)
+        plans_by_student: Dict of student id -> sessions (as save_week_plan)
+    
+    Returns:
+        Number of sessions saved
+    """
+    week_end = week_start + timedelta(days=6)
+    rows = []
+    for student_id, sessions in plans_by_student.items():
+        for session in sessions:
+            if not week_start <= session['plan_date'] <= week_end:
+                raise ValueError(f"{session['plan_date']} is outside the week of {week_start}")
+            rows.append((student_id, session['plan_date'], session['subject'],
+                         list(session.get('topics') or []), session['duration_minutes'],
+                         session.get('completed', False)))
+    
+    if not plans_by_student:
+        return 0
+    
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
-            "SELECT COALESCE(SUM(duration_minutes), 0) as total FROM study_sessions WHERE student_name = %s AND grade = %s",
-            (name, grade)
+            "DELETE FROM weekly_plans WHERE student_id = ANY(%s) AND plan_date BETWEEN %s AND %s",
+            (list(plans_by_student), week_start, week_end)
         )
-        result = cur.fetchone()
+        if rows:
+            execute_values(
+                cur,
+                """INSERT INTO weekly_plans (student_id, student_name, grade, plan_date, subject, topics, duration_minutes, completed)
+                   SELECT s.id, s.student_name, s.grade, v.plan_date, v.subject, v.topics, v.duration_minutes, v.completed
+                   FROM (VALUES %s) AS v(student_id, plan_date, subject, topics, duration_minutes, completed)
+                   JOIN students s ON s.id = v.student_id""",
+                rows,
+                template="(%s::int, %s::date, %s::varchar, %s::text[], %s::int, %s::boolean)",
+                page_size=1000
+            )
+        conn.commit()
         cur.close()
         
-        return float(result['total']) / 60.0 if result else 0.0
-    finally:
-        if conn:
-            conn.close()
+        return len(rows)
 
-# Weekly plan operations
-def save_weekly_plan(name, grade, week_key, day, subject, topics, duration, completed):
-    """Save weekly plan - allows multiple sessions per day"""
-    conn = None
-    try:
-        conn = get_db_connection()
+def get_students_needing_plan(week_start, active_days=30):
+    """Students with a study session in the last active_days and no plan for the week"""
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
-            """INSERT INTO weekly_plans (student_name, grade, week_key, day_of_week, subject, topics, duration, completed)
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-            (name, grade, week_key, day, subject, topics, duration, completed)
+            """SELECT s.id, s.student_name, s.grade
+               FROM student_rollups r
+               JOIN students s ON s.id = r.student_id
+               WHERE r.last_session_at >= NOW() - make_interval(days => %s)
+                 AND NOT EXISTS (
+                     SELECT 1 FROM weekly_plans p
+                     WHERE p.student_id = s.id AND p.plan_date BETWEEN %s AND %s
+                 )
+               ORDER BY s.id""",
+            (active_days, week_start, week_start + timedelta(days=6))
         )
-        conn.commit()
+        students = cur.fetchall()
         cur.close()
-    finally:
-        if conn:
-            conn.close()
+        
+        return [dict(s) for s in students]
 
-def get_weekly_plan(name, grade, week_key):
-    """Get weekly plan for a student"""
-    conn = None
-    try:
-        conn = get_db_connection()
+def get_weekly_plans(student_id, start_date, end_date):
+    """Planned sessions between two dates (inclusive), ordered by date"""
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
-            "SELECT * FROM weekly_plans WHERE student_name = %s AND grade = %s AND week_key = %s",
-            (name, grade, week_key)
+            PLAN_SELECT + " WHERE student_id = %s AND plan_date BETWEEN %s AND %s ORDER BY plan_date, id",
+            (student_id, start_date, end_date)
         )
         plans = cur.fetchall()
         cur.close()
         
         return [dict(p) for p in plans]
-    finally:
-        if conn:
-            conn.close()
 
-# Quiz operations
-def save_quiz_result(name, grade, subject, num_questions, score, topics):
-    """Save quiz result to database"""
-    conn = None
-    try:
-        conn = get_db_connection()
+def get_weekly_plan(student_id, week_start):
+    """Get one week's plan for a student"""
+    return get_weekly_plans(student_id, week_start, week_start + timedelta(days=6))
+
+def copy_week_forward(student_id, from_week_start, to_week_start=None):
+    """
+    Copy a week's plan onto another week (default: the following week).
+    Copied sessions start uncompleted; nothing is copied if the target week already has a plan.
+    
+    Returns:
+        Number of sessions copied
+    """
+    if to_week_start is None:
+        to_week_start = from_week_start + timedelta(days=7)
+    
+    with get_connection() as conn:
         cur = conn.cursor()
         
-        # Create table if not exists
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                num_questions INTEGER,
-                score INTEGER,
-                topics TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Insert quiz result
         cur.execute(
-            """INSERT INTO quiz_results (student_name, grade, subject, num_questions, score, topics)
-               VALUES (%s, %s, %s, %s, %s, %s)""",
-            (name, grade, subject, num_questions, score, topics)
+            """INSERT INTO weekly_plans (student_id, student_name, grade, plan_date, subject, topics, duration_minutes, completed)
+               SELECT student_id, student_name, grade, plan_date + %(shift)s, subject, topics, duration_minutes, FALSE
+               FROM weekly_plans
+               WHERE student_id = %(student_id)s
+                 AND plan_date BETWEEN %(from_start)s AND %(from_start)s + 6
+                 AND NOT EXISTS (
+                     SELECT 1 FROM weekly_plans
+                     WHERE student_id = %(student_id)s
+                       AND plan_date BETWEEN %(to_start)s AND %(to_start)s + 6
+                 )
+               ORDER BY plan_date, id""",
+            {'student_id': student_id, 'shift': (to_week_start - from_week_start).days,
+             'from_start': from_week_start, 'to_start': to_week_start}
         )
+        copied = cur.rowcount
         conn.commit()
         cur.close()
-    finally:
-        if conn:
-            conn.close()
+        
+        return copied
 
-def get_quiz_results(name, grade, limit=10):
-    """Get recent quiz results for a student"""
-    conn = None
-    try:
-        conn = get_db_connection()
+# Quiz operations
+# Topic mastery is an exponential moving average of answer correctness (1 right, 0 wrong):
+# each answer moves it MASTERY_ALPHA of the way towards the answer, starting from MASTERY_PRIOR
+MASTERY_ALPHA = 0.3
+MASTERY_PRIOR = 0.5
+
+def save_quiz_result(student_id, subject, num_questions, score, topics, answers=()):
+    """
+    Save quiz result to database.
+    
+    Args:
+        topics: List of topic names (stored in topic_list and, comma-joined, in topics)
+        answers: Optional per-question dicts with question_id, topic, chosen_option,
+                 is_correct and time_taken_ms, in question order. They are stored in
+                 quiz_answers and folded into topic_mastery in the same statement.
+    """
+    answers = list(answers)
+    topic_list = [topics] if isinstance(topics, str) else list(topics)
+    with get_connection() as conn:
         cur = conn.cursor()
         
-        # Ensure table exists
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                num_questions INTEGER,
-                score INTEGER,
-                topics TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Insert the quiz result, its answer rows, the rollup and the mastery update in one statement.
+        # For k answers to a topic, applying the EMA one answer at a time gives
+        #   m_k = m_0 * (1-a)^k + sum(a * (1-a)^(k-i) * x_i)
+        # so each topic only needs its decay factor and gain, whatever its previous mastery.
+        cur.execute(
+            """WITH inserted AS (
+                   INSERT INTO quiz_results (student_id, student_name, grade, subject, num_questions, score,
+                                             topics, topic_list)
+                   SELECT id, student_name, grade, %(subject)s, %(num_questions)s, %(score)s,
+                          %(topics)s, %(topic_list)s::text[]
+                   FROM students WHERE id = %(student_id)s
+                   RETURNING id, student_id, score, num_questions, created_at
+               ),
+               rollup AS (
+                   INSERT INTO student_rollups (student_id, quiz_count, quiz_percentage_sum, last_quiz_at)
+                   SELECT student_id, 1,
+                          COALESCE(CAST(score AS FLOAT) / NULLIF(num_questions, 0) * 100, 0),
+                          created_at
+                   FROM inserted
+                   ON CONFLICT (student_id) DO UPDATE SET
+                       quiz_count = student_rollups.quiz_count + 1,
+                       quiz_percentage_sum = student_rollups.quiz_percentage_sum + EXCLUDED.quiz_percentage_sum,
+                       last_quiz_at = GREATEST(student_rollups.last_quiz_at, EXCLUDED.last_quiz_at),
+                       updated_at = NOW()
+               ),
+               given AS (
+                   SELECT a.*,
+                          ROW_NUMBER() OVER (PARTITION BY a.topic ORDER BY a.position DESC) - 1 AS answers_after
+                   FROM unnest(%(question_ids)s::int[], %(answer_topics)s::text[], %(chosen)s::varchar[],
+                               %(correct)s::boolean[], %(time_ms)s::int[])
+                        WITH ORDINALITY AS a(question_id, topic, chosen_option, is_correct, time_taken_ms, position)
+               ),
+               answer_rows AS (
+                   INSERT INTO quiz_answers (quiz_result_id, student_id, question_id, position, subject, topic,
+                                             chosen_option, is_correct, time_taken_ms, created_at)
+                   SELECT i.id, i.student_id, g.question_id, g.position, %(subject)s, g.topic,
+                          g.chosen_option, g.is_correct, g.time_taken_ms, i.created_at
+                   FROM inserted i, given g
+               ),
+               topic_updates AS (
+                   SELECT i.student_id, g.topic, i.created_at,
+                          COUNT(*) AS attempts,
+                          COUNT(*) FILTER (WHERE g.is_correct) AS correct,
+                          POWER(1 - %(alpha)s, COUNT(*)) AS decay,
+                          SUM(CASE WHEN g.is_correct THEN %(alpha)s * POWER(1 - %(alpha)s, g.answers_after) ELSE 0 END) AS gain
+                   FROM inserted i, given g
+                   GROUP BY i.student_id, g.topic, i.created_at
+               )
+               INSERT INTO topic_mastery (student_id, subject, topic, mastery, attempts, correct, last_answered_at)
+               SELECT student_id, %(subject)s, topic, %(prior)s * decay + gain, attempts, correct, created_at
+               FROM topic_updates
+               ON CONFLICT (student_id, subject, topic) DO UPDATE SET
+                   -- EXCLUDED.mastery is prior * decay + gain; swap the prior for the stored value
+                   mastery = topic_mastery.mastery * POWER(1 - %(alpha)s, EXCLUDED.attempts)
+                             + EXCLUDED.mastery - %(prior)s * POWER(1 - %(alpha)s, EXCLUDED.attempts),
+                   attempts = topic_mastery.attempts + EXCLUDED.attempts,
+                   correct = topic_mastery.correct + EXCLUDED.correct,
+                   last_answered_at = GREATEST(topic_mastery.last_answered_at, EXCLUDED.last_answered_at),
+                   updated_at = NOW()""",
+            {
+                'student_id': student_id, 'subject': subject, 'num_questions': num_questions,
+                'score': score, 'topics': ", ".join(topic_list), 'topic_list': topic_list,
+                'question_ids': [a.get('question_id') for a in answers],
+                'answer_topics': [a['topic'] for a in answers],
+                'chosen': [a.get('chosen_option') for a in answers],
+                'correct': [bool(a['is_correct']) for a in answers],
+                'time_ms': [a.get('time_taken_ms') for a in answers],
+                'alpha': MASTERY_ALPHA, 'prior': MASTERY_PRIOR
+            }
+        )
         conn.commit()
+        cur.close()
+
+def get_quiz_results(student_id, limit=10):
+    """Get recent quiz results for a student"""
+    with get_connection() as conn:
+        cur = conn.cursor()
         
         cur.execute(
             """SELECT subject, num_questions, score, topics, created_at 
                FROM quiz_results 
-               WHERE student_name = %s AND grade = %s 
+               WHERE student_id = %s 
                ORDER BY created_at DESC 
                LIMIT %s""",
-            (name, grade, limit)
+            (student_id, limit)
         )
         results = cur.fetchall()
         cur.close()
         
         return [dict(r) for r in results]
-    finally:
-        if conn:
-            conn.close()
 
-def get_quiz_stats(name, grade):
-    """Get quiz statistics for a student"""
-    conn = None
-    try:
-        conn = get_db_connection()
+def _quiz_topics(row, syllabus_index):
+    """Topics a quiz_results row covered: topic_list, or older rows' topics resolved against the syllabus"""
+    if row['topic_list'] is not None:
+        return row['topic_list']
+    return syllabus_index.split_topics(row['grade'], row['topics'])
+
+def get_topic_quiz_scores(student_ids, days=90, syllabus_index=None):
+    """
+    Average quiz percentage per topic over the last `days`, as {student_id: {topic: pct}}.
+    A quiz's score counts towards every topic it covered.
+    """
+    syllabus_index = syllabus_index or syllabus.get_syllabus()
+    with get_connection() as conn:
         cur = conn.cursor()
         
-        # Ensure table exists
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                num_questions INTEGER,
-                score INTEGER,
-                topics TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
+        cur.execute(
+            """SELECT student_id, grade, topics, topic_list,
+                      CAST(score AS FLOAT) / NULLIF(num_questions, 0) * 100 AS percentage
+               FROM quiz_results
+               WHERE student_id = ANY(%s)
+                 AND created_at >= NOW() - make_interval(days => %s)""",
+            (list(student_ids), days)
+        )
+        totals = {}
+        for row in cur.fetchall():
+            if row['percentage'] is None:
+                continue
+            for topic in set(_quiz_topics(row, syllabus_index)):
+                entry = totals.setdefault(row['student_id'], {}).setdefault(topic, [0.0, 0])
+                entry[0] += row['percentage']
+                entry[1] += 1
+        cur.close()
+        
+        return {
+            sid: {topic: total / count for topic, (total, count) in topics.items()}
+            for sid, topics in totals.items()
+        }
+
+def get_topic_mastery(student_ids, subject=None):
+    """
+    Current mastery (0-1) per topic from the topic_mastery table, as
+    {student_id: {topic: {'subject', 'mastery', 'attempts', 'correct', 'last_answered_at'}}}.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
         
         cur.execute(
-            """SELECT 
-                COUNT(*) as total_quizzes,
-                AVG(CAST(score AS FLOAT) / CAST(num_questions AS FLOAT) * 100) as avg_percentage
-               FROM quiz_results 
-               WHERE student_name = %s AND grade = %s""",
-            (name, grade)
+            """SELECT student_id, subject, topic, mastery, attempts, correct, last_answered_at
+               FROM topic_mastery
+               WHERE student_id = ANY(%s) AND (%s::varchar IS NULL OR subject = %s)""",
+            (list(student_ids), subject, subject)
         )
-        stats = cur.fetchone()
+        mastery = {}
+        for row in cur.fetchall():
+            mastery.setdefault(row.pop('student_id'), {})[row.pop('topic')] = dict(row)
         cur.close()
         
-        return dict(stats) if stats else {"total_quizzes": 0, "avg_percentage": 0}
-    finally:
-        if conn:
-            conn.close()
+        return mastery
 
-# Bulk loading for parent dashboard (optimized)
-def get_student_dashboard_data(student_list):
+# Quiz question bank operations
+def sample_quiz_questions(grade, subject, difficulty, topic_counts):
     """
-    Load all dashboard data for multiple students in one connection.
-    Much faster than calling individual functions.
+    Random questions from the bank, up to the requested count per topic, in one query.
     
     Args:
-        student_list: List of tuples [(name, grade), ...]
+        topic_counts: Dict of topic -> number of questions wanted
     
     Returns:
-        Dictionary with all data for each student
+        List of question dicts (id, topic, question, options, correct_answer, explanation)
     """
-    conn = None
-    try:
-        conn = get_db_connection()
+    topics = [t for t, n in topic_counts.items() if n > 0]
+    if not topics:
+        return []
+    
+    with get_connection() as conn:
         cur = conn.cursor()
         
-        # Ensure quiz_results table exists
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id SERIAL PRIMARY KEY,
-                student_name VARCHAR(100),
-                grade VARCHAR(20),
-                subject VARCHAR(50),
-                num_questions INTEGER,
-                score INTEGER,
-                topics TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-        
-        result = {}
+        cur.execute(
+            """SELECT b.id, b.topic, b.question, b.options, b.correct_answer, b.explanation
+               FROM (
+                   SELECT q.*, ROW_NUMBER() OVER (PARTITION BY q.topic ORDER BY random()) AS rn
+                   FROM quiz_questions q
+                   WHERE q.grade = %s AND q.subject = %s AND q.difficulty = %s AND q.topic = ANY(%s)
+               ) b
+               JOIN unnest(%s::text[], %s::int[]) AS wanted(topic, n) ON wanted.topic = b.topic
+               WHERE b.rn <= wanted.n""",
+            (grade, subject, difficulty, topics, topics, [topic_counts[t] for t in topics])
+        )
+        questions = cur.fetchall()
+        cur.close()
         
-        for name, grade in student_list:
-            # Get/create student
-            cur.execute(
-                "SELECT * FROM students WHERE student_name = %s AND grade = %s",
-                (name, grade)
-            )
-            student_data = cur.fetchone()
-            
-            if not student_data:
-                cur.execute(
-                    "INSERT INTO students (student_name, grade) VALUES (%s, %s) RETURNING *",
-                    (name, grade)
-                )
-                student_data = cur.fetchone()
-                conn.commit()
-            
-            # Get completed topics
-            cur.execute(
-                "SELECT topic, subject FROM completed_topics WHERE student_name = %s AND grade = %s",
-                (name, grade)
-            )
-            completed_topics = cur.fetchall()
-            
-            # Get total study hours (convert minutes to hours)
-            cur.execute(
-                "SELECT COALESCE(SUM(duration_minutes), 0) as total FROM study_sessions WHERE student_name = %s AND grade = %s",
-                (name, grade)
-            )
-            hours_result = cur.fetchone()
-            total_hours = (hours_result['total'] / 60.0) if hours_result else 0
-            
-            # Get quiz stats
-            cur.execute(
-                """SELECT 
-                    COUNT(*) as total_quizzes,
-                    AVG(CAST(score AS FLOAT) / CAST(num_questions AS FLOAT) * 100) as avg_percentage
-                   FROM quiz_results 
-                   WHERE student_name = %s AND grade = %s""",
-                (name, grade)
-            )
-            quiz_stats_result = cur.fetchone()
-            quiz_stats = dict(quiz_stats_result) if quiz_stats_result else {"total_quizzes": 0, "avg_percentage": 0}
-            
-            # Store all data for this student
-            result[f"{name}_{grade}"] = {
-                'student_data': dict(student_data) if student_data else None,
-                'completed_topics': [dict(t) for t in completed_topics],
-                'total_hours': total_hours,
-                'quiz_stats': quiz_stats
-            }
+        return [dict(q) for q in questions]
+
+def add_quiz_questions(grade, subject, difficulty, questions, source='llm'):
+    """
+    Store generated questions in the bank, skipping ones already there.
+    
+    Args:
+        questions: Dicts with topic, question, options, correct_answer, explanation, content_hash
+    
+    Returns:
+        The stored questions with their bank ids (existing ids for duplicates);
+        'new' is True for the questions this call inserted
+    """
+    if not questions:
+        return []
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
         
+        rows = [
+            (grade, subject, q['topic'], difficulty, q['question'], json.dumps(q['options']),
+             q['correct_answer'], q.get('explanation'), q['content_hash'], source)
+            for q in questions
+        ]
+        # Only inserted rows come back; duplicates skipped by DO NOTHING return nothing
+        inserted = execute_values(
+            cur,
+            """INSERT INTO quiz_questions (grade, subject, topic, difficulty, question, options,
+                                          correct_answer, explanation, content_hash, source)
+               VALUES %s
+               ON CONFLICT (content_hash) DO NOTHING
+               RETURNING content_hash""",
+            rows,
+            template="(%s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s)",
+            fetch=True
+        )
+        inserted = {row['content_hash'] for row in inserted}
+        cur.execute(
+            """SELECT id, topic, question, options, correct_answer, explanation, content_hash
+               FROM quiz_questions WHERE content_hash = ANY(%s)""",
+            ([q['content_hash'] for q in questions],)
+        )
+        stored = {row['content_hash']: dict(row, new=row['content_hash'] in inserted) for row in cur.fetchall()}
+        conn.commit()
         cur.close()
-        return result
         
-    finally:
-        if conn:
-            conn.close()
+        return [stored[q['content_hash']] for q in questions if q['content_hash'] in stored]
 
-# Preset content operations
-def populate_preset_content(syllabus_data):
-    """Populate preset topics from syllabus data (one-time operation)"""
-    conn = None
-    try:
-        conn = get_db_connection()
+def get_quiz_bank_counts(grade, subject, difficulty, topics):
+    """Questions in the bank per topic, as {topic: count} (0 for empty buckets)"""
+    with get_connection() as conn:
         cur = conn.cursor()
         
-        # Check if already populated
-        cur.execute("SELECT COUNT(*) as count FROM preset_topics")
-        result = cur.fetchone()
-        if result['count'] > 0:
-            cur.close()
-            return False  # Already populated
+        cur.execute(
+            """SELECT topic, COUNT(*) AS count FROM quiz_questions
+               WHERE grade = %s AND subject = %s AND difficulty = %s AND topic = ANY(%s)
+               GROUP BY topic""",
+            (grade, subject, difficulty, list(topics))
+        )
+        counts = {t: 0 for t in topics}
+        counts.update({row['topic']: row['count'] for row in cur.fetchall()})
+        cur.close()
         
-        # Define difficulty and estimated hours for topics
-        hours_mapping = {
-            "Easy": 1.0,
-            "Medium": 1.5,
-            "Hard": 2.0
-        }
+        return counts
+
+def get_quiz_bank_fill():
+    """Questions per bucket across the whole bank, as {(grade, subject, topic, difficulty): count}"""
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-        # Auto-assign difficulty based on grade level
-        def auto_assign_difficulty(grade_str, num_topics):
-            """Assign difficulty mix based on grade level"""
-            grade_num = int(grade_str.replace("Grade ", ""))
-            
-            if grade_num <= 2:
-                # Grades 1-2: Mostly Easy
-                return ["Easy"] * num_topics
-            elif grade_num <= 4:
-                # Grades 3-4: Mix of Easy and Medium
-                pattern = ["Easy", "Medium"] * (num_topics // 2)
-                if num_topics % 2:
-                    pattern.append("Easy")
-                return pattern[:num_topics]
-            elif grade_num <= 6:
-                # Grades 5-6: Mostly Medium with some Hard
-                pattern = ["Medium", "Medium", "Hard"] * (num_topics // 3)
-                pattern.extend(["Medium"] * (num_topics % 3))
-                return pattern[:num_topics]
-            elif grade_num <= 8:
-                # Grades 7-8: Medium and Hard
-                pattern = ["Medium", "Hard"] * (num_topics // 2)
-                if num_topics % 2:
-                    pattern.append("Medium")
-                return pattern[:num_topics]
-            else:
-                # Grades 9-12: Mostly Hard with some Medium
-                pattern = ["Hard", "Hard", "Medium"] * (num_topics // 3)
-                pattern.extend(["Hard"] * (num_topics % 3))
-                return pattern[:num_topics]
-        
-        # Insert topics
-        for grade, subjects in syllabus_data.items():
-            for subject, topics in subjects.items():
-                difficulties = auto_assign_difficulty(grade, len(topics))
-                for i, topic in enumerate(topics):
-                    difficulty = difficulties[i]
-                    estimated_hours = hours_mapping.get(difficulty, 1.5)
-                    
-                    cur.execute(
-                        """INSERT INTO preset_topics (grade, subject, topic, difficulty, estimated_hours)
-                           VALUES (%s, %s, %s, %s, %s)""",
-                        (grade, subject, topic, difficulty, estimated_hours)
-                    )
+        cur.execute(
+            """SELECT grade, subject, topic, difficulty, COUNT(*) AS count
+               FROM quiz_questions GROUP BY grade, subject, topic, difficulty"""
+        )
+        fill = {(r['grade'], r['subject'], r['topic'], r['difficulty']): r['count'] for r in cur.fetchall()}
+        cur.close()
+        
+        return fill
+
+def get_recent_quiz_demand(days=14, syllabus_index=None):
+    """Quizzes taken per topic recently, as {(grade, subject, topic): count}"""
+    syllabus_index = syllabus_index or syllabus.get_syllabus()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(
+            """SELECT grade, subject, topics, topic_list
+               FROM quiz_results
+               WHERE created_at >= NOW() - make_interval(days => %s)""",
+            (days,)
+        )
+        demand = {}
+        for row in cur.fetchall():
+            for topic in set(_quiz_topics(row, syllabus_index)):
+                key = (row['grade'], row['subject'], topic)
+                demand[key] = demand.get(key, 0) + 1
+        cur.close()
+        
+        return demand
+
+def get_quiz_stats(student_id):
+    """Get quiz statistics for a student (from the rollup row)"""
+    return _quiz_stats_from_rollup(get_student_rollup(student_id))
+
+def _quiz_stats_from_rollup(rollup):
+    """Shape rollup quiz columns like the old COUNT/AVG query"""
+    quiz_count = rollup['quiz_count']
+    return {
+        "total_quizzes": quiz_count,
+        "avg_percentage": rollup['quiz_percentage_sum'] / quiz_count if quiz_count else None
+    }
+
+# Rollup operations
+EMPTY_ROLLUP = {
+    'total_minutes': 0,
+    'session_count': 0,
+    'topics_completed': 0,
+    'quiz_count': 0,
+    'quiz_percentage_sum': 0.0,
+    'last_session_at': None,
+    'last_quiz_at': None,
+    'streak_days': 0,
+    'longest_streak': 0,
+    'streak_last_date': None,
+    'current_streak': 0
+}
+
+# Rollup columns plus the live streak: the stored run only counts if it reached yesterday or today
+ROLLUP_SELECT = """
+    SELECT *,
+           CASE WHEN streak_last_date >= CURRENT_DATE - 1 THEN streak_days ELSE 0 END AS current_streak
+    FROM student_rollups
+"""
+
+# Gaps-and-islands over distinct study dates: date minus row_number is constant within a run
+STREAK_RECOMPUTE_SQL = """
+    WITH days AS (
+        SELECT DISTINCT student_id, created_at::date AS study_date
+        FROM study_sessions
+        WHERE student_id IS NOT NULL
+          AND (%(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[]))
+    ), islands AS (
+        SELECT student_id, study_date,
+               study_date - CAST(ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY study_date) AS INTEGER) AS island
+        FROM days
+    ), runs AS (
+        SELECT student_id, COUNT(*) AS run_length, MAX(study_date) AS run_end
+        FROM islands GROUP BY student_id, island
+    ), latest AS (
+        SELECT DISTINCT ON (student_id) student_id, run_length, run_end,
+               MAX(run_length) OVER (PARTITION BY student_id) AS longest
+        FROM runs ORDER BY student_id, run_end DESC
+    )
+    UPDATE student_rollups r
+    SET streak_days = COALESCE(l.run_length, 0),
+        longest_streak = COALESCE(l.longest, 0),
+        streak_last_date = l.run_end,
+        updated_at = NOW()
+    FROM student_rollups target
+    LEFT JOIN latest l ON l.student_id = target.student_id
+    WHERE r.student_id = target.student_id
+      AND (%(ids)s::int[] IS NULL OR target.student_id = ANY(%(ids)s::int[]))
+"""
+
+def get_student_rollup(student_id):
+    """Single-row primary-key lookup of a student's aggregate metrics"""
+    return get_student_rollups([student_id])[student_id]
+
+def get_student_rollups(student_ids):
+    """
+    Aggregate metrics for many students in one query.
+    Students without any activity yet get EMPTY_ROLLUP values.
+    """
+    student_ids = list(student_ids)
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(ROLLUP_SELECT + " WHERE student_id = ANY(%s)", (student_ids,))
+        rows = {r['student_id']: dict(r) for r in cur.fetchall()}
+        cur.close()
+    
+    return {
+        student_id: rows.get(student_id, dict(EMPTY_ROLLUP, student_id=student_id))
+        for student_id in student_ids
+    }
+
+def rebuild_student_rollups(student_ids=None):
+    """
+    Recompute student_rollups, daily activity, topic mastery and streaks from the raw progress tables.
+    
+    Args:
+        student_ids: Only rebuild these students (default: every student)
+    
+    Returns:
+        Number of rollup rows written
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(
+            """INSERT INTO student_rollups (student_id, total_minutes, session_count, topics_completed,
+                                            quiz_count, quiz_percentage_sum, last_session_at, last_quiz_at,
+                                            updated_at)
+               SELECT s.id,
+                      COALESCE(ss.total_minutes, 0), COALESCE(ss.session_count, 0),
+                      COALESCE(ct.topics_completed, 0),
+                      COALESCE(q.quiz_count, 0), COALESCE(q.percentage_sum, 0),
+                      ss.last_session_at, q.last_quiz_at, NOW()
+               FROM students s
+               LEFT JOIN (
+                   SELECT student_id, SUM(duration_minutes) AS total_minutes, COUNT(*) AS session_count,
+                          MAX(created_at) AS last_session_at
+                   FROM study_sessions GROUP BY student_id
+               ) ss ON ss.student_id = s.id
+               LEFT JOIN (
+                   SELECT student_id, COUNT(*) AS topics_completed
+                   FROM completed_topics GROUP BY student_id
+               ) ct ON ct.student_id = s.id
+               LEFT JOIN (
+                   SELECT student_id, COUNT(*) AS quiz_count,
+                          SUM(CAST(score AS FLOAT) / NULLIF(num_questions, 0) * 100) AS percentage_sum,
+                          MAX(created_at) AS last_quiz_at
+                   FROM quiz_results GROUP BY student_id
+               ) q ON q.student_id = s.id
+               WHERE %(ids)s::int[] IS NULL OR s.id = ANY(%(ids)s::int[])
+               ON CONFLICT (student_id) DO UPDATE SET
+                   total_minutes = EXCLUDED.total_minutes,
+                   session_count = EXCLUDED.session_count,
+                   topics_completed = EXCLUDED.topics_completed,
+                   quiz_count = EXCLUDED.quiz_count,
+                   quiz_percentage_sum = EXCLUDED.quiz_percentage_sum,
+                   last_session_at = EXCLUDED.last_session_at,
+                   last_quiz_at = EXCLUDED.last_quiz_at,
+                   updated_at = NOW()""",
+            {'ids': list(student_ids) if student_ids is not None else None}
+        )
+        rebuilt = cur.rowcount
+        
+        cur.execute(
+            """DELETE FROM student_daily_activity
+               WHERE %(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[])""",
+            {'ids': list(student_ids) if student_ids is not None else None}
+        )
+        cur.execute(
+            """INSERT INTO student_daily_activity (student_id, activity_date, subject, session_count, minutes)
+               SELECT student_id, created_at::date, COALESCE(subject, ''), COUNT(*), COALESCE(SUM(duration_minutes), 0)
+               FROM study_sessions
+               WHERE student_id IS NOT NULL
+                 AND (%(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[]))
+               GROUP BY student_id, created_at::date, COALESCE(subject, '')""",
+            {'ids': list(student_ids) if student_ids is not None else None}
+        )
+        
+        cur.execute(
+            """DELETE FROM topic_mastery
+               WHERE %(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[])""",
+            {'ids': list(student_ids) if student_ids is not None else None}
+        )
+        # Same EMA as save_quiz_result, replayed over every answer in quiz order
+        cur.execute(
+            """INSERT INTO topic_mastery (student_id, subject, topic, mastery, attempts, correct, last_answered_at)
+               SELECT student_id, subject, topic,
+                      %(prior)s * POWER(1 - %(alpha)s, COUNT(*))
+                      + SUM(CASE WHEN is_correct THEN %(alpha)s * POWER(1 - %(alpha)s, answers_after) ELSE 0 END),
+                      COUNT(*), COUNT(*) FILTER (WHERE is_correct), MAX(created_at)
+               FROM (
+                   SELECT student_id, COALESCE(subject, '') AS subject, topic, is_correct, created_at,
+                          ROW_NUMBER() OVER (PARTITION BY student_id, COALESCE(subject, ''), topic
+                                             ORDER BY created_at DESC, quiz_result_id DESC, position DESC) - 1 AS answers_after
+                   FROM quiz_answers
+                   WHERE %(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[])
+               ) a
+               GROUP BY student_id, subject, topic""",
+            {'ids': list(student_ids) if student_ids is not None else None,
+             'alpha': MASTERY_ALPHA, 'prior': MASTERY_PRIOR}
+        )
+        
+        cur.execute(STREAK_RECOMPUTE_SQL, {'ids': list(student_ids) if student_ids is not None else None})
+        conn.commit()
+        cur.close()
+        
+        return rebuilt
+
+def recompute_streaks(student_ids=None):
+    """
+    Recompute study streaks from session dates in a single pass.
+    Meant for a nightly batch; record_study_session keeps streaks current in between.
+    
+    Args:
+        student_ids: Only recompute these students (default: every student)
+    
+    Returns:
+        Number of rollup rows updated
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
         
+        cur.execute(STREAK_RECOMPUTE_SQL, {'ids': list(student_ids) if student_ids is not None else None})
+        updated = cur.rowcount
         conn.commit()
         cur.close()
-        return True  # Successfully populated
+        
+        return updated
+
+# Bulk loading for parent dashboard (optimized)
+def get_student_dashboard_data(student_list, family_id=None):
+    """
+    Load all dashboard data for multiple students in one connection.
+    Runs a fixed number of set-based queries no matter how many students
+    are requested (students, topic lists and rollups each fetched once).
+    
+    Args:
+        student_list: List of tuples [(name, grade), ...]
+        family_id: The parent's family; students are resolved within it, the
+                   same rows resolve_student gives the child's own view
+    
+    Returns:
+        Dictionary with all data for each student, keyed by f"{name}_{grade}"
+    """
+    requested = list(dict.fromkeys((name, grade) for name, grade in student_list))
+    if not requested:
+        return {}
+    
+    wanted = set(requested)
+    names = list({name for name, _ in requested})
+    grades = list({grade for _, grade in requested})
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        # Resolve canonical students: the lowest id per name/grade, within the family
+        # when one is given (the same row resolve_student picks). Names and grades are
+        # matched independently by ANY(), so rows are filtered back down to the
+        # requested (name, grade) pairs in Python.
+        family_filter = "AND family_id = %s" if family_id else ""
+        cur.execute(
+            f"""SELECT DISTINCT ON (student_name, grade) *
+                FROM students
+                WHERE student_name = ANY(%s) AND grade = ANY(%s) {family_filter}
+                ORDER BY student_name, grade, id""",
+            (names, grades, family_id) if family_id else (names, grades)
+        )
+        students = {(s['student_name'], s['grade']): dict(s) for s in cur.fetchall()
+                    if (s['student_name'], s['grade']) in wanted}
+        
+        # Create any missing students in a single statement, in the parent's family
+        missing = [key for key in requested if key not in students]
+        if missing:
+            cur.execute(
+                """INSERT INTO students (student_name, grade, family_id)
+                   SELECT name, grade, %s FROM unnest(%s::varchar[], %s::varchar[]) AS m(name, grade)
+                   RETURNING *""",
+                (family_id, [name for name, _ in missing], [grade for _, grade in missing])
+            )
+            for s in cur.fetchall():
+                students[(s['student_name'], s['grade'])] = dict(s)
+            conn.commit()
+        
+        # Everything below is looked up by integer id
+        student_ids = [s['id'] for s in students.values()]
+        
+        # Completed topics
+        cur.execute(
+            "SELECT student_id, topic, subject FROM completed_topics WHERE student_id = ANY(%s)",
+            (student_ids,)
+        )
+        topics_by_id = {student_id: [] for student_id in student_ids}
+        for t in cur.fetchall():
+            topics_by_id[t['student_id']].append({'topic': t['topic'], 'subject': t['subject']})
+        
+        # Hours and quiz stats come straight from the rollup rows
+        cur.execute(ROLLUP_SELECT + " WHERE student_id = ANY(%s)", (student_ids,))
+        rollups_by_id = {r['student_id']: dict(r) for r in cur.fetchall()}
+        
+        cur.close()
+    
+    result = {}
+    for name, grade in requested:
+        student_data = students[(name, grade)]
+        student_id = student_data['id']
+        rollup = rollups_by_id.get(student_id, EMPTY_ROLLUP)
+        # students.streak_days is never maintained; the rollup holds the live streak
+        student_data['streak_days'] = rollup['current_streak']
+        result[f"{name}_{grade}"] = {
+            'student_data': student_data,
+            'completed_topics': topics_by_id[student_id],
+            'total_hours': float(rollup['total_minutes']) / 60.0,
+            'quiz_stats': _quiz_stats_from_rollup(rollup)
+        }
+    
+    return result
+
+# Preset content operations
+PRESET_HOURS = {
+    "Easy": 1.0,
+    "Medium": 1.5,
+    "Hard": 2.0
+}
+
+PRESET_COLUMNS = "grade, subject, topic, difficulty, estimated_hours"
+
+def _auto_assign_difficulty(grade_str, num_topics):
+    """Assign difficulty mix based on grade level"""
+    grade_num = int(grade_str.replace("Grade ", ""))
+    
+    if grade_num <= 2:
+        # Grades 1-2: Mostly Easy
+        return ["Easy"] * num_topics
+    elif grade_num <= 4:
+        # Grades 3-4: Mix of Easy and Medium
+        pattern = ["Easy", "Medium"] * (num_topics // 2)
+        if num_topics % 2:
+            pattern.append("Easy")
+        return pattern[:num_topics]
+    elif grade_num <= 6:
+        # Grades 5-6: Mostly Medium with some Hard
+        pattern = ["Medium", "Medium", "Hard"] * (num_topics // 3)
+        pattern.extend(["Medium"] * (num_topics % 3))
+        return pattern[:num_topics]
+    elif grade_num <= 8:
+        # Grades 7-8: Medium and Hard
+        pattern = ["Medium", "Hard"] * (num_topics // 2)
+        if num_topics % 2:
+            pattern.append("Medium")
+        return pattern[:num_topics]
+    else:
+        # Grades 9-12: Mostly Hard with some Medium
+        pattern = ["Hard", "Hard", "Medium"] * (num_topics // 3)
+        pattern.extend(["Hard"] * (num_topics % 3))
+        return pattern[:num_topics]
+
+def _preset_topic_rows(syllabus_data):
+    """(grade, subject, topic, difficulty, estimated_hours) rows, first copy of repeated topics only"""
+    rows = []
+    for grade, subjects in syllabus_data.items():
+        for subject, topics in subjects.items():
+            difficulties = _auto_assign_difficulty(grade, len(topics))
+            seen = set()
+            for topic, difficulty in zip(topics, difficulties):
+                if topic in seen:
+                    continue
+                seen.add(topic)
+                rows.append((grade, subject, topic, difficulty, PRESET_HOURS.get(difficulty, 1.5)))
+    return rows
+
+def _copy_rows(cur, table, columns, rows):
+    """Stream rows into table with COPY FROM STDIN (CSV)"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def populate_preset_content(syllabus_data):
+    """Populate preset topics from syllabus data (one-time operation)"""
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            # Check if already populated
+            cur.execute("SELECT COUNT(*) as count FROM preset_topics")
+            result = cur.fetchone()
+            if result['count'] > 0:
+                cur.close()
+                return False  # Already populated
+            
+            # All topics in one COPY, one transaction
+            _copy_rows(cur, "preset_topics", PRESET_COLUMNS, _preset_topic_rows(syllabus_data))
+            
+            conn.commit()
+            cur.close()
+            return True  # Successfully populated
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Failed to populate preset content: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+
+def sync_preset_content(syllabus_data):
+    """
+    Bring preset_topics in line with the syllabus, touching only what changed.
+    
+    The syllabus is copied into a temp table, then one upsert applies new and
+    changed topics and one delete removes topics no longer in the syllabus.
+    
+    Returns:
+        Dict with inserted, updated and deleted counts
+    """
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            cur.execute(f"""
+                CREATE TEMP TABLE preset_topics_stage ON COMMIT DROP AS
+                SELECT {PRESET_COLUMNS} FROM preset_topics WITH NO DATA
+            """)
+            _copy_rows(cur, "preset_topics_stage", PRESET_COLUMNS, _preset_topic_rows(syllabus_data))
+            
+            # xmax = 0 only for freshly inserted rows, which separates inserts from updates
+            cur.execute(f"""
+                INSERT INTO preset_topics ({PRESET_COLUMNS})
+                SELECT {PRESET_COLUMNS} FROM preset_topics_stage
+                ON CONFLICT (grade, subject, topic) DO UPDATE SET
+                    difficulty = EXCLUDED.difficulty,
+                    estimated_hours = EXCLUDED.estimated_hours
+                WHERE preset_topics.difficulty IS DISTINCT FROM EXCLUDED.difficulty
+                   OR preset_topics.estimated_hours IS DISTINCT FROM EXCLUDED.estimated_hours
+                RETURNING (xmax = 0) AS inserted
+            """)
+            upserted = [row['inserted'] for row in cur.fetchall()]
+            
+            cur.execute("""
+                DELETE FROM preset_topics p
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM preset_topics_stage s
+                    WHERE s.grade = p.grade AND s.subject = p.subject AND s.topic = p.topic
+                )
+            """)
+            deleted = cur.rowcount
+            
+            conn.commit()
+            cur.close()
+            
+            return {
+                'inserted': sum(1 for inserted in upserted if inserted),
+                'updated': sum(1 for inserted in upserted if not inserted),
+                'deleted': deleted
+            }
+    except Exception as e:
+        raise Exception(f"Failed to sync preset content: {str(e)}")
+
+@st.cache_resource
+def ensure_preset_content(_syllabus_data):
+    """Sync preset topics with the syllabus once per process"""
+    return sync_preset_content(_syllabus_data)
 
 def get_preset_topics(grade, subject=None, difficulty=None):
     """Get preset topics filtered by grade, subject, and/or difficulty"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         query = "SELECT * FROM preset_topics WHERE grade = %s"
@@ -906,15 +1536,24 @@ def get_preset_topics(grade, subject=None, difficulty=None):
         cur.close()
         
         return [dict(t) for t in topics]
-    finally:
-        if conn:
-            conn.close()
+
+def get_preset_topics_for_grades(grades):
+    """Preset topics for several grades in one query, in syllabus order"""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(
+            "SELECT * FROM preset_topics WHERE grade = ANY(%s) ORDER BY grade, subject, id",
+            (list(grades),)
+        )
+        topics = cur.fetchall()
+        cur.close()
+        
+        return [dict(t) for t in topics]
 
 def get_preset_topics_count():
     """Get count of preset topics to check if populated"""
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute("SELECT COUNT(*) as count FROM preset_topics")
@@ -922,9 +1561,6 @@ def get_preset_topics_count():
         cur.close()
         
         return result['count'] if result else 0
-    finally:
-        if conn:
-            conn.close()
 
 
 # ============================================
@@ -933,154 +1569,48 @@ def get_preset_topics_count():
 
 def initialize_online_gyaan_db():
     """Initialize database tables for Online Gyaan platform"""
-    conn = None
     try:
-        conn = get_gyaan_db_connection()
-        cur = conn.cursor()
-        
-        # Users table (for all user types)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS gyaan_users (
-                id SERIAL PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                name VARCHAR(200) NOT NULL,
-                user_type VARCHAR(20) NOT NULL,
-                phone VARCHAR(20),
-                grade VARCHAR(20),
-                created_at TIMESTAMP DEFAULT NOW(),
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        # Teachers table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS gyaan_teachers (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES gyaan_users(id),
-                subjects TEXT[],
-                bio TEXT,
-                rating DECIMAL DEFAULT 0,
-                total_classes INTEGER DEFAULT 0,
-                total_students INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Classes table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS gyaan_classes (
-                id SERIAL PRIMARY KEY,
-                title VARCHAR(300) NOT NULL,
-                description TEXT,
-                subject VARCHAR(100),
-                grade VARCHAR(50),
-                teacher_id INTEGER REFERENCES gyaan_teachers(id),
-                class_date DATE NOT NULL,
-                class_time TIME NOT NULL,
-                duration_minutes INTEGER NOT NULL,
-                max_students INTEGER DEFAULT 30,
-                price DECIMAL DEFAULT 0,
-                meeting_link TEXT,
-                status VARCHAR(20) DEFAULT 'scheduled',
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Subscriptions table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS gyaan_subscriptions (
-                id SERIAL PRIMARY KEY,
-                student_id INTEGER REFERENCES gyaan_users(id),
-                class_id INTEGER REFERENCES gyaan_classes(id),
-                subscription_date TIMESTAMP DEFAULT NOW(),
-                payment_status VARCHAR(20) DEFAULT 'pending',
-                payment_id TEXT,
-                UNIQUE(student_id, class_id)
-            )
-        """)
-        
-        # Attendance table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS gyaan_attendance (
-                id SERIAL PRIMARY KEY,
-                student_id INTEGER REFERENCES gyaan_users(id),
-                class_id INTEGER REFERENCES gyaan_classes(id),
-                attended BOOLEAN DEFAULT FALSE,
-                joined_at TIMESTAMP,
-                duration_minutes INTEGER,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Certificates table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS gyaan_certificates (
-                id SERIAL PRIMARY KEY,
-                student_id INTEGER REFERENCES gyaan_users(id),
-                class_id INTEGER REFERENCES gyaan_classes(id),
-                certificate_title TEXT,
-                issued_date DATE DEFAULT CURRENT_DATE,
-                certificate_url TEXT,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        conn.commit()
-        cur.close()
+        ensure_schema()
         return True
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Database initialization failed: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 # User authentication
 def create_gyaan_user(email, password, name, user_type, phone=None, grade=None):
     """Create a new user for Online Gyaan"""
-    conn = None
     try:
         import bcrypt
         password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
         
-        conn = get_gyaan_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute(
-            """INSERT INTO gyaan_users (email, password_hash, name, user_type, phone, grade)
-               VALUES (%s, %s, %s, %s, %s, %s) RETURNING id""",
-            (email.lower(), password_hash, name, user_type, phone, grade)
-        )
-        user_id = cur.fetchone()['id']
-        
-        # If user is a teacher, also create teacher profile
-        if user_type == 'teacher':
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
             cur.execute(
-                """INSERT INTO gyaan_teachers (user_id, subjects, bio)
-                   VALUES (%s, %s, %s) RETURNING id""",
-                (user_id, ['General'], 'New teacher on Online Gyaan')
+                """INSERT INTO gyaan_users (email, password_hash, name, user_type, phone, grade)
+                   VALUES (%s, %s, %s, %s, %s, %s) RETURNING id""",
+                (email.lower(), password_hash, name, user_type, phone, grade)
             )
-        
-        conn.commit()
-        cur.close()
-        
-        return user_id
+            user_id = cur.fetchone()['id']
+            
+            # If user is a teacher, also create teacher profile
+            if user_type == 'teacher':
+                cur.execute(
+                    """INSERT INTO gyaan_teachers (user_id, subjects, bio)
+                       VALUES (%s, %s, %s) RETURNING id""",
+                    (user_id, ['General'], 'New teacher on Online Gyaan')
+                )
+            
+            conn.commit()
+            cur.close()
+            
+            return user_id
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Failed to create user: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 def authenticate_gyaan_user(email, password):
     """Authenticate user login"""
-    conn = None
-    try:
-        import bcrypt
-        conn = get_gyaan_db_connection()
+    import bcrypt
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
@@ -1104,41 +1634,30 @@ def authenticate_gyaan_user(email, password):
                 'grade': result['grade']
             }
         return None
-    finally:
-        if conn:
-            conn.close()
 
 # Class management
 def schedule_class(title, description, subject, grade, teacher_id, class_date, class_time, duration_minutes, max_students, price):
     """Schedule a new class"""
-    conn = None
     try:
-        conn = get_gyaan_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute(
-            """INSERT INTO gyaan_classes (title, description, subject, grade, teacher_id, class_date, class_time, duration_minutes, max_students, price)
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id""",
-            (title, description, subject, grade, teacher_id, class_date, class_time, duration_minutes, max_students, price)
-        )
-        class_id = cur.fetchone()['id']
-        conn.commit()
-        cur.close()
-        
-        return class_id
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            cur.execute(
+                """INSERT INTO gyaan_classes (title, description, subject, grade, teacher_id, class_date, class_time, duration_minutes, max_students, price)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+                (title, description, subject, grade, teacher_id, class_date, class_time, duration_minutes, max_students, price)
+            )
+            class_id = cur.fetchone()['id']
+            conn.commit()
+            cur.close()
+            
+            return class_id
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Failed to schedule class: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 def get_all_classes(status=None, teacher_id=None):
     """Get all classes with optional filters"""
-    conn = None
-    try:
-        conn = get_gyaan_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         query = """
@@ -1165,40 +1684,29 @@ def get_all_classes(status=None, teacher_id=None):
         cur.close()
         
         return [dict(c) for c in classes]
-    finally:
-        if conn:
-            conn.close()
 
 def subscribe_to_class(student_id, class_id, payment_id=None):
     """Subscribe student to a class"""
-    conn = None
     try:
-        conn = get_gyaan_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute(
-            """INSERT INTO gyaan_subscriptions (student_id, class_id, payment_id, payment_status)
-               VALUES (%s, %s, %s, %s) RETURNING id""",
-            (student_id, class_id, payment_id, 'completed' if payment_id else 'pending')
-        )
-        subscription_id = cur.fetchone()['id']
-        conn.commit()
-        cur.close()
-        
-        return subscription_id
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            cur.execute(
+                """INSERT INTO gyaan_subscriptions (student_id, class_id, payment_id, payment_status)
+                   VALUES (%s, %s, %s, %s) RETURNING id""",
+                (student_id, class_id, payment_id, 'completed' if payment_id else 'pending')
+            )
+            subscription_id = cur.fetchone()['id']
+            conn.commit()
+            cur.close()
+            
+            return subscription_id
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Failed to subscribe: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 def get_student_classes(student_id):
     """Get all classes a student is subscribed to"""
-    conn = None
-    try:
-        conn = get_gyaan_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute("""
@@ -1215,15 +1723,10 @@ def get_student_classes(student_id):
         cur.close()
         
         return [dict(c) for c in classes]
-    finally:
-        if conn:
-            conn.close()
 
 def mark_attendance(student_id, class_id, attended=True, duration_minutes=0):
     """Mark student attendance for a class"""
-    conn = None
-    try:
-        conn = get_gyaan_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute(
@@ -1235,15 +1738,10 @@ def mark_attendance(student_id, class_id, attended=True, duration_minutes=0):
         )
         conn.commit()
         cur.close()
-    finally:
-        if conn:
-            conn.close()
 
 def get_class_students(class_id):
     """Get all students enrolled in a class"""
-    conn = None
-    try:
-        conn = get_gyaan_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute("""
@@ -1260,15 +1758,10 @@ def get_class_students(class_id):
         cur.close()
         
         return [dict(s) for s in students]
-    finally:
-        if conn:
-            conn.close()
 
 def get_all_teachers():
     """Get all registered teachers"""
-    conn = None
-    try:
-        conn = get_gyaan_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute("""
@@ -1284,15 +1777,10 @@ def get_all_teachers():
         cur.close()
         
         return [dict(t) for t in teachers]
-    finally:
-        if conn:
-            conn.close()
 
 def get_all_students():
     """Get all registered students"""
-    conn = None
-    try:
-        conn = get_gyaan_db_connection()
+    with get_connection() as conn:
         cur = conn.cursor()
         
         cur.execute("""
@@ -1309,63 +1797,40 @@ def get_all_students():
         cur.close()
         
         return [dict(s) for s in students]
-    finally:
-        if conn:
-            conn.close()
 
 def update_teacher_profile(teacher_id, subjects=None, bio=None, experience=None, qualifications=None):
     """Update teacher profile information"""
-    conn = None
     try:
-        conn = get_gyaan_db_connection()
-        cur = conn.cursor()
-        
-        # Build update query dynamically based on provided fields
-        updates = []
-        params = []
-        
-        if subjects is not None:
-            updates.append("subjects = %s")
-            params.append(subjects)
-        
-        if bio is not None:
-            updates.append("bio = %s")
-            params.append(bio)
-        
-        # Add experience and qualifications columns if they don't exist
-        # First, check if columns exist and add them
-        cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='gyaan_teachers' AND column_name IN ('experience', 'qualifications')
-        """)
-        existing_cols = [row['column_name'] for row in cur.fetchall()]
-        
-        if 'experience' not in existing_cols:
-            cur.execute("ALTER TABLE gyaan_teachers ADD COLUMN IF NOT EXISTS experience TEXT")
-        if 'qualifications' not in existing_cols:
-            cur.execute("ALTER TABLE gyaan_teachers ADD COLUMN IF NOT EXISTS qualifications TEXT")
-        
-        if experience is not None:
-            updates.append("experience = %s")
-            params.append(experience)
-        
-        if qualifications is not None:
-            updates.append("qualifications = %s")
-            params.append(qualifications)
-        
-        if updates:
-            params.append(teacher_id)
-            query = f"UPDATE gyaan_teachers SET {', '.join(updates)} WHERE id = %s"
-            cur.execute(query, params)
-            conn.commit()
-        
-        cur.close()
-        return True
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            # Build update query dynamically based on provided fields
+            updates = []
+            params = []
+            
+            if subjects is not None:
+                updates.append("subjects = %s")
+                params.append(subjects)
+            
+            if bio is not None:
+                updates.append("bio = %s")
+                params.append(bio)
+            
+            if experience is not None:
+                updates.append("experience = %s")
+                params.append(experience)
+            
+            if qualifications is not None:
+                updates.append("qualifications = %s")
+                params.append(qualifications)
+            
+            if updates:
+                params.append(teacher_id)
+                query = f"UPDATE gyaan_teachers SET {', '.join(updates)} WHERE id = %s"
+                cur.execute(query, params)
+                conn.commit()
+            
+            cur.close()
+            return True
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise Exception(f"Failed to update teacher profile: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool shared by all Streamlit sessions.
+
+    - Keeps between minconn and maxconn open connections
+    - Health-checks connections on checkout (closed flag, SELECT 1 after idling)
+    - Reaps connections idle for longer than max_idle seconds (down to minconn)
+    - Rolls back any open transaction before a connection goes back to the pool
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, max_idle=300,
+                 health_check_after=30, checkout_timeout=10):
+        """
+        Args:
+            connect: Zero-argument callable returning a new DB-API connection
+            minconn: Connections kept open even when idle
+            maxconn: Hard cap on open connections (idle + checked out)
+            max_idle: Seconds an idle connection may live before it is closed
+            health_check_after: Idle seconds after which checkout runs SELECT 1
+            checkout_timeout: Seconds to wait for a free connection at maxconn
+        """
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: need 0 <= minconn <= maxconn and maxconn >= 1")
+
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, last_returned_at), most recent on the right
+        self._size = 0        # open connections, idle + checked out
+        self._closed = False
+
+        for _ in range(minconn):
+            conn = self._connect()
+            self._size += 1
+            self._idle.append((conn, time.monotonic()))
+
+    # Checkout / return
+    def getconn(self):
+        """Check out a healthy connection, opening a new one if below maxconn"""
+        deadline = time.monotonic() + self.checkout_timeout
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+
+                    self._reap_idle()
+
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        conn = None
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                # Open the new connection outside the lock so other sessions aren't blocked on the handshake
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            # Health-check outside the lock too: a slow or dead connection must not stall other
+            # checkouts and returns. The candidate counts as checked out meanwhile.
+            if self._is_healthy(conn, time.monotonic() - returned_at):
+                return conn
+            with self._cond:
+                self._discard(conn)
+                self._cond.notify()
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, resetting any open transaction"""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._reap_idle()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken or conn.closed)
+
+    # Maintenance
+    def closeall(self):
+        """Close idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool occupancy for diagnostics"""
+        with self._cond:
+            return {
+                'open': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max': self.maxconn
+            }
+
+    def _is_healthy(self, conn, idle_seconds):
+        if conn.closed:
+            return False
+        if idle_seconds < self.health_check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reap_idle(self):
+        # Oldest idle connections sit on the left; close them past max_idle, keeping minconn open
+        now = time.monotonic()
+        while self._idle and self._size > self.minconn:
+            conn, returned_at = self._idle[0]
+            if now - returned_at < self.max_idle:
+                break
+            self._idle.popleft()
+            self._discard(conn)
+
+    def _discard(self, conn):
+        self._size -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,195 @@
+"""
+Smart Insights rules for the parent dashboard.
+
+Rules are pure functions over the aggregates returned by
+database.get_student_insights(); they never touch Streamlit or the database.
+Each rule returns zero or more Insight records, and RULES lists them in the
+order they are shown.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+# kind is 'success', 'warning' or 'info' (maps to st.success / st.warning / st.info)
+Insight = namedtuple('Insight', ['kind', 'icon', 'message'])
+
+SUBJECTS = ('Math', 'Science', 'English')
+
+# Thresholds
+IMBALANCE_MINUTES = 200      # max-min subject minutes over 14 days
+QUIZ_TREND_POINTS = 10       # latest-3 vs previous-3 average, in percentage points
+MIN_TREND_QUIZZES = 3
+STRONG_WEEK_SESSIONS = 5
+GOOD_WEEK_SESSIONS = 3
+INACTIVE_DAYS = 7
+NUDGE_DAYS = 3
+SHORT_SESSION_MINUTES = 20
+LONG_SESSION_MINUTES = 90
+
+CACHE_SIZE = 2048
+
+
+# Rules
+def subject_coverage(data, name, now):
+    """Warn about any subject with no sessions in the last 14 days"""
+    recent = data.get('recent_by_subject') or {}
+    return [
+        Insight('warning', '⚠️',
+                f"**No {subject} sessions** logged in the last 2 weeks. Consider adding {subject} study time.")
+        for subject in SUBJECTS if subject not in recent
+    ]
+
+
+def subject_balance(data, name, now):
+    """Flag lopsided study time across subjects, or praise an even spread"""
+    recent = data.get('recent_by_subject') or {}
+    if len(recent) < 2:
+        return []
+
+    minutes = [s['total_minutes'] for s in recent.values()]
+    if max(minutes) - min(minutes) > IMBALANCE_MINUTES:
+        return [Insight('info', '⚖️',
+                        f"**Study time imbalance detected.** {name} is focusing heavily on some subjects. "
+                        f"Try to balance across Math, Science, and English.")]
+    if len(recent) == 3:
+        return [Insight('success', '✨',
+                        f"**Great balance!** {name} is studying all three subjects regularly.")]
+    return []
+
+
+def quiz_trend(data, name, now):
+    """Compare the latest 3 quiz scores with the 3 before them"""
+    recent_avg = data.get('recent_quiz_avg')
+    older_avg = data.get('previous_quiz_avg')
+    if (data.get('recent_quiz_count') or 0) < MIN_TREND_QUIZZES or older_avg is None:
+        return []
+
+    if recent_avg > older_avg + QUIZ_TREND_POINTS:
+        return [Insight('success', '📈',
+                        f"**Quiz performance improving!** Recent average: {recent_avg:.0f}% "
+                        f"(up from {older_avg:.0f}%). Keep up the good work!")]
+    if recent_avg < older_avg - QUIZ_TREND_POINTS:
+        return [Insight('warning', '📉',
+                        f"**Quiz scores declining.** Recent average: {recent_avg:.0f}% "
+                        f"(down from {older_avg:.0f}%). May need more review time.")]
+    return [Insight('info', '📊', f"**Quiz performance steady.** Maintaining {recent_avg:.0f}% average.")]
+
+
+def weekly_consistency(data, name, now):
+    """Grade the number of sessions in the last 7 days"""
+    if not data.get('sessions_30d'):
+        return []
+
+    sessions_7d = data.get('sessions_7d', 0)
+    if sessions_7d >= STRONG_WEEK_SESSIONS:
+        return [Insight('success', '🔥',
+                        f"**Excellent consistency!** {sessions_7d} study sessions in the last week. "
+                        f"{name} is building a strong habit!")]
+    if sessions_7d >= GOOD_WEEK_SESSIONS:
+        return [Insight('info', '👍',
+                        f"**Good progress!** {sessions_7d} sessions this week. Try to aim for 5+ sessions per week.")]
+    if sessions_7d >= 1:
+        return [Insight('warning', '⏰',
+                        f"**Low activity.** Only {sessions_7d} session(s) this week. "
+                        f"Encourage more regular study time.")]
+    return []
+
+
+def inactivity(data, name, now):
+    """Nudge when the last session is several days old"""
+    last_session = data.get('last_session_at')
+    if not data.get('sessions_30d') or not last_session:
+        return []
+
+    days_since = (now.date() - last_session.date()).days
+    if days_since > INACTIVE_DAYS:
+        return [Insight('warning', '🚨',
+                        f"**Inactive for {days_since} days!** Last study session was "
+                        f"{last_session.strftime('%b %d')}. Time to restart the habit!")]
+    if days_since > NUDGE_DAYS:
+        return [Insight('info', '📅',
+                        f"**{days_since} days** since last session. Regular practice is key to retention!")]
+    return []
+
+
+def session_length(data, name, now):
+    """Comment on unusually short or long average sessions"""
+    avg_duration = data.get('avg_duration_30d')
+    if avg_duration is None:
+        return []
+
+    if avg_duration < SHORT_SESSION_MINUTES:
+        return [Insight('info', '⏱️',
+                        f"**Short sessions detected.** Average: {avg_duration:.0f} min. "
+                        f"Consider 30-45 min sessions for better focus.")]
+    if avg_duration > LONG_SESSION_MINUTES:
+        return [Insight('info', '🧠',
+                        f"**Very long sessions.** Average: {avg_duration:.0f} min. "
+                        f"Remember to take breaks to maintain focus!")]
+    return []
+
+
+RULES = [
+    subject_coverage,
+    subject_balance,
+    quiz_trend,
+    weekly_consistency,
+    inactivity,
+    session_length,
+]
+
+
+# Evaluation
+def evaluate(data, name, now, rules=RULES):
+    """
+    Run every rule against one student's aggregates.
+
+    Args:
+        data: One entry of database.get_student_insights()
+        name: Student name used in messages
+        now: Current datetime (passed in so rules stay pure)
+
+    Returns:
+        Tuple of Insight records in display order
+    """
+    results = []
+    for rule in rules:
+        results.extend(rule(data, name, now))
+    return tuple(results)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def evaluate_cached(student_id, data_version, data, name, now):
+    """
+    evaluate() memoized per (student, data_version, day).
+
+    data_version should change whenever the student's sessions or quizzes do
+    (student_rollups.updated_at); the day is part of the key because the
+    7/14/30-day windows and inactivity counts move with the calendar. The
+    aggregates themselves are cached the same way by the app
+    (load_student_insights), so neither the query nor the rules rerun until
+    new sessions or quizzes land.
+    """
+    key = (student_id, data_version, name, now.date())
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    result = evaluate(data, name, now)
+
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def clear_cache():
+    """Drop all memoized results"""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,337 @@
+"""
+Shared OpenAI access for every app in this repo.
+
+All chat completions go through chat() (or stream_chat() for incremental
+output) instead of each app building its own client:
+
+    import llm_gateway
+    reply = llm_gateway.chat(messages, model="gpt-4", temperature=0.1, api_key=api_key)
+    reply.content, reply.source, reply.latency_ms, reply.prompt_tokens
+
+- One OpenAI client per (api key, base url), so connections are pooled;
+  timeouts and retries with backoff are set on the client.
+- Responses are cached by a sha256 of model + messages + parameters: an
+  in-process LRU in front of a SQLite file, both with a TTL. Pass
+  cache=False where a fresh answer is the point (quiz generation, "new
+  idea" buttons).
+- Identical cacheable requests already in flight are coalesced: one call
+  goes to the API and every waiter gets its result.
+- Every call is counted per model (calls, cache hits, tokens, latency);
+  see stats() and recent_calls().
+
+    python llm_gateway.py            # number of cached responses
+    python llm_gateway.py --purge    # drop expired disk cache entries
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+DEFAULT_MODEL = "gpt-4"
+TIMEOUT_SECONDS = 60
+MAX_RETRIES = 3
+
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+MEMORY_CACHE_SIZE = 512
+# Empty LLM_CACHE_PATH disables the disk tier
+CACHE_PATH = os.getenv("LLM_CACHE_PATH",
+                       os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite3"))
+RECENT_CALLS = 200
+
+# source is 'llm', 'memory', 'disk' or 'coalesced'
+ChatResult = namedtuple('ChatResult', ['content', 'model', 'source', 'latency_ms',
+                                       'prompt_tokens', 'completion_tokens'])
+CallRecord = namedtuple('CallRecord', ['at', 'model', 'source', 'latency_ms',
+                                       'prompt_tokens', 'completion_tokens'])
+
+
+# Clients
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key=None, base_url=None):
+    """Process-wide OpenAI client for this key and endpoint (also for audio and other APIs)"""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=api_key, base_url=base_url,
+                            timeout=TIMEOUT_SECONDS, max_retries=MAX_RETRIES)
+            _clients[(api_key, base_url)] = client
+        return client
+
+
+# Cache
+def cache_key(model, messages, params, base_url=None):
+    """Content address of a request: sha256 of model, messages, parameters and endpoint"""
+    payload = json.dumps([model, messages, params, base_url], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _MemoryCache:
+    """Bounded LRU of key -> (expires_at, value)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class _DiskCache:
+    """SQLite tier shared by every process on the host; failures only cost a cache miss"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _connection(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_responses (
+                       key TEXT PRIMARY KEY,
+                       model TEXT,
+                       response TEXT NOT NULL,
+                       expires_at REAL NOT NULL
+                   )"""
+            )
+        return self.conn
+
+    def get(self, key, now):
+        if not self.path:
+            return None
+        try:
+            with self.lock:
+                row = self._connection().execute(
+                    "SELECT response FROM llm_responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, model, value, expires_at):
+        if not self.path:
+            return
+        try:
+            with self.lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, model, response, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, model, json.dumps(value), expires_at)
+                )
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def count(self):
+        with self.lock:
+            return self._connection().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def purge(self, now):
+        """Delete expired entries; returns (deleted, remaining)"""
+        if not self.path:
+            return 0, 0
+        with self.lock:
+            conn = self._connection()
+            deleted = conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (now,)).rowcount
+            conn.commit()
+            remaining = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        return deleted, remaining
+
+
+_memory = _MemoryCache(MEMORY_CACHE_SIZE)
+_disk = _DiskCache(CACHE_PATH)
+
+
+def clear_memory_cache():
+    """Drop the in-process tier (the disk tier expires by TTL)"""
+    _memory.clear()
+
+
+# Request coalescing
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _coalesce(key, call):
+    """Run call() once per key at a time; concurrent callers wait for and share its result"""
+    with _in_flight_lock:
+        pending = _in_flight.get(key)
+        leader = pending is None
+        if leader:
+            pending = _in_flight[key] = _InFlight()
+
+    if not leader:
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result, True
+
+    try:
+        pending.result = call()
+        return pending.result, False
+    except Exception as e:
+        pending.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+        pending.done.set()
+
+
+# Accounting
+_totals = {}
+_recent = deque(maxlen=RECENT_CALLS)
+_stats_lock = threading.Lock()
+
+
+def _record(model, source, latency_ms, prompt_tokens, completion_tokens):
+    with _stats_lock:
+        totals = _totals.setdefault(model, {
+            'calls': 0, 'api_calls': 0, 'cache_hits': 0, 'coalesced': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'api_latency_ms': 0.0
+        })
+        totals['calls'] += 1
+        if source == 'llm':
+            totals['api_calls'] += 1
+            totals['prompt_tokens'] += prompt_tokens or 0
+            totals['completion_tokens'] += completion_tokens or 0
+            totals['api_latency_ms'] += latency_ms
+        elif source == 'coalesced':
+            totals['coalesced'] += 1
+        else:
+            totals['cache_hits'] += 1
+        _recent.append(CallRecord(time.time(), model, source, latency_ms, prompt_tokens, completion_tokens))
+
+
+def stats():
+    """Per-model totals since process start, as {model: {calls, api_calls, cache_hits, ...}}"""
+    with _stats_lock:
+        return {model: dict(totals) for model, totals in _totals.items()}
+
+
+def recent_calls(limit=50):
+    """The most recent CallRecords, newest first"""
+    with _stats_lock:
+        return list(_recent)[::-1][:limit]
+
+
+# Chat completions
+def chat(messages, model=DEFAULT_MODEL, cache=True, ttl=CACHE_TTL_SECONDS, api_key=None, base_url=None, **params):
+    """
+    One chat completion through the shared client and cache.
+
+    Args:
+        messages: OpenAI chat messages
+        cache: Read and write the response cache (and coalesce identical calls)
+        params: Passed to chat.completions.create (temperature, max_tokens, ...)
+
+    Returns:
+        ChatResult
+    """
+    start = time.perf_counter()
+
+    def call_api():
+        response = get_client(api_key, base_url).chat.completions.create(model=model, messages=messages, **params)
+        usage = response.usage
+        return {
+            'content': response.choices[0].message.content,
+            'prompt_tokens': usage.prompt_tokens if usage else None,
+            'completion_tokens': usage.completion_tokens if usage else None
+        }
+
+    if not cache:
+        value, source = call_api(), 'llm'
+    else:
+        key = cache_key(model, messages, params, base_url)
+        now = time.time()
+        value, source = _memory.get(key, now), 'memory'
+        if value is None:
+            value, source = _disk.get(key, now), 'disk'
+            if value is not None:
+                _memory.set(key, value, now + ttl)
+        if value is None:
+            value, shared = _coalesce(key, call_api)
+            source = 'coalesced' if shared else 'llm'
+            if not shared:
+                expires_at = time.time() + ttl
+                _memory.set(key, value, expires_at)
+                _disk.set(key, model, value, expires_at)
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    _record(model, source, latency_ms, value['prompt_tokens'], value['completion_tokens'])
+    return ChatResult(value['content'], model, source, latency_ms, value['prompt_tokens'], value['completion_tokens'])
+
+
+def stream_chat(messages, model=DEFAULT_MODEL, api_key=None, base_url=None, **params):
+    """
+    Streaming chat completion through the shared client: yields text as it
+    arrives. Not cached; latency (to the last chunk) and tokens are recorded
+    once the stream is finished.
+    """
+    start = time.perf_counter()
+    stream = get_client(api_key, base_url).chat.completions.create(
+        model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+    )
+    usage = None
+    for chunk in stream:
+        if getattr(chunk, 'usage', None):
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+    _record(model, 'llm', (time.perf_counter() - start) * 1000,
+            usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the shared LLM response cache")
+    parser.add_argument("--purge", action="store_true", help="Delete expired disk cache entries")
+    args = parser.parse_args()
+
+    if not CACHE_PATH:
+        print("Disk cache disabled (LLM_CACHE_PATH is empty)")
+    elif args.purge:
+        deleted, remaining = _disk.purge(time.time())
+        print(f"Purged {deleted} expired responses; {remaining} left in {CACHE_PATH}")
+    else:
+        print(f"{_disk.count()} cached responses in {CACHE_PATH}")
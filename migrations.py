@@ -0,0 +1,591 @@
+"""
+Versioned schema migrations for the Olympic Planner / Online Gyaan database.
+
+Each migration is applied once and recorded in the schema_version table.
+All pending migrations run in a single transaction guarded by an advisory
+lock, so concurrent app processes starting together can't race each other.
+
+Run once per deployment:
+    python migrations.py
+    python migrations.py --rebuild-rollups   # also recompute student_rollups
+    python migrations.py --recompute-streaks # nightly streak recomputation
+The apps also call database.ensure_schema(), which runs this once per process.
+"""
+
+# Arbitrary constant shared by every process that runs migrations
+MIGRATION_LOCK_ID = 724_311_001
+
+# (version, description, [SQL statements]) - append only, never edit an applied step
+MIGRATIONS = [
+    (1, "Olympic Planner base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS families (
+            family_id SERIAL PRIMARY KEY,
+            family_name VARCHAR(100),
+            parent_email VARCHAR(255) UNIQUE NOT NULL,
+            parent_password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS students (
+            id SERIAL PRIMARY KEY,
+            student_name VARCHAR(100) NOT NULL,
+            grade VARCHAR(20) NOT NULL,
+            total_hours DECIMAL DEFAULT 0,
+            streak_days INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        "ALTER TABLE students ADD COLUMN IF NOT EXISTS family_id INTEGER REFERENCES families(family_id)",
+        # Multi-tenant: (student_name, grade) is only unique within a family
+        "ALTER TABLE students DROP CONSTRAINT IF EXISTS students_student_name_grade_key",
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = 'students_name_grade_family_unique'
+            ) THEN
+                ALTER TABLE students ADD CONSTRAINT students_name_grade_family_unique
+                UNIQUE (student_name, grade, family_id);
+            END IF;
+        END $$;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS completed_topics (
+            id SERIAL PRIMARY KEY,
+            student_name VARCHAR(100),
+            grade VARCHAR(20),
+            topic TEXT,
+            subject VARCHAR(50),
+            completed_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS study_sessions (
+            id SERIAL PRIMARY KEY,
+            student_name VARCHAR(100),
+            grade VARCHAR(20),
+            subject VARCHAR(50),
+            topics TEXT,
+            duration_minutes INTEGER,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS weekly_plans (
+            id SERIAL PRIMARY KEY,
+            student_name VARCHAR(100),
+            grade VARCHAR(20),
+            week_start DATE,
+            day_of_week VARCHAR(20),
+            subjects TEXT[],
+            topics TEXT[],
+            created_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE(student_name, grade, week_start, day_of_week)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS quiz_results (
+            id SERIAL PRIMARY KEY,
+            student_name VARCHAR(100),
+            grade VARCHAR(20),
+            subject VARCHAR(50),
+            score INTEGER,
+            num_questions INTEGER,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS preset_topics (
+            id SERIAL PRIMARY KEY,
+            grade VARCHAR(20),
+            subject VARCHAR(50),
+            topic TEXT,
+            difficulty VARCHAR(20),
+            estimated_hours DECIMAL,
+            description TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS mock_tests (
+            id SERIAL PRIMARY KEY,
+            grade VARCHAR(20),
+            subject VARCHAR(50),
+            test_name TEXT,
+            questions JSONB,
+            difficulty VARCHAR(20)
+        )
+        """
+    ]),
+    (2, "quiz_results.topics column", [
+        # Previously only created by the per-request DDL in save_quiz_result
+        "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS topics TEXT"
+    ]),
+    (3, "Unique completed topic per student", [
+        # mark_topic_completed relies on ON CONFLICT (student_name, grade, subject, topic)
+        """
+        DELETE FROM completed_topics a
+        USING completed_topics b
+        WHERE a.id > b.id
+          AND a.student_name = b.student_name AND a.grade = b.grade
+          AND a.subject = b.subject AND a.topic = b.topic
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS completed_topics_student_topic_unique
+        ON completed_topics (student_name, grade, subject, topic)
+        """
+    ]),
+    (4, "Online Gyaan base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS gyaan_users (
+            id SERIAL PRIMARY KEY,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            name VARCHAR(200) NOT NULL,
+            user_type VARCHAR(20) NOT NULL,
+            phone VARCHAR(20),
+            grade VARCHAR(20),
+            created_at TIMESTAMP DEFAULT NOW(),
+            is_active BOOLEAN DEFAULT TRUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS gyaan_teachers (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES gyaan_users(id),
+            subjects TEXT[],
+            bio TEXT,
+            rating DECIMAL DEFAULT 0,
+            total_classes INTEGER DEFAULT 0,
+            total_students INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS gyaan_classes (
+            id SERIAL PRIMARY KEY,
+            title VARCHAR(300) NOT NULL,
+            description TEXT,
+            subject VARCHAR(100),
+            grade VARCHAR(50),
+            teacher_id INTEGER REFERENCES gyaan_teachers(id),
+            class_date DATE NOT NULL,
+            class_time TIME NOT NULL,
+            duration_minutes INTEGER NOT NULL,
+            max_students INTEGER DEFAULT 30,
+            price DECIMAL DEFAULT 0,
+            meeting_link TEXT,
+            status VARCHAR(20) DEFAULT 'scheduled',
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS gyaan_subscriptions (
+            id SERIAL PRIMARY KEY,
+            student_id INTEGER REFERENCES gyaan_users(id),
+            class_id INTEGER REFERENCES gyaan_classes(id),
+            subscription_date TIMESTAMP DEFAULT NOW(),
+            payment_status VARCHAR(20) DEFAULT 'pending',
+            payment_id TEXT,
+            UNIQUE(student_id, class_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS gyaan_attendance (
+            id SERIAL PRIMARY KEY,
+            student_id INTEGER REFERENCES gyaan_users(id),
+            class_id INTEGER REFERENCES gyaan_classes(id),
+            attended BOOLEAN DEFAULT FALSE,
+            joined_at TIMESTAMP,
+            duration_minutes INTEGER,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS gyaan_certificates (
+            id SERIAL PRIMARY KEY,
+            student_id INTEGER REFERENCES gyaan_users(id),
+            class_id INTEGER REFERENCES gyaan_classes(id),
+            certificate_title TEXT,
+            issued_date DATE DEFAULT CURRENT_DATE,
+            certificate_url TEXT,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """
+    ]),
+    (5, "Teacher profile fields and unique attendance", [
+        # Previously added on every update_teacher_profile call
+        "ALTER TABLE gyaan_teachers ADD COLUMN IF NOT EXISTS experience TEXT",
+        "ALTER TABLE gyaan_teachers ADD COLUMN IF NOT EXISTS qualifications TEXT",
+        # mark_attendance relies on ON CONFLICT (student_id, class_id)
+        """
+        DELETE FROM gyaan_attendance a
+        USING gyaan_attendance b
+        WHERE a.id < b.id AND a.student_id = b.student_id AND a.class_id = b.class_id
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS gyaan_attendance_student_class_unique
+        ON gyaan_attendance (student_id, class_id)
+        """
+    ]),
+    (6, "Integer student_id on progress tables with covering indexes", [
+        # Progress rows have always been shared by (student_name, grade); the lowest
+        # students.id for that pair is the canonical student they now point at.
+        # Legacy progress rows carry no family_id, so this cannot be scoped by family:
+        # where two families have a child with the same name and grade, the legacy
+        # rows go to the lowest id. Rows written since are keyed by the family-scoped
+        # student that resolve_student and get_student_dashboard_data both pick.
+        "CREATE INDEX IF NOT EXISTS students_name_grade_idx ON students (student_name, grade, id)",
+        """
+        INSERT INTO students (student_name, grade)
+        SELECT DISTINCT p.student_name, p.grade
+        FROM (
+            SELECT student_name, grade FROM completed_topics
+            UNION SELECT student_name, grade FROM study_sessions
+            UNION SELECT student_name, grade FROM quiz_results
+            UNION SELECT student_name, grade FROM weekly_plans
+        ) p
+        WHERE p.student_name IS NOT NULL AND p.grade IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM students s
+              WHERE s.student_name = p.student_name AND s.grade = p.grade
+          )
+        """,
+        "ALTER TABLE completed_topics ADD COLUMN IF NOT EXISTS student_id INTEGER REFERENCES students(id) ON DELETE CASCADE",
+        "ALTER TABLE study_sessions ADD COLUMN IF NOT EXISTS student_id INTEGER REFERENCES students(id) ON DELETE CASCADE",
+        "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS student_id INTEGER REFERENCES students(id) ON DELETE CASCADE",
+        "ALTER TABLE weekly_plans ADD COLUMN IF NOT EXISTS student_id INTEGER REFERENCES students(id) ON DELETE CASCADE",
+        """
+        CREATE TEMP TABLE canonical_students ON COMMIT DROP AS
+        SELECT DISTINCT ON (student_name, grade) id, student_name, grade
+        FROM students
+        ORDER BY student_name, grade, id
+        """,
+        """
+        UPDATE completed_topics t SET student_id = c.id FROM canonical_students c
+        WHERE t.student_id IS NULL AND t.student_name = c.student_name AND t.grade = c.grade
+        """,
+        """
+        UPDATE study_sessions t SET student_id = c.id FROM canonical_students c
+        WHERE t.student_id IS NULL AND t.student_name = c.student_name AND t.grade = c.grade
+        """,
+        """
+        UPDATE quiz_results t SET student_id = c.id FROM canonical_students c
+        WHERE t.student_id IS NULL AND t.student_name = c.student_name AND t.grade = c.grade
+        """,
+        """
+        UPDATE weekly_plans t SET student_id = c.id FROM canonical_students c
+        WHERE t.student_id IS NULL AND t.student_name = c.student_name AND t.grade = c.grade
+        """,
+        # Completed topics are now unique per student id (replaces the name/grade index)
+        "DROP INDEX IF EXISTS completed_topics_student_topic_unique",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS completed_topics_student_subject_topic_idx
+        ON completed_topics (student_id, subject, topic)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS study_sessions_student_created_idx
+        ON study_sessions (student_id, created_at DESC) INCLUDE (subject, duration_minutes)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS quiz_results_student_created_idx
+        ON quiz_results (student_id, created_at DESC) INCLUDE (subject, score, num_questions)
+        """,
+        "CREATE INDEX IF NOT EXISTS weekly_plans_student_week_idx ON weekly_plans (student_id, week_start)"
+    ]),
+    (7, "Per-student rollups for hours, topic counts and quiz stats", [
+        # Kept up to date by the write paths in database.py; rebuilt with --rebuild-rollups
+        """
+        CREATE TABLE IF NOT EXISTS student_rollups (
+            student_id INTEGER PRIMARY KEY REFERENCES students(id) ON DELETE CASCADE,
+            total_minutes BIGINT NOT NULL DEFAULT 0,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            topics_completed INTEGER NOT NULL DEFAULT 0,
+            quiz_count INTEGER NOT NULL DEFAULT 0,
+            quiz_percentage_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            last_session_at TIMESTAMP,
+            last_quiz_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        INSERT INTO student_rollups (student_id, total_minutes, session_count, topics_completed,
+                                     quiz_count, quiz_percentage_sum, last_session_at, last_quiz_at)
+        SELECT s.id,
+               COALESCE(ss.total_minutes, 0), COALESCE(ss.session_count, 0),
+               COALESCE(ct.topics_completed, 0),
+               COALESCE(q.quiz_count, 0), COALESCE(q.percentage_sum, 0),
+               ss.last_session_at, q.last_quiz_at
+        FROM students s
+        LEFT JOIN (
+            SELECT student_id, SUM(duration_minutes) AS total_minutes, COUNT(*) AS session_count,
+                   MAX(created_at) AS last_session_at
+            FROM study_sessions GROUP BY student_id
+        ) ss ON ss.student_id = s.id
+        LEFT JOIN (
+            SELECT student_id, COUNT(*) AS topics_completed
+            FROM completed_topics GROUP BY student_id
+        ) ct ON ct.student_id = s.id
+        LEFT JOIN (
+            SELECT student_id, COUNT(*) AS quiz_count,
+                   SUM(CAST(score AS FLOAT) / NULLIF(num_questions, 0) * 100) AS percentage_sum,
+                   MAX(created_at) AS last_quiz_at
+            FROM quiz_results GROUP BY student_id
+        ) q ON q.student_id = s.id
+        ON CONFLICT (student_id) DO NOTHING
+        """
+    ]),
+    (8, "Study streaks on student_rollups", [
+        # streak_days is the length of the most recent run of consecutive study days,
+        # ending on streak_last_date; readers treat it as 0 once a day has been missed.
+        "ALTER TABLE student_rollups ADD COLUMN IF NOT EXISTS streak_days INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE student_rollups ADD COLUMN IF NOT EXISTS longest_streak INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE student_rollups ADD COLUMN IF NOT EXISTS streak_last_date DATE",
+        """
+        WITH days AS (
+            SELECT DISTINCT student_id, created_at::date AS study_date
+            FROM study_sessions WHERE student_id IS NOT NULL
+        ), islands AS (
+            SELECT student_id, study_date,
+                   study_date - CAST(ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY study_date) AS INTEGER) AS island
+            FROM days
+        ), runs AS (
+            SELECT student_id, COUNT(*) AS run_length, MAX(study_date) AS run_end
+            FROM islands GROUP BY student_id, island
+        ), latest AS (
+            SELECT DISTINCT ON (student_id) student_id, run_length, run_end,
+                   MAX(run_length) OVER (PARTITION BY student_id) AS longest
+            FROM runs ORDER BY student_id, run_end DESC
+        )
+        UPDATE student_rollups r
+        SET streak_days = l.run_length, streak_last_date = l.run_end, longest_streak = l.longest
+        FROM latest l
+        WHERE r.student_id = l.student_id
+        """
+    ]),
+    (9, "Daily per-subject activity rollup for insights", [
+        # One row per student, day and subject, upserted with every study session insert.
+        # Insights aggregate the last 30 days of rows instead of scanning raw sessions.
+        """
+        CREATE TABLE IF NOT EXISTS student_daily_activity (
+            student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+            activity_date DATE NOT NULL,
+            subject VARCHAR(50) NOT NULL,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            minutes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, activity_date, subject)
+        )
+        """,
+        """
+        INSERT INTO student_daily_activity (student_id, activity_date, subject, session_count, minutes)
+        SELECT student_id, created_at::date, COALESCE(subject, ''), COUNT(*), COALESCE(SUM(duration_minutes), 0)
+        FROM study_sessions
+        WHERE student_id IS NOT NULL
+        GROUP BY student_id, created_at::date, COALESCE(subject, '')
+        ON CONFLICT (student_id, activity_date, subject) DO NOTHING
+        """
+    ]),
+    (10, "Weekly plans as dated sessions keyed by student_id", [
+        # One row per planned session on a real date, replacing the unused
+        # (week_start, day_of_week, subjects[]) layout the app never wrote to.
+        "ALTER TABLE weekly_plans ADD COLUMN IF NOT EXISTS plan_date DATE",
+        "ALTER TABLE weekly_plans ADD COLUMN IF NOT EXISTS subject VARCHAR(50)",
+        "ALTER TABLE weekly_plans ADD COLUMN IF NOT EXISTS duration_minutes INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE weekly_plans ADD COLUMN IF NOT EXISTS completed BOOLEAN NOT NULL DEFAULT FALSE",
+        """
+        UPDATE weekly_plans
+        SET plan_date = week_start + (array_position(
+                ARRAY['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']::varchar[],
+                day_of_week::varchar) - 1),
+            subject = subjects[1]
+        WHERE plan_date IS NULL
+        """,
+        "DELETE FROM weekly_plans WHERE plan_date IS NULL OR student_id IS NULL",
+        """
+        DO $$
+        DECLARE c TEXT;
+        BEGIN
+            FOR c IN SELECT conname FROM pg_constraint
+                     WHERE conrelid = 'weekly_plans'::regclass AND contype = 'u'
+            LOOP
+                EXECUTE format('ALTER TABLE weekly_plans DROP CONSTRAINT %I', c);
+            END LOOP;
+        END $$
+        """,
+        "ALTER TABLE weekly_plans DROP COLUMN IF EXISTS week_start",
+        "ALTER TABLE weekly_plans DROP COLUMN IF EXISTS day_of_week",
+        "ALTER TABLE weekly_plans DROP COLUMN IF EXISTS subjects",
+        "ALTER TABLE weekly_plans ALTER COLUMN plan_date SET NOT NULL",
+        "ALTER TABLE weekly_plans ALTER COLUMN student_id SET NOT NULL",
+        """
+        CREATE INDEX IF NOT EXISTS weekly_plans_student_date_idx
+        ON weekly_plans (student_id, plan_date) INCLUDE (subject, duration_minutes, completed)
+        """
+    ]),
+    (11, "Unique preset topic per grade and subject", [
+        # sync_preset_content upserts on (grade, subject, topic); the syllabus
+        # repeats a few topic names within a subject, so keep the first copy
+        """
+        DELETE FROM preset_topics a
+        USING preset_topics b
+        WHERE a.grade = b.grade AND a.subject = b.subject AND a.topic = b.topic AND a.id > b.id
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS preset_topics_grade_subject_topic_idx
+        ON preset_topics (grade, subject, topic)
+        """
+    ]),
+    (12, "Quiz question bank", [
+        # Generated questions are kept and reused; content_hash dedupes
+        # the same question generated twice (see quiz_bank.question_hash)
+        """
+        CREATE TABLE IF NOT EXISTS quiz_questions (
+            id SERIAL PRIMARY KEY,
+            grade VARCHAR(20) NOT NULL,
+            subject VARCHAR(50) NOT NULL,
+            topic TEXT NOT NULL,
+            difficulty VARCHAR(20) NOT NULL,
+            question TEXT NOT NULL,
+            options JSONB NOT NULL,
+            correct_answer VARCHAR(1) NOT NULL,
+            explanation TEXT,
+            content_hash CHAR(64) NOT NULL UNIQUE,
+            source VARCHAR(50) DEFAULT 'llm',
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS quiz_questions_bucket_idx
+        ON quiz_questions (grade, subject, topic, difficulty)
+        """
+    ]),
+    (13, "Per-question quiz answers and topic mastery", [
+        # One row per answered question, written together with the quiz_results row
+        """
+        CREATE TABLE IF NOT EXISTS quiz_answers (
+            id BIGSERIAL PRIMARY KEY,
+            quiz_result_id INTEGER NOT NULL REFERENCES quiz_results(id) ON DELETE CASCADE,
+            student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+            question_id INTEGER REFERENCES quiz_questions(id) ON DELETE SET NULL,
+            position SMALLINT NOT NULL,
+            subject VARCHAR(50),
+            topic TEXT NOT NULL,
+            chosen_option VARCHAR(1),
+            is_correct BOOLEAN NOT NULL,
+            time_taken_ms INTEGER,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS quiz_answers_student_topic_idx
+        ON quiz_answers (student_id, topic, created_at)
+        """,
+        # Exponential moving average of correctness per student and topic,
+        # updated by save_quiz_result; rebuilt from quiz_answers with --rebuild-rollups
+        """
+        CREATE TABLE IF NOT EXISTS topic_mastery (
+            student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+            subject VARCHAR(50) NOT NULL,
+            topic TEXT NOT NULL,
+            mastery DOUBLE PRECISION NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            last_answered_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (student_id, subject, topic)
+        )
+        """
+    ]),
+    (14, "quiz_results.topic_list array", [
+        # The comma-joined topics column can't be split back reliably (topic names
+        # contain commas); older rows keep only topics and are resolved against the syllabus
+        "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS topic_list TEXT[]"
+    ])
+]
+
+
+def run_migrations(conn):
+    """
+    Apply all pending migrations in one transaction.
+
+    Returns:
+        List of versions applied by this call (empty if already up to date)
+    """
+    cur = conn.cursor()
+    try:
+        # Serialize concurrent runners; released automatically at commit/rollback
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        cur.execute("SELECT version FROM schema_version")
+        applied = {row['version'] for row in cur.fetchall()}
+
+        newly_applied = []
+        for version, description, statements in MIGRATIONS:
+            if version in applied:
+                continue
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            newly_applied.append(version)
+
+        conn.commit()
+        return newly_applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def current_version(conn):
+    """Highest applied migration version (0 if none)"""
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('schema_version') AS tbl")
+    if cur.fetchone()['tbl'] is None:
+        cur.close()
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+    version = cur.fetchone()['version']
+    cur.close()
+    return version
+
+
+if __name__ == "__main__":
+    import argparse
+    import database as db
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Recompute student_rollups from the raw progress tables")
+    parser.add_argument("--recompute-streaks", action="store_true",
+                        help="Recompute study streaks for every student in one pass (nightly job)")
+    args = parser.parse_args()
+
+    with db.get_connection() as conn:
+        applied = run_migrations(conn)
+        version = current_version(conn)
+
+    if applied:
+        print(f"Applied migrations {applied}; schema is at version {version}")
+    else:
+        print(f"Schema already up to date at version {version}")
+
+    if args.rebuild_rollups:
+        rebuilt = db.rebuild_student_rollups()
+        print(f"Rebuilt rollups for {rebuilt} students")
+    elif args.recompute_streaks:
+        updated = db.recompute_streaks()
+        print(f"Recomputed streaks for {updated} students")
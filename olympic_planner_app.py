@@ -2,7 +2,16 @@ import streamlit as st
 import json
 from datetime import datetime, timedelta
 import database as db
+import insights
+import scheduler
+import syllabus
+import content_store
+import quiz_bank
+import adaptive
+from scheduler import STUDY_PLAN
 import os
+import threading
+import time
 
 st.set_page_config(page_title="🏆 Olympiad Prep Planner", layout="wide", page_icon="🏆")
 
@@ -82,87 +91,29 @@ def get_openai_key():
 
 api_key = get_openai_key()
 
-# OLYMPIAD-SPECIFIC SYLLABUS (IMO, NSO, IEO aligned)
-# Based on SOF (Science Olympiad Foundation) official syllabi
-SYLLABUS = {
-    "Grade 1": {
-        "Math": ["Pattern Completion", "Odd One Out", "Series Completion", "Number Sense & Counting", "Addition & Subtraction Tricks", "Shapes & Spatial Reasoning", "Comparing & Ordering", "Time & Calendar Basics", "Money Problems", "Measurement Concepts", "Logical Reasoning", "Picture Puzzles"],
-        "Science": ["Living vs Non-Living", "Animals & Their Homes", "Plant Parts & Uses", "My Body & Senses", "Food & Healthy Eating", "Water Uses", "Air Around Us", "Day & Night Cycle", "Weather Changes", "Safety Rules", "Good Habits", "Everyday Science"],
-        "English": ["Word Meanings", "Rhyming Words", "Opposites (Antonyms)", "Picture Reading", "Sentence Completion", "Spellings", "Singular-Plural", "Articles (a, an)", "Action Words", "Naming Words", "Simple Comprehension", "Vocabulary Building"]
-    },
-    "Grade 2": {
-        "Math": ["Number Patterns & Series", "Missing Numbers", "Ranking & Ordering", "Calendar Problems", "Clock & Time", "Money Word Problems", "Shape Patterns", "Symmetry Basics", "Odd One Out", "Direction Sense", "Logical Sequences", "Mental Math Tricks", "Data Reading (Pictograph)"],
-        "Science": ["Parts of Plants", "Types of Animals", "Food Chain Basics", "Our Body Systems", "Healthy vs Unhealthy Food", "States of Water", "Sources of Water", "Air & Wind", "Shadows & Light", "Magnets", "Safety & First Aid", "Environmental Care", "Everyday Science"],
-        "English": ["Synonyms & Antonyms", "One Word Substitution", "Jumbled Words", "Sentence Formation", "Punctuation", "Comprehension Passages", "Nouns & Pronouns", "Verbs & Adjectives", "Question Formation", "Spellings", "Word Order", "Vocabulary"]
-    },
-    "Grade 3": {
-        "Math": ["Pattern & Series", "Ranking Test", "Odd One Out", "Coding-Decoding", "Direction Sense", "Blood Relations", "Analogy", "Classification", "Mirror Images", "Geometrical Shapes", "Calendar & Clock", "Money Problems", "Mental Ability", "Number Puzzles", "Logical Reasoning", "Mathematical Operations"],
-        "Science": ["Plant Life & Photosynthesis", "Animal Classification", "Food & Nutrition", "Digestive System Basics", "Skeletal System", "Matter & Materials", "Force & Motion", "Magnets & Magnetism", "Light & Shadows", "Air, Water & Weather", "Soil", "Simple Machines", "Safety & Health", "Environmental Science", "Everyday Science", "HOTS Questions"],
-        "English": ["Reading Comprehension", "Synonyms & Antonyms", "Homophones", "One Word Substitution", "Idioms & Phrases", "Sentence Reordering", "Cloze Test", "Spellings", "Nouns (All Types)", "Pronouns", "Verbs & Tenses", "Adjectives & Adverbs", "Articles", "Prepositions", "Conjunctions", "Punctuation"],
-        "Math": ["Pattern & Series", "Ranking Test", "Odd One Out", "Coding-Decoding", "Direction Sense", "Blood Relations", "Analogy", "Classification", "Mirror Images", "Geometrical Shapes", "Calendar & Clock", "Money Problems", "Mental Ability", "Number Puzzles", "Logical Reasoning", "Mathematical Operations"]
-    },
-    "Grade 4": {
-        "Math": ["Number Series & Patterns", "Alphabetical Test", "Ranking & Time Sequence", "Coding-Decoding", "Mathematical Operations", "Odd One Out", "Direction Sense Test", "Blood Relations", "Puzzle Test", "Analogy", "Classification", "Mirror & Water Images", "Embedded Figures", "Figure Matrix", "Geometrical Reasoning", "Calendar & Clock", "Data Interpretation"],
-        "Science": ["Digestion & Nutrition", "Teeth & Microbes", "Animals & Adaptation", "Plants & Reproduction", "Materials & Separation", "Force Work & Energy", "Sound", "Light & Reflection", "Electricity & Circuits", "Air & Water Pollution", "Earth & Universe", "Disaster Management", "Natural Resources", "HOTS & Achievers Topics", "Practical Science", "Current Affairs in Science"],
-        "English": ["Advanced Comprehension", "Synonyms & Antonyms", "Analogies", "Idioms & Phrases", "One Word Substitution", "Spellings (Tricky)", "Sentence Completion", "Jumbled Sentences", "Cloze Test", "Error Detection", "All Parts of Speech", "Tenses (All)", "Voice Change", "Articles & Determiners", "Modals", "Prepositions", "Verbal Reasoning"]
-    },
-    "Grade 5": {
-        "Math": ["Pattern Completion", "Figure Matrix", "Ranking & Ordering", "Alphabet Test", "Number & Coding Series", "Blood Relations", "Direction Sense", "Logical Venn Diagrams", "Analytical Reasoning", "Mirror & Water Images", "Embedded Figures", "Cubes & Dice", "Mathematical Reasoning", "Data Sufficiency", "Profit & Loss", "Time & Distance", "Percentage & Ratio", "Number Theory", "Geometry Puzzles"],
-        "Science": ["Crop Production", "Microorganisms & Diseases", "Synthetic Materials", "Metals & Non-Metals", "Combustion & Fuels", "Conservation of Resources", "Cell Structure & Function", "Body Systems (Advanced)", "Force & Pressure", "Friction", "Sound Properties", "Light Behavior", "Chemical Effects of Electricity", "Stars & Solar System", "Pollution & Environment", "HOTS Questions", "Achievers Section", "Science in Daily Life"],
-        "English": ["Reading Comprehension (Complex)", "Synonyms, Antonyms, Analogies", "Idioms & Phrases (Advanced)", "One Word Substitution", "Sentence Improvement", "Error Spotting", "Spellings (Olympiad Level)", "Cloze Test", "Jumbled Sentences", "Sentence Completion", "All Grammar Topics", "Active-Passive Voice", "Direct-Indirect Speech", "Question Tags", "Phrasal Verbs", "Verbal Reasoning", "Achievers Grammar"]
-    },
-    "Grade 6": {
-        "Math": ["Logical Reasoning", "Mathematical Reasoning", "Number System", "Algebra", "Geometry", "Mensuration", "Data Handling", "Ratio & Proportion", "Percentage", "Profit & Loss", "Simple Interest", "Time & Work", "Speed & Distance", "Number Patterns", "Venn Diagrams", "Series Completion", "Coding-Decoding", "Blood Relations", "Direction Test", "Puzzle Test", "Achievers Section"],
-        "Science": ["Food & Nutrition", "Fiber to Fabric", "Sorting & Separation", "Physical & Chemical Changes", "Living Organisms", "Motion & Measurement", "Light Phenomena", "Electricity Concepts", "Magnets", "Water Conservation", "Air & Oxygen", "Garbage Management", "HOTS Questions", "Practical Applications", "Environmental Issues", "Achievers Section", "Current Science Topics"],
-        "English": ["Reading Comprehension (Analytical)", "Synonyms & Antonyms", "Analogies", "Idioms & Proverbs", "One Word Substitution", "Sentence Reordering", "Cloze Test (Advanced)", "Error Detection", "Sentence Improvement", "Spellings", "All Parts of Speech", "Tenses & Sequence", "Voice & Speech", "Modals", "Subject-Verb Agreement", "Articles Usage", "Prepositions", "Achievers Section"]
-    },
-    "Grade 7": {
-        "Math": ["Logical Reasoning", "Mathematical Reasoning", "Integers", "Fractions & Decimals", "Data Handling", "Algebra", "Ratio & Proportion", "Percentage", "Profit, Loss & Discount", "Simple Interest", "Time & Work", "Speed, Distance & Time", "Geometry", "Perimeter & Area", "Symmetry", "Number Patterns", "Series Completion", "Coding-Decoding", "Ranking Test", "Puzzle Test", "Blood Relations", "Achievers Section"],
-        "Science": ["Nutrition in Plants & Animals", "Heat & Temperature", "Acids, Bases & Salts", "Physical & Chemical Changes", "Weather & Climate", "Winds & Storms", "Soil", "Respiration", "Transportation", "Reproduction in Plants", "Motion & Time", "Electric Current", "Light Properties", "Water Resources", "Forests", "Wastewater Management", "HOTS Questions", "Achievers Section", "Science & Technology"],
-        "English": ["Comprehension (Complex Passages)", "Synonyms, Antonyms & Analogies", "Idioms & Phrases", "One Word Substitution", "Sentence Completion", "Cloze Test", "Error Spotting", "Sentence Reordering", "Active-Passive Voice", "Direct-Indirect Speech", "Tenses", "Modals", "Prepositions", "Articles", "Subject-Verb Agreement", "Clauses", "Phrasal Verbs", "Verbal Reasoning", "Achievers Section"]
-    },
-    "Grade 8": {
-        "Math": ["Logical Reasoning", "Mathematical Reasoning", "Number System", "Algebra", "Geometry", "Mensuration", "Data Handling", "Percentage", "Profit & Loss", "Compound Interest", "Time & Work", "Speed & Distance", "Squares & Square Roots", "Cubes & Cube Roots", "Exponents", "Direct & Inverse Variation", "Probability", "Series & Patterns", "Coding-Decoding", "Ranking", "Puzzle Test", "Achievers Section"],
-        "Science": ["Crop Production", "Microorganisms", "Synthetic Materials", "Metals & Non-Metals", "Coal & Petroleum", "Combustion", "Conservation", "Cell Structure", "Reproduction", "Adolescence", "Force & Pressure", "Friction", "Sound", "Chemical Effects of Current", "Light & Vision", "Stars & Solar System", "Pollution", "HOTS Questions", "Achievers Section", "Everyday Science"],
-        "English": ["Reading Comprehension (Analytical)", "Vocabulary (Synonyms, Antonyms, Analogies)", "Idioms & Phrases", "One Word Substitution", "Sentence Improvement", "Error Detection", "Cloze Test", "Sentence Reordering", "All Grammar Rules", "Active-Passive Voice", "Direct-Indirect Speech", "Tenses & Their Usage", "Modal Verbs", "Subject-Verb Agreement", "Articles & Determiners", "Prepositions", "Conjunctions", "Verbal Reasoning", "Achievers Section"]
-    },
-    "Grade 9": {
-        "Math": ["Logical Reasoning", "Mathematical Reasoning", "Number Systems", "Polynomials", "Coordinate Geometry", "Linear Equations", "Euclid's Geometry", "Lines & Angles", "Triangles & Quadrilaterals", "Circles", "Constructions", "Surface Areas & Volumes", "Statistics", "Probability", "Series & Patterns", "Coding-Decoding", "Data Sufficiency", "Profit & Loss", "Time & Work", "Achievers Section"],
-        "Science": ["Matter & Its Nature", "Atoms & Molecules", "Atomic Structure", "Cell Biology", "Tissues", "Motion", "Force & Laws of Motion", "Gravitation", "Work & Energy", "Sound", "Natural Resources", "Diversity in Living World", "Disease & Health", "Crop Improvement", "HOTS Questions", "Practical Applications", "Achievers Section", "Current Science"],
-        "English": ["Reading Comprehension (Advanced)", "Vocabulary (Olympiad Level)", "Analogies & Antonyms", "Idioms & Phrases", "One Word Substitution", "Sentence Correction", "Error Spotting", "Cloze Test", "Para Jumbles", "Grammar (All Topics)", "Active-Passive Voice", "Direct-Indirect Speech", "Tenses", "Modals", "Conditionals", "Clauses", "Verbal Reasoning", "Achievers Section"]
-    },
-    "Grade 10": {
-        "Math": ["Logical Reasoning", "Mathematical Reasoning", "Real Numbers", "Polynomials", "Linear & Quadratic Equations", "Arithmetic Progressions", "Triangles & Similarity", "Coordinate Geometry", "Trigonometry", "Circles", "Constructions", "Mensuration", "Surface Areas & Volumes", "Statistics", "Probability", "Number Theory", "Data Interpretation", "Profit Loss & Interest", "Time Speed & Distance", "Achievers Section"],
-        "Science": ["Chemical Reactions", "Acids Bases & Salts", "Metals & Non-Metals", "Carbon Compounds", "Periodic Classification", "Life Processes", "Control & Coordination", "Reproduction", "Heredity & Evolution", "Light & Reflection", "Human Eye & Colorful World", "Electricity", "Magnetic Effects", "Energy Sources", "Environment", "Resource Management", "HOTS Questions", "Achievers Section"],
-        "English": ["Advanced Comprehension", "Vocabulary (Expert Level)", "Synonyms, Antonyms & Analogies", "Idioms, Phrases & Proverbs", "One Word Substitution", "Sentence Improvement", "Error Detection", "Cloze Test (Complex)", "Para Jumbles", "Reading Skills", "All Grammar Concepts", "Voice & Speech Changes", "Reported Speech", "Tenses & Sequence", "Modals", "Conditionals", "Clauses & Phrases", "Verbal Reasoning", "Achievers Section"]
-    },
-    "Grade 11": {
-        "Math": ["Sets & Relations", "Functions", "Trigonometry", "Complex Numbers", "Linear Inequalities", "Permutations & Combinations", "Binomial Theorem", "Sequences & Series", "Straight Lines", "Conic Sections", "3D Geometry", "Limits & Derivatives", "Statistics", "Probability", "Mathematical Reasoning", "Logical Reasoning", "Data Interpretation", "Number Theory", "Achievers Section"],
-        "Science": ["Physical World & Measurement", "Motion in Plane", "Laws of Motion", "Work Energy & Power", "Rotational Motion", "Gravitation", "Mechanical Properties", "Thermodynamics", "Kinetic Theory", "Oscillations & Waves", "Classification of Elements", "Chemical Bonding", "States of Matter", "Thermodynamics", "Equilibrium", "Redox Reactions", "Organic Chemistry Basics", "Cell Biology", "Biomolecules", "Plant Physiology", "Human Physiology", "Achievers Section"],
-        "English": ["Advanced Reading Comprehension", "Critical Analysis", "Vocabulary (Expert)", "Synonyms, Antonyms & Analogies", "Idioms & Phrases", "One Word Substitution", "Sentence Correction", "Error Spotting", "Cloze Test", "Para Jumbles", "Reading Comprehension Skills", "Advanced Grammar", "Voice Changes", "Reported Speech", "Tenses", "Modals", "Conditionals", "Clauses", "Verbal Aptitude", "Achievers Section"]
-    },
-    "Grade 12": {
-        "Math": ["Relations & Functions", "Inverse Trigonometry", "Matrices", "Determinants", "Continuity & Differentiability", "Applications of Derivatives", "Integrals", "Applications of Integrals", "Differential Equations", "Vectors", "3D Geometry", "Linear Programming", "Probability", "Mathematical Reasoning", "Logical Reasoning", "Data Analysis", "Number Theory", "Combinatorics", "Achievers Section"],
-        "Science": ["Electrostatics", "Current Electricity", "Magnetic Effects", "Magnetism", "Electromagnetic Induction", "AC Circuits", "EM Waves", "Ray Optics", "Wave Optics", "Dual Nature of Matter", "Atoms & Nuclei", "Semiconductors", "Communication Systems", "Solid State Chemistry", "Solutions", "Electrochemistry", "Chemical Kinetics", "Surface Chemistry", "Coordination Chemistry", "Organic Compounds", "Polymers", "Chemistry in Life", "Reproduction", "Genetics", "Evolution", "Human Health", "Biotechnology", "Ecology", "Environment", "Achievers Section"],
-        "English": ["Critical Reading & Comprehension", "Advanced Vocabulary", "Synonyms, Antonyms & Analogies", "Idioms, Phrases & Proverbs", "One Word Substitution", "Sentence Improvement", "Error Detection", "Cloze Test (Expert)", "Para Jumbles", "Reading Skills", "Advanced Grammar Concepts", "Voice & Speech", "Reported Speech", "Tenses & Usage", "Modals & Conditionals", "Clauses & Phrases", "Verbal Reasoning", "Critical Thinking", "Achievers Section"]
-    }
-}
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_student_insights(student_ids, versions, day):
+    """
+    db.get_student_insights() for a tuple of ids, cached per (ids, rollup versions, day).
+    versions (db.get_rollup_versions) change whenever a session or quiz lands, and the
+    day is part of the key because the 7/14/30-day windows move with the calendar.
+    """
+    return db.get_student_insights(list(student_ids))
+
+def fill_quiz(question_stream, questions, status):
+    """Background thread: append streamed quiz questions to the session's list as they arrive"""
+    try:
+        for q in question_stream:
+            questions.append(q)
+    except Exception as e:
+        status['error'] = str(e)
+    finally:
+        status['done'] = True
 
-# Study time recommendations (minutes per session)
-STUDY_PLAN = {
-    "Grade 1": {"Math": 30, "Science": 20, "English": 20},
-    "Grade 2": {"Math": 30, "Science": 25, "English": 25},
-    "Grade 3": {"Math": 45, "Science": 30, "English": 30},
-    "Grade 4": {"Math": 45, "Science": 35, "English": 35},
-    "Grade 5": {"Math": 60, "Science": 45, "English": 45},
-    "Grade 6": {"Math": 60, "Science": 45, "English": 45},
-    "Grade 7": {"Math": 60, "Science": 50, "English": 45},
-    "Grade 8": {"Math": 60, "Science": 50, "English": 45},
-    "Grade 9": {"Math": 75, "Science": 60, "English": 45},
-    "Grade 10": {"Math": 75, "Science": 60, "English": 45},
-    "Grade 11": {"Math": 90, "Science": 75, "English": 45},
-    "Grade 12": {"Math": 90, "Science": 75, "English": 45}
-}
+# OLYMPIAD-SPECIFIC SYLLABUS (IMO, NSO, IEO aligned) - topic lists live in syllabus.json
+# Loaded and validated once per process; SYLLABUS keeps the grade -> subject -> topics shape
+SYLLABUS_INDEX = syllabus.get_syllabus()
+SYLLABUS = SYLLABUS_INDEX.raw
 
 # All available grades
 ALL_GRADES = [f"Grade {i}" for i in range(1, 13)]
@@ -184,11 +135,10 @@ if "db_initialized" not in st.session_state:
         st.error(f"Database initialization error: {e}")
         st.stop()
 
-# Check and populate preset content on first run
+# Sync preset content with the syllabus (once per process)
 if "preset_content_checked" not in st.session_state:
     try:
-        if db.get_preset_topics_count() == 0:
-            db.populate_preset_content(SYLLABUS)
+        db.ensure_preset_content(SYLLABUS)
         st.session_state.preset_content_checked = True
     except Exception as e:
         st.warning(f"Could not load preset content: {e}")
@@ -421,7 +371,7 @@ if user_type == "parent":
                 students = [(kid['student_name'], kid['grade']) for kid in st.session_state.parent_kids]
                 
                 # Bulk load all data in ONE database call (much faster!)
-                dashboard_cache = db.get_student_dashboard_data(students)
+                dashboard_cache = db.get_student_dashboard_data(students, family_id=st.session_state.family_id)
                 
                 # Filter out students that don't exist in DB
                 existing_students = [(name, grade) for name, grade in students 
@@ -506,144 +456,42 @@ if user_type == "parent":
         st.header("💡 Smart Insights")
         st.caption("Data-driven observations about your kids' study patterns")
         
+        # One cheap version probe per rerun; the activity summary query only runs when it changes
+        try:
+            child_ids = tuple(dashboard_cache[f"{n}_{g}"]['student_data']['id'] for n, g in students)
+            versions = db.get_rollup_versions(child_ids)
+            insights_by_id = load_student_insights(
+                child_ids, tuple(versions[i] for i in child_ids), datetime.now().date()
+            )
+            insights_error = None
+        except Exception as e:
+            insights_by_id = {}
+            insights_error = e
+        
         # Generate insights for each student
         for student_name, student_grade in students:
             cache_key = f"{student_name}_{student_grade}"
             
             with st.expander(f"🔍 Insights for {student_name}", expanded=len(students) == 1):
                 try:
-                    insights_data = db.get_student_insights(student_name, student_grade)
-                    
-                    # Analyze and generate insights
-                    insight_messages = []
-                    
-                    # Check subject balance (last 14 days)
-                    recent_subjects = insights_data.get('recent_by_subject', {})
-                    all_subjects = ['Math', 'Science', 'English']
-                    
-                    for subject in all_subjects:
-                        if subject not in recent_subjects:
-                            insight_messages.append({
-                                'type': 'warning',
-                                'icon': '⚠️',
-                                'message': f"**No {subject} sessions** logged in the last 2 weeks. Consider adding {subject} study time."
-                            })
-                    
-                    # Check for balanced study
-                    if len(recent_subjects) >= 2:
-                        subjects_list = list(recent_subjects.keys())
-                        time_variance = max([s['total_minutes'] for s in recent_subjects.values()]) - min([s['total_minutes'] for s in recent_subjects.values()])
-                        
-                        if time_variance > 200:  # More than 3 hours difference
-                            insight_messages.append({
-                                'type': 'info',
-                                'icon': '⚖️',
-                                'message': f"**Study time imbalance detected.** {student_name} is focusing heavily on some subjects. Try to balance across Math, Science, and English."
-                            })
-                        elif len(recent_subjects) == 3:
-                            insight_messages.append({
-                                'type': 'success',
-                                'icon': '✨',
-                                'message': f"**Great balance!** {student_name} is studying all three subjects regularly."
-                            })
-                    
-                    # Check quiz performance trend
-                    quiz_results = insights_data.get('quiz_results', [])
-                    if len(quiz_results) >= 3:
-                        recent_3 = quiz_results[:3]
-                        older_3 = quiz_results[3:6] if len(quiz_results) >= 6 else quiz_results[3:]
-                        
-                        if older_3:
-                            recent_avg = sum([q['score'] / q['num_questions'] * 100 for q in recent_3]) / len(recent_3)
-                            older_avg = sum([q['score'] / q['num_questions'] * 100 for q in older_3]) / len(older_3)
-                            
-                            if recent_avg > older_avg + 10:
-                                insight_messages.append({
-                                    'type': 'success',
-                                    'icon': '📈',
-                                    'message': f"**Quiz performance improving!** Recent average: {recent_avg:.0f}% (up from {older_avg:.0f}%). Keep up the good work!"
-                                })
-                            elif recent_avg < older_avg - 10:
-                                insight_messages.append({
-                                    'type': 'warning',
-                                    'icon': '📉',
-                                    'message': f"**Quiz scores declining.** Recent average: {recent_avg:.0f}% (down from {older_avg:.0f}%). May need more review time."
-                                })
-                            else:
-                                insight_messages.append({
-                                    'type': 'info',
-                                    'icon': '📊',
-                                    'message': f"**Quiz performance steady.** Maintaining {recent_avg:.0f}% average."
-                                })
-                    
-                    # Check study consistency (last 7 days)
-                    all_sessions = insights_data.get('all_sessions', [])
-                    if all_sessions:
-                        import datetime
-                        now = datetime.datetime.now()
-                        last_7_days = [s for s in all_sessions if (now - s['created_at']).days <= 7]
-                        
-                        if len(last_7_days) >= 5:
-                            insight_messages.append({
-                                'type': 'success',
-                                'icon': '🔥',
-                                'message': f"**Excellent consistency!** {len(last_7_days)} study sessions in the last week. {student_name} is building a strong habit!"
-                            })
-                        elif len(last_7_days) >= 3:
-                            insight_messages.append({
-                                'type': 'info',
-                                'icon': '👍',
-                                'message': f"**Good progress!** {len(last_7_days)} sessions this week. Try to aim for 5+ sessions per week."
-                            })
-                        elif len(last_7_days) >= 1:
-                            insight_messages.append({
-                                'type': 'warning',
-                                'icon': '⏰',
-                                'message': f"**Low activity.** Only {len(last_7_days)} session(s) this week. Encourage more regular study time."
-                            })
-                        
-                        # Check if there's been no activity recently
-                        last_session_date = insights_data.get('last_session_date')
-                        if last_session_date:
-                            days_since = (now - last_session_date).days
-                            if days_since > 7:
-                                insight_messages.append({
-                                    'type': 'warning',
-                                    'icon': '🚨',
-                                    'message': f"**Inactive for {days_since} days!** Last study session was {last_session_date.strftime('%b %d')}. Time to restart the habit!"
-                                })
-                            elif days_since > 3:
-                                insight_messages.append({
-                                    'type': 'info',
-                                    'icon': '📅',
-                                    'message': f"**{days_since} days** since last session. Regular practice is key to retention!"
-                                })
-                    
-                    # Check study duration patterns
-                    if all_sessions:
-                        avg_duration = sum([s['duration_minutes'] for s in all_sessions]) / len(all_sessions)
-                        if avg_duration < 20:
-                            insight_messages.append({
-                                'type': 'info',
-                                'icon': '⏱️',
-                                'message': f"**Short sessions detected.** Average: {avg_duration:.0f} min. Consider 30-45 min sessions for better focus."
-                            })
-                        elif avg_duration > 90:
-                            insight_messages.append({
-                                'type': 'info',
-                                'icon': '🧠',
-                                'message': f"**Very long sessions.** Average: {avg_duration:.0f} min. Remember to take breaks to maintain focus!"
-                            })
+                    if insights_error:
+                        raise insights_error
+                    child_id = dashboard_cache[cache_key]['student_data']['id']
+                    insights_data = insights_by_id.get(child_id, {})
+                    insight_messages = insights.evaluate_cached(
+                        child_id, insights_data.get('data_version'), insights_data,
+                        student_name, datetime.now()
+                    )
                     
                     # Display insights
                     if insight_messages:
                         for insight in insight_messages:
-                            if insight['type'] == 'success':
-                                st.success(f"{insight['icon']} {insight['message']}")
-                            elif insight['type'] == 'warning':
-                                st.warning(f"{insight['icon']} {insight['message']}")
+                            if insight.kind == 'success':
+                                st.success(f"{insight.icon} {insight.message}")
+                            elif insight.kind == 'warning':
+                                st.warning(f"{insight.icon} {insight.message}")
                             else:
-                                st.info(f"{insight['icon']} {insight['message']}")
+                                st.info(f"{insight.icon} {insight.message}")
                     else:
                         st.info("🎯 Not enough data yet. Insights will appear as your child uses the app more!")
                 
@@ -659,11 +507,14 @@ if user_type == "parent":
         # Loop through all students and show their details
         for student_idx, (selected_name, selected_grade) in enumerate(students):
             
-            # Get detailed data for this student
-            student_data = db.get_or_create_student(selected_name, selected_grade)
-            completed_topics_db = db.get_completed_topics(selected_name, selected_grade)
+            # Reuse the bulk-loaded dashboard data for this student
+            cached = dashboard_cache[f"{selected_name}_{selected_grade}"]
+            student_data = cached['student_data']
+            selected_id = student_data['id']
+            completed_topics_db = cached['completed_topics']
             completed_topics_list = [t['topic'] for t in completed_topics_db]
-            total_hours = db.get_total_study_hours(selected_name, selected_grade)
+            total_hours = cached['total_hours']
+            quiz_stats = cached['quiz_stats']
             
             # Student card with expander
             with st.expander(f"📚 {selected_name} ({selected_grade})", expanded=len(students) == 1):
@@ -676,7 +527,6 @@ if user_type == "parent":
                 with col_s3:
                     st.metric("Streak", f"{student_data.get('streak_days', 0)} 🔥")
                 with col_s4:
-                    quiz_stats = db.get_quiz_stats(selected_name, selected_grade)
                     if quiz_stats['total_quizzes'] > 0:
                         st.metric("Quizzes", f"{quiz_stats['total_quizzes']}")
                     else:
@@ -693,21 +543,16 @@ if user_type == "parent":
                     # Progress by subject
                     col1, col2, col3 = st.columns(3)
                     
-                    subjects = ["Math", "Science", "English"]
-                    subject_counts = {subj: 0 for subj in subjects}
-                    
-                    for topic_data in completed_topics_db:
-                        topic = topic_data['topic']
-                        for subj in subjects:
-                            if subj in topic_data.get('subject', ''):
-                                subject_counts[subj] += 1
+                    subject_counts = {
+                        subj: done for subj, (done, _) in SYLLABUS_INDEX.progress(selected_grade, completed_topics_list).items()
+                    }
                     
                     with col1:
-                        st.metric("🔢 Math Topics", subject_counts["Math"])
+                        st.metric("🔢 Math Topics", subject_counts.get("Math", 0))
                     with col2:
-                        st.metric("🔬 Science Topics", subject_counts["Science"])
+                        st.metric("🔬 Science Topics", subject_counts.get("Science", 0))
                     with col3:
-                        st.metric("📖 English Topics", subject_counts["English"])
+                        st.metric("📖 English Topics", subject_counts.get("English", 0))
                     
                     st.markdown("---")
                     
@@ -724,21 +569,20 @@ if user_type == "parent":
                 with dtab2:
                     st.subheader(f"📅 This Week's Plan")
                     
-                    # Show this week's plan
-                    import datetime
-                    today = datetime.date.today()
-                    week_start = today - datetime.timedelta(days=today.weekday())
+                    # Show this week's plan (one range query for all 7 days)
+                    today = datetime.now().date()
+                    week_start = db.week_start_for(today)
+                    week_plans = db.get_weekly_plan(selected_id, week_start)
                     
                     for i in range(7):
-                        day = week_start + datetime.timedelta(days=i)
+                        day = week_start + timedelta(days=i)
                         day_name = day.strftime("%A")
-                        day_str = day.strftime("%Y-%m-%d")
                         
                         with st.expander(f"{'📍' if day == today else '📅'} {day_name} ({day.strftime('%b %d')})"):
-                            plans = db.get_weekly_plan(selected_name, selected_grade, day_str)
+                            plans = [p for p in week_plans if p['plan_date'] == day]
                             if plans:
                                 for plan in plans:
-                                    st.markdown(f"**{plan['subject']}:** {plan['topic']} - {plan['duration']} min")
+                                    st.markdown(f"**{plan['subject']}:** {', '.join(plan['topics'] or [])} - {plan['duration_minutes']} min")
                             else:
                                 st.caption("No plan for this day")
                 
@@ -746,8 +590,7 @@ if user_type == "parent":
                     st.subheader(f"🎯 Quiz Performance")
                     
                     # Get quiz results
-                    quiz_results = db.get_quiz_results(selected_name, selected_grade, limit=20)
-                    quiz_stats = db.get_quiz_stats(selected_name, selected_grade)
+                    quiz_results = db.get_quiz_results(selected_id, limit=20)
                     
                     if quiz_stats['total_quizzes'] > 0:
                         # Summary stats
@@ -764,6 +607,16 @@ if user_type == "parent":
                             else:
                                 st.metric("Performance", "📈 Improving")
                         
+                        # Per-topic mastery from individual answers (quizzes before item-level storage have none)
+                        topic_mastery = db.get_topic_mastery([selected_id]).get(selected_id, {})
+                        if topic_mastery:
+                            st.markdown("---")
+                            st.markdown("#### Topic Mastery (weakest first)")
+                            for topic, m in sorted(topic_mastery.items(), key=lambda item: item[1]['mastery'])[:8]:
+                                st.progress(min(max(m['mastery'], 0.0), 1.0),
+                                            text=f"{m['subject']} - {topic}: {m['mastery'] * 100:.0f}% "
+                                                 f"({m['correct']}/{m['attempts']} correct)")
+                        
                         st.markdown("---")
                         st.markdown("#### Recent Quizzes")
                         
@@ -836,7 +689,7 @@ if user_type == "parent":
                     st.subheader(f"📝 Recent Study Sessions")
                     
                     # Get recent study sessions
-                    sessions = db.get_recent_study_sessions(selected_name, selected_grade, limit=10)
+                    sessions = db.get_recent_study_sessions(selected_id, limit=10)
                     
                     if sessions:
                         for session in sessions:
@@ -887,13 +740,17 @@ else:
 if 'student_data_loaded' not in st.session_state or not st.session_state.student_data_loaded:
     try:
         with st.spinner("Loading your data..."):
-            student = db.get_or_create_student(name, grade, family_id=student_family_id)
-            completed_topics_db = db.get_completed_topics(name, grade)
+            # Resolve the student once; everything else is looked up by id
+            student = db.resolve_student(name, grade, family_id=student_family_id)
+            student_id = student['id']
+            completed_topics_db = db.get_completed_topics(student_id)
             completed_topics_list = [t['topic'] for t in completed_topics_db]
-            total_hours = db.get_total_study_hours(name, grade)
-            streak_days = student.get('streak_days', 0) if student else 0
+            rollup = db.get_student_rollup(student_id)
+            total_hours = float(rollup['total_minutes']) / 60.0
+            streak_days = rollup['current_streak']
             
             # Store in session state
+            st.session_state.student_id = student_id
             st.session_state.completed_topics_list = completed_topics_list
             st.session_state.total_hours = total_hours
             st.session_state.streak_days = streak_days
@@ -901,12 +758,14 @@ if 'student_data_loaded' not in st.session_state or not st.session_state.student
     except Exception as e:
         st.error(f"Database connection error: {e}")
         st.info("Running in offline mode. Data won't be saved.")
+        st.session_state.student_id = None
         st.session_state.completed_topics_list = []
         st.session_state.total_hours = 0
         st.session_state.streak_days = 0
         st.session_state.student_data_loaded = True
 else:
     # Use cached data
+    student_id = st.session_state.student_id
     completed_topics_list = st.session_state.completed_topics_list
     total_hours = st.session_state.total_hours
     streak_days = st.session_state.streak_days
@@ -1022,22 +881,72 @@ with tab1:
     col_week1, col_week2 = st.columns([2, 1])
     with col_week1:
         week_date = st.date_input("📆 Select week starting:", datetime.now())
-        week_key = week_date.strftime("%Y-W%U")
+        week_start = db.week_start_for(week_date)
     with col_week2:
-        st.metric("Week #", week_key.split('-W')[1])
+        st.metric("Week #", week_start.isocalendar()[1])
     
     st.markdown("---")
     
     # Load ALL weekly plans once (not per day)
-    cache_key = f"weekly_plan_{week_key}"
+    cache_key = f"weekly_plan_{week_start}"
     if cache_key not in st.session_state:
         try:
-            all_plans = db.get_weekly_plan(name, grade, week_key)
-            st.session_state[cache_key] = all_plans
+            st.session_state[cache_key] = db.get_weekly_plan(student_id, week_start)
         except:
             st.session_state[cache_key] = []
-    else:
-        all_plans = st.session_state[cache_key]
+    all_plans = st.session_state[cache_key]
+    
+    # Start this week from last week's plan
+    if not all_plans and student_id:
+        if st.button("📋 Copy last week's plan", key="copy_last_week"):
+            try:
+                copied = db.copy_week_forward(student_id, week_start - timedelta(days=7), week_start)
+                del st.session_state[cache_key]
+                if copied:
+                    st.success(f"✅ Copied {copied} sessions from last week!")
+                    st.rerun()
+                else:
+                    st.info("Last week has no plan to copy.")
+            except Exception as e:
+                st.error(f"Error: {e}")
+    
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    
+    # Auto-plan: generate the whole week from syllabus progress and quiz scores
+    with st.expander("🪄 Auto-Plan This Week", expanded=not all_plans):
+        col_ap1, col_ap2, col_ap3 = st.columns(3)
+        with col_ap1:
+            weekday_minutes = st.number_input("Weekday minutes", min_value=0, max_value=300, value=60, step=15, key="auto_weekday")
+        with col_ap2:
+            weekend_minutes = st.number_input("Weekend minutes", min_value=0, max_value=480, value=120, step=15, key="auto_weekend")
+        with col_ap3:
+            use_exam = st.checkbox("Plan towards an exam date", key="auto_use_exam")
+            exam_date = st.date_input("Exam date", week_start + timedelta(days=30), key="auto_exam") if use_exam else None
+        
+        if all_plans:
+            st.caption("⚠️ This replaces the sessions already planned for this week.")
+        
+        if st.button("🪄 Generate Plan", type="primary", key="auto_plan_btn", disabled=not student_id):
+            try:
+                with st.spinner("Planning your week..."):
+                    plan = scheduler.plan_week(
+                        week_start,
+                        scheduler.daily_caps(weekday_minutes, weekend_minutes),
+                        db.get_preset_topics(grade),
+                        STUDY_PLAN.get(grade, {}),
+                        completed=completed_topics_list,
+                        topic_scores=db.get_topic_quiz_scores([student_id], syllabus_index=SYLLABUS_INDEX).get(student_id, {}),
+                        exam_date=exam_date
+                    )
+                    db.save_week_plan(student_id, week_start, plan)
+                del st.session_state[cache_key]
+                if plan:
+                    st.success(f"✅ Planned {len(plan)} sessions!")
+                    st.rerun()
+                else:
+                    st.info(f"Nothing left to plan - every topic is complete and none scores below {scheduler.WEAK_SCORE}% in quizzes!")
+            except Exception as e:
+                st.error(f"Error: {e}")
     
     # Quick Add Section (at top for easy access)
     with st.container():
@@ -1048,7 +957,7 @@ with tab1:
         with col1:
             quick_day = st.selectbox(
                 "Day",
-                ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+                days,
                 key="quick_day"
             )
         
@@ -1090,11 +999,11 @@ with tab1:
                 else:
                     try:
                         db.save_weekly_plan(
-                            name, grade, week_key, quick_day,
+                            student_id,
+                            week_start + timedelta(days=days.index(quick_day)),
                             quick_subject,
-                            ','.join(quick_topics),
-                            quick_duration,
-                            False
+                            quick_topics,
+                            quick_duration
                         )
                         # Clear cache
                         if cache_key in st.session_state:
@@ -1107,7 +1016,6 @@ with tab1:
     st.markdown("---")
     
     # Weekly view (compact, read-only display)
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
     day_emojis = ["📘", "📗", "📙", "📕", "📔", "🌟", "🌈"]
     
     # Show in grid layout (3 columns for better use of space)
@@ -1124,7 +1032,7 @@ with tab1:
             with cols[col_idx]:
                 # Get sessions for this day
                 day_plans = [p for p in all_plans if p['day_of_week'] == day]
-                total_day_minutes = sum([p.get('duration', 0) for p in day_plans])
+                total_day_minutes = sum([p.get('duration_minutes', 0) for p in day_plans])
                 
                 # Day header with time
                 st.markdown(f"**{day_emojis[day_idx]} {day}**")
@@ -1136,7 +1044,7 @@ with tab1:
                     for session in day_plans:
                         subject = session.get('subject', 'N/A')
                         subject_emoji = {"Math": "🔢", "Science": "🔬", "English": "📖"}
-                        st.markdown(f"{subject_emoji.get(subject, '📚')} {subject} - {session.get('duration', 0)}m")
+                        st.markdown(f"{subject_emoji.get(subject, '📚')} {subject} - {session.get('duration_minutes', 0)}m")
                 else:
                     st.caption("_No plans_")
                 
@@ -1148,13 +1056,13 @@ with tab1:
     
     if all_plans:
         total_sessions = len(all_plans)
-        total_minutes = sum([p.get('duration', 0) for p in all_plans])
+        total_minutes = sum([p.get('duration_minutes', 0) for p in all_plans])
         
         # Count by subject
         subject_breakdown = {}
         for plan in all_plans:
             subj = plan.get('subject', 'Unknown')
-            subject_breakdown[subj] = subject_breakdown.get(subj, 0) + plan.get('duration', 0)
+            subject_breakdown[subj] = subject_breakdown.get(subj, 0) + plan.get('duration_minutes', 0)
         
         col_ov1, col_ov2, col_ov3 = st.columns(3)
         
@@ -1185,10 +1093,9 @@ with tab2:
     # Overall progress by subject
     st.subheader("📊 Subject-wise Topic Completion")
     
+    subject_progress = SYLLABUS_INDEX.progress(grade, completed_topics_list)
     for subject in ["Math", "Science", "English"]:
-        total_topics = len(SYLLABUS[grade][subject])
-        completed = [t for t in completed_topics_list if t in SYLLABUS[grade][subject]]
-        completed_count = len(completed)
+        completed_count, total_topics = subject_progress[subject]
         progress_pct = (completed_count / total_topics * 100) if total_topics > 0 else 0
         
         col_subj1, col_subj2 = st.columns([3, 1])
@@ -1202,53 +1109,52 @@ with tab2:
     
     # Detailed topic checklist
     st.subheader("✅ Topic Checklist")
-    st.caption("Click checkboxes to mark topics as complete")
+    st.caption("Tick topics, then save to apply all changes at once")
     
     subject_tab = st.selectbox("Select subject to track:", ["Math", "Science", "English"], key="progress_subject")
     
     topics = SYLLABUS[grade][subject_tab]
     
-    # Track changes to batch update
-    if 'topic_update_trigger' not in st.session_state:
-        st.session_state.topic_update_trigger = 0
-    
-    for i, topic in enumerate(topics):
-        col_topic1, col_topic2 = st.columns([4, 1])
-        with col_topic1:
-            is_completed = topic in completed_topics_list
-            new_state = st.checkbox(
-                topic,
-                value=is_completed,
-                key=f"topic_check_{grade}_{subject_tab}_{i}_{st.session_state.topic_update_trigger}"
-            )
+    completed_set = frozenset(completed_topics_list)
+    
+    # Collect toggles in a form so a batch of changes is one write and one rerun
+    with st.form(f"topic_checklist_{grade}_{subject_tab}"):
+        checked = {}
+        for i, topic in enumerate(topics):
+            col_topic1, col_topic2 = st.columns([4, 1])
+            with col_topic1:
+                checked[topic] = st.checkbox(
+                    topic,
+                    value=topic in completed_set,
+                    key=f"topic_check_{grade}_{subject_tab}_{i}"
+                )
             
-            # Update database if state changed
-            if new_state != is_completed:
-                try:
-                    if new_state:
-                        db.mark_topic_completed(name, grade, subject_tab, topic)
-                        # Update session state cache
-                        if topic not in st.session_state.completed_topics_list:
-                            st.session_state.completed_topics_list.append(topic)
-                        st.session_state.topic_update_trigger += 1
-                        st.success(f"✅ Marked {topic} as complete!")
-                        st.session_state.student_data_loaded = False  # Force data reload
-                        st.rerun()
-                    else:
-                        db.unmark_topic(name, grade, subject_tab, topic)
-                        # Update session state cache
-                        if topic in st.session_state.completed_topics_list:
-                            st.session_state.completed_topics_list.remove(topic)
-                        st.session_state.topic_update_trigger += 1
-                        st.info(f"Unmarked {topic}")
-                        st.session_state.student_data_loaded = False  # Force data reload
-                        st.rerun()
-                except Exception as e:
-                    st.error(f"Error updating: {e}")
+            with col_topic2:
+                if topic in completed_set:
+                    st.success("✅")
         
-        with col_topic2:
-            if topic in completed_topics_list:
-                st.success("✅")
+        save_topics = st.form_submit_button("💾 Save Progress", type="primary")
+    
+    if save_topics:
+        newly_completed = [t for t, done in checked.items() if done and t not in completed_set]
+        newly_uncompleted = [t for t, done in checked.items() if not done and t in completed_set]
+        
+        if newly_completed or newly_uncompleted:
+            try:
+                db.update_completed_topics(student_id, subject_tab, newly_completed, newly_uncompleted)
+                
+                # Update session state cache in place - no full reload needed
+                cached_topics = st.session_state.completed_topics_list
+                cached_topics.extend(t for t in newly_completed if t not in cached_topics)
+                for topic in newly_uncompleted:
+                    if topic in cached_topics:
+                        cached_topics.remove(topic)
+                
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error updating: {e}")
+        else:
+            st.info("No changes to save.")
     
     # Study session timer
     st.markdown("---")
@@ -1324,21 +1230,17 @@ with tab2:
                 else:
                     try:
                         with st.spinner("Saving session..."):
-                            # Add study session with calculated duration
-                            db.add_study_session(
-                                session['name'], 
-                                session['grade'], 
-                                session['subject'], 
+                            # Session, topics and rollups are saved together
+                            aggregates = db.record_study_session(
+                                student_id,
+                                session['subject'],
                                 elapsed_minutes,
-                                ','.join(session['topics'])
+                                session['topics']
                             )
                             
-                            # Mark topics as completed
-                            for topic in session['topics']:
-                                db.mark_topic_completed(session['name'], session['grade'], session['subject'], topic)
-                            
-                            # Update cache immediately
-                            st.session_state.total_hours += elapsed_minutes / 60.0
+                            # Update cache from the returned totals
+                            st.session_state.total_hours = float(aggregates['total_minutes']) / 60.0
+                            st.session_state.streak_days = aggregates['current_streak']
                             for topic in session['topics']:
                                 if topic not in st.session_state.completed_topics_list:
                                     st.session_state.completed_topics_list.append(topic)
@@ -1368,8 +1270,8 @@ with tab2:
     with sum_col2:
         st.metric("Topics Mastered", len(completed_topics_list))
     with sum_col3:
-        total_topics_all = sum(len(SYLLABUS[grade][s]) for s in ["Math", "Science", "English"])
-        overall_pct = (len(completed_topics_list) / total_topics_all * 100) if total_topics_all > 0 else 0
+        total_topics_all = SYLLABUS_INDEX.total(grade)
+        overall_pct = (SYLLABUS_INDEX.completed_count(grade, completed_topics_list) / total_topics_all * 100) if total_topics_all > 0 else 0
         st.metric("Overall Progress", f"{overall_pct:.1f}%")
 
 with tab3:
@@ -1396,244 +1298,11 @@ with tab3:
     st.markdown("---")
     
     if learn_topic:
-        # Learning content database with examples, strategies, and tips
-        LEARNING_CONTENT = {
-            # MATH TOPICS
-            "Pattern Completion": {
-                "description": "Pattern completion means finding what comes next in a sequence by identifying the rule.",
-                "examples": [
-                    "**Example 1:** 2, 4, 6, 8, ? → Answer: **10** (adding 2 each time)",
-                    "**Example 2:** 1, 4, 9, 16, ? → Answer: **25** (squares: 1², 2², 3², 4², 5²)",
-                    "**Example 3:** A, C, E, G, ? → Answer: **I** (skipping one letter)"
-                ],
-                "strategy": [
-                    "1. Look for the difference between consecutive numbers",
-                    "2. Check if numbers are multiplied or divided",
-                    "3. Look for special sequences (squares, cubes, primes)",
-                    "4. For letter patterns, count positions in alphabet"
-                ],
-                "tips": "Always check the pattern by applying the rule to all given numbers!"
-            },
-            "Coding-Decoding": {
-                "description": "Coding-Decoding is replacing letters or words according to a specific rule to form codes.",
-                "examples": [
-                    "**Example 1:** If CAT = DBU, then DOG = ? → Answer: **EPH** (each letter shifts by +1)",
-                    "**Example 2:** If A=1, B=2, C=3, then CAT = ? → Answer: **3+1+20 = 24**",
-                    "**Example 3:** If BOOK is coded as 'CPPL', then WORD = ? → Answer: **XPSE** (+1 to each letter)"
-                ],
-                "strategy": [
-                    "1. Find the pattern: Is it +1, -1, or reverse?",
-                    "2. Check if numbers are used for letters (A=1, B=2...)",
-                    "3. Look for position changes or substitutions",
-                    "4. Apply the same rule to decode the answer"
-                ],
-                "tips": "Write A-Z with numbers 1-26 to solve quickly!"
-            },
-            "Direction Sense": {
-                "description": "Direction sense involves understanding movements in different directions to find the final position.",
-                "examples": [
-                    "**Example 1:** Ram walks 5m North, then 3m East. How far is he from start? → Answer: **Use Pythagoras: √(5²+3²) ≈ 5.8m**",
-                    "**Example 2:** Facing North, turn right 90°, then left 180°. Which direction now? → Answer: **West**",
-                    "**Example 3:** A is North of B, B is East of C. In which direction is A from C? → Answer: **North-East**"
-                ],
-                "strategy": [
-                    "1. Draw a rough diagram - always helps!",
-                    "2. Remember: Right turn from North = East, Left turn = West",
-                    "3. Use compass directions (N, S, E, W, NE, NW, SE, SW)",
-                    "4. Count degrees: 90° = quarter turn, 180° = half turn, 360° = full circle"
-                ],
-                "tips": "Draw arrows for each move - visual helps solve faster!"
-            },
-            "Blood Relations": {
-                "description": "Blood relations involve finding relationships between family members based on given information.",
-                "examples": [
-                    "**Example 1:** A is B's father, B is C's brother. How is A related to C? → Answer: **Father**",
-                    "**Example 2:** P's mother is Q's daughter. How is P related to Q? → Answer: **Grandson/Granddaughter**",
-                    "**Example 3:** If A + B means A is father of B, A - B means A is mother of B. What does P + Q - R mean? → Answer: **P is grandfather of R**"
-                ],
-                "strategy": [
-                    "1. Draw a family tree diagram",
-                    "2. Mark gender (M/F) to avoid confusion",
-                    "3. Work step by step from one relation to next",
-                    "4. Remember: Sister's son = Nephew, Brother's daughter = Niece"
-                ],
-                "tips": "Make a quick family tree - saves time and reduces errors!"
-            },
-            "Logical Reasoning": {
-                "description": "Logical reasoning uses thinking and analysis to solve problems without direct calculations.",
-                "examples": [
-                    "**Example 1:** All cats are animals. Some animals are pets. Therefore: Some cats are pets → **May or may not be true**",
-                    "**Example 2:** If BRIGHT = DARK opposite, then HOT = ? → Answer: **COLD**",
-                    "**Example 3:** Monday is 3 days after Friday. What day is 2 days before Wednesday? → Answer: **Monday**"
-                ],
-                "strategy": [
-                    "1. Read the question carefully - twice!",
-                    "2. Eliminate clearly wrong options first",
-                    "3. Use logic, not guesswork",
-                    "4. Check your answer by working backwards"
-                ],
-                "tips": "Practice daily - logical thinking improves with regular practice!"
-            },
-            "Series Completion": {
-                "description": "Find the missing term in a number or letter series by identifying the pattern.",
-                "examples": [
-                    "**Example 1:** 3, 6, 12, 24, ? → Answer: **48** (multiply by 2)",
-                    "**Example 2:** 1, 1, 2, 3, 5, 8, ? → Answer: **13** (Fibonacci: add previous two)",
-                    "**Example 3:** Z, Y, X, W, ? → Answer: **V** (reverse alphabetical order)"
-                ],
-                "strategy": [
-                    "1. Check differences: +2, +3, +4... (arithmetic)",
-                    "2. Check ratios: ×2, ×3... (geometric)",
-                    "3. Look for special series (Fibonacci, primes, squares)",
-                    "4. For letters, check forward/backward movement"
-                ],
-                "tips": "Write down the differences between consecutive terms!"
-            },
-            "Odd One Out": {
-                "description": "Find the item that doesn't belong to the group based on a common property.",
-                "examples": [
-                    "**Example 1:** 2, 4, 6, 9, 12 → Answer: **9** (only odd number)",
-                    "**Example 2:** Dog, Cat, Cow, Table → Answer: **Table** (not an animal)",
-                    "**Example 3:** 11, 13, 17, 19, 21 → Answer: **21** (not a prime number)"
-                ],
-                "strategy": [
-                    "1. Find what property 3 items share",
-                    "2. The 4th item lacking that property is the answer",
-                    "3. Check categories: even/odd, prime/composite, living/non-living",
-                    "4. Look for size, shape, or spelling patterns"
-                ],
-                "tips": "First find the similarity, then spot the difference!"
-            },
-            "Mirror Images": {
-                "description": "Mirror image is the reflection of an object as it appears in a mirror.",
-                "examples": [
-                    "**Example 1:** Mirror image of 'b' is **'d'**",
-                    "**Example 2:** Mirror image of 'TAX' is **'XAT'** (horizontally flipped)",
-                    "**Example 3:** Number 12 in mirror looks like: **21** (reversed)"
-                ],
-                "strategy": [
-                    "1. Imagine a vertical mirror on the right side",
-                    "2. Left-right gets swapped, but not up-down",
-                    "3. Letters like A, H, M look same in mirror (symmetric)",
-                    "4. Practice with actual mirror to understand"
-                ],
-                "tips": "Hold this page to a mirror to see how mirror images work!"
-            },
-            "Ranking Test": {
-                "description": "Finding a person's position in a row or group based on given information.",
-                "examples": [
-                    "**Example 1:** Rahul is 7th from left and 12th from right. Total students? → Answer: **7+12-1 = 18**",
-                    "**Example 2:** In a row of 20, Amit is 4th from left. Position from right? → Answer: **20-4+1 = 17th**",
-                    "**Example 3:** 15th from top, 20th from bottom. Total people? → Answer: **15+20-1 = 34**"
-                ],
-                "strategy": [
-                    "1. Formula: Total = Position from left + Position from right - 1",
-                    "2. Position from right = Total - Position from left + 1",
-                    "3. Draw dots for small numbers to visualize",
-                    "4. Remember to subtract 1 (person counted twice)"
-                ],
-                "tips": "Write the formula: L + R - 1 = Total. Memorize it!"
-            },
-            
-            # SCIENCE TOPICS
-            "HOTS Questions": {
-                "description": "Higher Order Thinking Skills questions test deep understanding and application of concepts.",
-                "examples": [
-                    "**Example 1:** Why does ice float on water? → Answer: **Ice is less dense than water**",
-                    "**Example 2:** A plant kept in dark turns yellow. Why? → Answer: **No sunlight = No chlorophyll**",
-                    "**Example 3:** Why do we see lightning before hearing thunder? → Answer: **Light travels faster than sound**"
-                ],
-                "strategy": [
-                    "1. Don't memorize - understand the 'why' behind concepts",
-                    "2. Relate science to everyday observations",
-                    "3. Think about cause and effect",
-                    "4. Apply concepts to new situations"
-                ],
-                "tips": "Always ask 'Why?' and 'What if?' to develop HOTS thinking!"
-            },
-            "Everyday Science": {
-                "description": "Science concepts applied to daily life situations and observations.",
-                "examples": [
-                    "**Example 1:** Why do wet clothes dry faster in sun? → Answer: **Heat increases evaporation**",
-                    "**Example 2:** Why does bread turn brown when toasted? → Answer: **Chemical change due to heat**",
-                    "**Example 3:** Why do we add salt to boiling water? → Answer: **Increases boiling point**"
-                ],
-                "strategy": [
-                    "1. Observe things around you",
-                    "2. Connect classroom concepts to home observations",
-                    "3. Ask parents about how things work",
-                    "4. Read science section in newspapers"
-                ],
-                "tips": "Keep a science diary - write one daily observation!"
-            },
-            
-            # ENGLISH TOPICS
-            "Reading Comprehension": {
-                "description": "Understanding passages and answering questions based on them.",
-                "examples": [
-                    "**Passage:** 'The sun rises in the east. Birds chirp in the morning.'",
-                    "**Q: When do birds chirp?** → Answer: **In the morning**",
-                    "**Q: Where does the sun rise?** → Answer: **In the east**"
-                ],
-                "strategy": [
-                    "1. Read the questions first, then the passage",
-                    "2. Underline key words in questions",
-                    "3. Find answers in passage - don't assume",
-                    "4. Check if answer is directly stated or implied"
-                ],
-                "tips": "Read slowly and carefully - speed comes with practice!"
-            },
-            "Synonyms & Antonyms": {
-                "description": "Synonyms are words with similar meanings. Antonyms have opposite meanings.",
-                "examples": [
-                    "**Synonyms:** Happy = Joyful, Glad, Cheerful",
-                    "**Antonyms:** Happy ↔ Sad, Hot ↔ Cold, Big ↔ Small",
-                    "**Trick:** Fast = Quick (synonym), Fast ↔ Slow (antonym)"
-                ],
-                "strategy": [
-                    "1. Learn word pairs together (hot-cold, up-down)",
-                    "2. Use words in sentences to understand meaning",
-                    "3. Make flashcards with word + meaning + example",
-                    "4. Learn 5 new words daily"
-                ],
-                "tips": "Create your own word dictionary with drawings!"
-            },
-            "Idioms & Phrases": {
-                "description": "Idioms are expressions that don't mean literally what the words say.",
-                "examples": [
-                    "**'A piece of cake'** = Very easy (not about actual cake!)",
-                    "**'Break a leg'** = Good luck (not literally break your leg!)",
-                    "**'Raining cats and dogs'** = Heavy rain"
-                ],
-                "strategy": [
-                    "1. Learn meaning, not literal translation",
-                    "2. Use idioms in your own sentences",
-                    "3. Understand the story/origin behind common idioms",
-                    "4. Practice 2-3 idioms per week"
-                ],
-                "tips": "Make funny drawings to remember idioms - visuals help!"
-            },
-            "Cloze Test": {
-                "description": "Fill in missing words in a passage based on context and grammar.",
-                "examples": [
-                    "**Example:** 'I ___ to school every day.' → Answer: **go** (present tense)",
-                    "**Example:** 'She is ___ than her brother.' → Answer: **taller** (comparative)",
-                    "**Example:** 'They ___ playing in the park.' → Answer: **are** (continuous tense)"
-                ],
-                "strategy": [
-                    "1. Read the full passage first",
-                    "2. Check grammar: verb tense, singular/plural",
-                    "3. Look at words before and after the blank",
-                    "4. The answer should make the sentence meaningful"
-                ],
-                "tips": "Read aloud - if it sounds wrong, it probably is!"
-            }
-        }
+        # Learning content with examples, strategies and tips (only this topic is loaded)
+        content = content_store.get_content(learn_topic)
         
         # Display learning content
-        if learn_topic in LEARNING_CONTENT:
-            content = LEARNING_CONTENT[learn_topic]
-            
+        if content:
             # Description
             st.subheader(f"📖 What is {learn_topic}?")
             st.info(content["description"])
@@ -1709,10 +1378,14 @@ with tab4:
         st.session_state.quiz_questions = None
     if 'quiz_answers' not in st.session_state:
         st.session_state.quiz_answers = {}
+    if 'quiz_timing' not in st.session_state:
+        st.session_state.quiz_timing = {}
     if 'quiz_submitted' not in st.session_state:
         st.session_state.quiz_submitted = False
     if 'quiz_score' not in st.session_state:
         st.session_state.quiz_score = None
+    if 'quiz_stream' not in st.session_state:
+        st.session_state.quiz_stream = {'expected': 0, 'done': True, 'error': None}
     
     # Show completed topics by subject
     st.subheader("📚 Select Topics to Test")
@@ -1720,7 +1393,8 @@ with tab4:
     # Filter completed topics by subject
     completed_by_subject = {}
     for subject in ["Math", "Science", "English"]:
-        completed = [t for t in completed_topics_list if t in SYLLABUS[grade][subject]]
+        done = SYLLABUS_INDEX.completed_in(grade, subject, completed_topics_list)
+        completed = [t for t in SYLLABUS[grade][subject] if t in done]
         if completed:
             completed_by_subject[subject] = completed
     
@@ -1730,12 +1404,23 @@ with tab4:
         # Subject selection
         quiz_subject = st.selectbox("Choose subject to test:", list(completed_by_subject.keys()), key="quiz_subject")
         
-        # Topic selection
-        quiz_topics = st.multiselect(
-            f"Select {quiz_subject} topics to test (1-5 topics recommended):",
-            completed_by_subject[quiz_subject],
-            key="quiz_topics_select"
+        quiz_mode = st.radio(
+            "Quiz type:",
+            ["🎯 Adaptive", "✋ Choose topics"],
+            horizontal=True,
+            key="quiz_mode",
+            help="Adaptive picks weak topics and topics due for review, at a difficulty matched to each"
         )
+        adaptive_mode = quiz_mode == "🎯 Adaptive"
+        
+        # Topic selection
+        quiz_topics = []
+        if not adaptive_mode:
+            quiz_topics = st.multiselect(
+                f"Select {quiz_subject} topics to test (1-5 topics recommended):",
+                completed_by_subject[quiz_subject],
+                key="quiz_topics_select"
+            )
         
         # Check if API key is available
         if not api_key:
@@ -1756,128 +1441,155 @@ with tab4:
         with col_q1:
             num_questions = st.slider("Number of questions:", 5, 10, 5)
         with col_q2:
-            difficulty = st.select_slider("Difficulty:", ["Easy", "Medium", "Hard"], value="Medium")
+            if adaptive_mode:
+                st.caption("Difficulty is set per topic from your recent answers.")
+            else:
+                difficulty = st.select_slider("Difficulty:", ["Easy", "Medium", "Hard"], value="Medium")
+        
+        if adaptive_mode:
+            # Topic weights are loaded once per student and completed-topic set, then
+            # updated in memory after each submission - planning a quiz needs no queries
+            model_key = (student_id, grade, frozenset(completed_topics_list))
+            if st.session_state.get('adaptive_model_key') != model_key:
+                st.session_state.adaptive_model = adaptive.load_student_model(
+                    student_id, grade, completed_topics_list, SYLLABUS_INDEX
+                )
+                st.session_state.adaptive_model_key = model_key
         
         # Generate quiz button
-        if st.button("🎲 Generate Quiz", type="primary", disabled=len(quiz_topics) == 0):
-            if not quiz_topics:
+        if st.button("🎲 Generate Quiz", type="primary", disabled=not adaptive_mode and len(quiz_topics) == 0):
+            if not adaptive_mode and not quiz_topics:
                 st.warning("Please select at least one topic!")
             else:
-                with st.spinner(f"🤖 Generating {num_questions} {difficulty.lower()} questions..."):
-                    try:
-                        # Create prompt for OpenAI
-                        topics_str = ", ".join(quiz_topics)
-                        prompt = f"""Create {num_questions} multiple choice questions for a {grade} student about these {quiz_subject} topics: {topics_str}.
-
-Difficulty level: {difficulty}
-Grade level: {grade}
-
-Requirements:
-1. Questions should be age-appropriate for {grade}
-2. Each question should have 4 options (A, B, C, D)
-3. Only ONE correct answer per question
-4. Cover different topics from the list
-5. Make questions practical and engaging
-
-Return ONLY valid JSON with this exact structure (no markdown, no code blocks):
-{{
-  "questions": [
-    {{
-      "question": "Question text here?",
-      "options": {{
-        "A": "Option A text",
-        "B": "Option B text",
-        "C": "Option C text",
-        "D": "Option D text"
-      }},
-      "correct_answer": "A",
-      "explanation": "Brief explanation why this is correct",
-      "topic": "Specific topic from the list"
-    }}
-  ]
-}}"""
-                        
-                        from openai import OpenAI
-                        client = OpenAI(api_key=api_key)
-                        
-                        response = client.chat.completions.create(
-                            model="gpt-4",
-                            messages=[
-                                {"role": "system", "content": "You are an educational quiz generator. Always return valid JSON only."},
-                                {"role": "user", "content": prompt}
-                            ],
-                            temperature=0.7
-                        )
-                        
-                        quiz_data = json.loads(response.choices[0].message.content)
-                        st.session_state.quiz_questions = quiz_data['questions']
-                        st.session_state.quiz_answers = {}
-                        st.session_state.quiz_submitted = False
-                        st.session_state.quiz_score = None
-                        st.session_state.quiz_subject_selected = quiz_subject
-                        st.session_state.quiz_topics_selected = quiz_topics
-                        st.success(f"✅ Generated {len(quiz_data['questions'])} questions!")
-                        st.rerun()
-                        
-                    except Exception as e:
-                        st.error(f"Error generating quiz: {e}")
-                        st.info("Try again or select different topics.")
+                if adaptive_mode:
+                    quiz_plan = st.session_state.adaptive_model.plan(quiz_subject, num_questions)
+                    quiz_topics = [pick.topic for pick in quiz_plan]
+                    buckets = adaptive.buckets(quiz_plan)
+                else:
+                    quiz_plan = []
+                    buckets = {difficulty: quiz_bank.allocate(quiz_topics, num_questions)}
+                
+                # Bank questions come first, generated ones stream in behind them;
+                # a background thread fills the list so the student can start answering
+                questions = []
+                status = {'expected': num_questions, 'done': False, 'error': None}
+                question_stream = quiz_bank.stream_buckets(api_key, grade, quiz_subject, buckets)
+                threading.Thread(target=fill_quiz, args=(question_stream, questions, status), daemon=True).start()
+                
+                st.session_state.quiz_questions = questions
+                st.session_state.quiz_stream = status
+                st.session_state.quiz_answers = {}
+                st.session_state.quiz_timing = {}
+                st.session_state.quiz_submitted = False
+                st.session_state.quiz_score = None
+                st.session_state.quiz_subject_selected = quiz_subject
+                st.session_state.quiz_topics_selected = quiz_topics
+                st.session_state.quiz_plan = quiz_plan
+                st.rerun()
         
         # Display quiz if generated
-        if st.session_state.quiz_questions:
+        if st.session_state.quiz_questions is not None:
             st.markdown("---")
             st.subheader("📝 Answer the Questions")
             
+            if st.session_state.get('quiz_plan'):
+                st.caption("🎯 Adaptive quiz: " + " · ".join(
+                    f"{pick.topic} ({pick.difficulty}, {pick.reason})" for pick in st.session_state.quiz_plan
+                ))
+            
             if not st.session_state.quiz_submitted:
-                # Show questions
-                for idx, q in enumerate(st.session_state.quiz_questions, 1):
-                    with st.container():
-                        st.markdown(f"### Question {idx}")
-                        st.markdown(f"**Topic:** {q.get('topic', 'N/A')}")
-                        st.markdown(f"**{q['question']}**")
-                        
-                        # Radio buttons for options
-                        answer = st.radio(
-                            f"Select your answer:",
-                            options=list(q['options'].keys()),
-                            format_func=lambda x: f"{x}) {q['options'][x]}",
-                            key=f"q_{idx}",
-                            index=None
-                        )
-                        
-                        if answer:
-                            st.session_state.quiz_answers[idx] = answer
-                        
-                        st.markdown("---")
+                quiz_status = st.session_state.quiz_stream
+                streaming = not quiz_status['done']
                 
-                # Submit button
-                if len(st.session_state.quiz_answers) == len(st.session_state.quiz_questions):
-                    if st.button("✅ Submit Quiz", type="primary", use_container_width=True):
-                        # Calculate score
-                        correct = 0
-                        for idx, q in enumerate(st.session_state.quiz_questions, 1):
-                            if st.session_state.quiz_answers.get(idx) == q['correct_answer']:
-                                correct += 1
-                        
-                        st.session_state.quiz_score = correct
-                        st.session_state.quiz_submitted = True
-                        
-                        # Save quiz result to database
-                        try:
-                            topics_str = ", ".join(st.session_state.quiz_topics_selected)
-                            db.save_quiz_result(
-                                name, grade, 
-                                st.session_state.quiz_subject_selected,
-                                len(st.session_state.quiz_questions),
-                                correct,
-                                topics_str
+                # Bound as defaults: fragment reruns see the module globals as the last full run left them
+                def render_quiz_questions(status=quiz_status, streaming=streaming):
+                    questions = list(st.session_state.quiz_questions)
+                    
+                    # Show questions received so far
+                    for idx, q in enumerate(questions, 1):
+                        # Time taken = from the question first appearing to its latest answer
+                        timing = st.session_state.quiz_timing.setdefault(idx, {'shown': time.monotonic()})
+                        with st.container():
+                            st.markdown(f"### Question {idx}")
+                            st.markdown(f"**Topic:** {q.get('topic', 'N/A')}")
+                            st.markdown(f"**{q['question']}**")
+                            
+                            # Radio buttons for options
+                            answer = st.radio(
+                                f"Select your answer:",
+                                options=list(q['options'].keys()),
+                                format_func=lambda x, q=q: f"{x}) {q['options'][x]}",
+                                key=f"q_{idx}",
+                                index=None
                             )
-                        except Exception as e:
-                            st.warning(f"Note: Quiz result saved locally but not to database: {e}")
-                        
+                            
+                            if answer and st.session_state.quiz_answers.get(idx) != answer:
+                                st.session_state.quiz_answers[idx] = answer
+                                timing['answered'] = time.monotonic()
+                            
+                            st.markdown("---")
+                    
+                    if not status['done']:
+                        st.info(f"🤖 Generating questions... {len(questions)}/{status['expected']} ready")
+                        return
+                    if streaming:
+                        # Stream just finished: rerun the whole page to stop polling and show Submit
                         st.rerun()
-                else:
-                    st.warning(f"⚠️ Please answer all {len(st.session_state.quiz_questions)} questions before submitting.")
+                    if status['error']:
+                        if questions:
+                            st.warning(f"Only {len(questions)} questions could be prepared: {status['error']}")
+                        else:
+                            st.error(f"Error generating quiz: {status['error']}")
+                            st.info("Try again or select different topics.")
+                            return
+                    
+                    # Submit button
+                    if len(st.session_state.quiz_answers) == len(questions):
+                        if st.button("✅ Submit Quiz", type="primary", use_container_width=True):
+                            # Calculate score and the per-question answer rows
+                            answers = []
+                            for idx, q in enumerate(questions, 1):
+                                chosen = st.session_state.quiz_answers.get(idx)
+                                timing = st.session_state.quiz_timing.get(idx, {})
+                                answers.append({
+                                    'question_id': q.get('id'),
+                                    'topic': q.get('topic') or 'General',
+                                    'chosen_option': chosen,
+                                    'is_correct': chosen == q['correct_answer'],
+                                    'time_taken_ms': int((timing['answered'] - timing['shown']) * 1000)
+                                                     if 'answered' in timing else None
+                                })
+                            correct = sum(a['is_correct'] for a in answers)
+                            
+                            st.session_state.quiz_score = correct
+                            st.session_state.quiz_submitted = True
+                            
+                            # Save quiz result to database
+                            try:
+                                db.save_quiz_result(
+                                    student_id,
+                                    st.session_state.quiz_subject_selected,
+                                    len(questions),
+                                    correct,
+                                    st.session_state.quiz_topics_selected,
+                                    answers
+                                )
+                            except Exception as e:
+                                st.warning(f"Note: Quiz result saved locally but not to database: {e}")
+                            
+                            # Keep the adaptive weights in step with topic_mastery without reloading
+                            if st.session_state.get('adaptive_model_key', (None,))[0] == student_id:
+                                st.session_state.adaptive_model.update(
+                                    st.session_state.quiz_subject_selected, answers
+                                )
+                            
+                            st.rerun()
+                    else:
+                        st.warning(f"⚠️ Please answer all {len(questions)} questions before submitting.")
+                
+                # While streaming, the fragment re-renders every second to pick up new questions;
+                # answering one only reruns the fragment, never the generation
+                st.fragment(render_quiz_questions, run_every=1 if streaming else None)()
             
             else:
                 # Show results
@@ -1930,7 +1642,9 @@ Return ONLY valid JSON with this exact structure (no markdown, no code blocks):
                 with col_btn1:
                     if st.button("🔄 Take New Quiz", type="primary", use_container_width=True):
                         st.session_state.quiz_questions = None
+                        st.session_state.quiz_stream = {'expected': 0, 'done': True, 'error': None}
                         st.session_state.quiz_answers = {}
+                        st.session_state.quiz_timing = {}
                         st.session_state.quiz_submitted = False
                         st.session_state.quiz_score = None
                         st.rerun()
@@ -2001,8 +1715,8 @@ with tab5:
     # Motivational message
     st.subheader("💪 Keep Going!")
     
-    total_topics_all = sum(len(SYLLABUS[grade][s]) for s in ["Math", "Science", "English"])
-    remaining = total_topics_all - len(completed_topics_list)
+    total_topics_all = SYLLABUS_INDEX.total(grade)
+    remaining = total_topics_all - SYLLABUS_INDEX.completed_count(grade, completed_topics_list)
     
     if remaining > 30:
         st.info(f"🌱 Great start! You have {remaining} topics to go. One day at a time!")
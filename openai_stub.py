@@ -0,0 +1,148 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions with well-formed quiz JSON built from the
+prompt (streamed as server-sent events, one question per line, when the
+request sets "stream": true), so the quiz worker and quiz_bank can be exercised without an API key
+or network access. Optional failure injection covers the retry paths.
+
+    python openai_stub.py --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python quiz_worker.py --once
+"""
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROMPT_PATTERN = re.compile(
+    r"Create (\d+) multiple choice questions for a (.+?) student about these (.+?) topics: (.+?)\.\n"
+)
+
+
+def fake_questions(prompt, counter):
+    """Quiz JSON matching the prompt's count and topics; every question is unique"""
+    match = PROMPT_PATTERN.search(prompt)
+    if match:
+        count, grade, subject = int(match.group(1)), match.group(2), match.group(3)
+        topics = [t.strip() for t in match.group(4).split(",")]
+    else:
+        count, grade, subject, topics = 5, "Grade 5", "Math", ["General"]
+
+    questions = []
+    for i in range(count):
+        n = next(counter)
+        topic = topics[i % len(topics)]
+        answer = "ABCD"[n % 4]
+        questions.append({
+            "question": f"[stub #{n}] {grade} {subject}: which option is correct for {topic}?",
+            "options": {k: f"{topic} option {k}" for k in "ABCD"},
+            "correct_answer": answer,
+            "explanation": f"Option {answer} is the stub's answer.",
+            "topic": topic
+        })
+    return {"questions": questions}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    counter = itertools.count(1)
+    latency = 0.0
+    failure_rate = 0.0
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.latency and not body.get("stream"):
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            self._send(429, {"error": {"message": "stub rate limit", "type": "rate_limit_error"}})
+            return
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        if body.get("stream"):
+            self._stream(body, prompt)
+            return
+
+        content = json.dumps(fake_questions(prompt, self.counter))
+        self._send(200, {
+            "id": f"chatcmpl-stub-{next(self.counter)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4}
+        })
+
+    def _stream(self, body, prompt):
+        """Questions as newline-delimited JSON, each line split over two SSE chunks"""
+        lines = [json.dumps(q) + "\n" for q in fake_questions(prompt, self.counter)["questions"]]
+        base = {"id": f"chatcmpl-stub-{next(self.counter)}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "stub")}
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for line in lines:
+            for piece in (line[:len(line) // 2], line[len(line) // 2:]):
+                chunk = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            if self.latency:
+                time.sleep(self.latency / len(lines))
+        done = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency=0.0, failure_rate=0.0):
+    """
+    Run the stub in a background thread.
+
+    Returns:
+        (server, base_url) - call server.shutdown() to stop it
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,),
+                   {"latency": latency, "failure_rate": failure_rate})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local OpenAI chat completions stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered 429")
+    args = parser.parse_args()
+
+    server, url = start_stub(args.port, args.latency, args.failure_rate)
+    print(f"Stub listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
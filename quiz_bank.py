@@ -0,0 +1,348 @@
+"""
+Quiz assembly backed by the quiz_questions bank.
+
+Questions are bucketed by (grade, subject, topic, difficulty). A quiz is
+filled from the bank first and the LLM is only called for the shortfall, so
+repeat combinations start instantly. Every generated question is stored, so
+the bank grows with use. content_hash identifies a question by its
+normalized text and options, so regenerating the same question doesn't
+duplicate it.
+
+stream_buckets assembles a quiz incrementally from {difficulty: {topic:
+count}} buckets (allocate() spreads a single-difficulty quiz over its
+topics): bank questions come out first and generated ones follow one by one
+as the LLM streams them (one JSON object per line), so the first question
+can be shown within a few seconds.
+
+Whatever the bank is short of is split into small per-topic sub-requests
+that run concurrently (fan_out), so a 10 question shortfall takes about as
+long as a 3 question one. QUIZ_FANOUT_CONCURRENCY=1 falls back to a single
+request.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+import llm_gateway
+
+MODEL = "gpt-4"
+OPTION_KEYS = ("A", "B", "C", "D")
+
+# Never ask the LLM for fewer than this many questions; extras go to the bank
+MIN_GENERATION_BATCH = 5
+
+# Parallel sub-requests per quiz and questions per sub-request
+FANOUT_CONCURRENCY = int(os.getenv("QUIZ_FANOUT_CONCURRENCY", "4"))
+FANOUT_CHUNK = 3
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def question_hash(question):
+    """sha256 of the normalized question text and its options (order-insensitive)"""
+    options = sorted(_normalize(v) for v in question['options'].values())
+    payload = json.dumps([_normalize(question['question']), options], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def validate_question(question, topics):
+    """
+    Check a generated question and normalize it for the bank.
+
+    Returns:
+        The cleaned question dict, or None if it is unusable
+    """
+    try:
+        options = {k: str(question['options'][k]).strip() for k in OPTION_KEYS}
+        answer = str(question['correct_answer']).strip().upper()[:1]
+        text = str(question['question']).strip()
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if answer not in OPTION_KEYS or not text or not all(options.values()):
+        return None
+
+    # Questions tagged with a topic outside the request go to the first requested topic
+    topic = question.get('topic')
+    if topic not in topics:
+        topic = topics[0]
+
+    cleaned = {
+        'topic': topic,
+        'question': text,
+        'options': options,
+        'correct_answer': answer,
+        'explanation': str(question.get('explanation') or '').strip()
+    }
+    cleaned['content_hash'] = question_hash(cleaned)
+    return cleaned
+
+
+def build_prompt(grade, subject, topics, difficulty, num_questions, ndjson=False):
+    """
+    Prompt asking for num_questions multiple choice questions as JSON.
+    With ndjson=True each question is asked for as its own line, so it can be
+    parsed as soon as the line is complete.
+    """
+    topics_str = ", ".join(topics)
+    header = f"""Create {num_questions} multiple choice questions for a {grade} student about these {subject} topics: {topics_str}.
+
+Difficulty level: {difficulty}
+Grade level: {grade}
+
+Requirements:
+1. Questions should be age-appropriate for {grade}
+2. Each question should have 4 options (A, B, C, D)
+3. Only ONE correct answer per question
+4. Cover different topics from the list
+5. Make questions practical and engaging
+"""
+    if ndjson:
+        return header + """
+Return ONLY newline-delimited JSON: one complete question object per line, no
+surrounding array, no markdown, no code blocks, no blank lines. Each line:
+{"question": "Question text here?", "options": {"A": "Option A text", "B": "Option B text", "C": "Option C text", "D": "Option D text"}, "correct_answer": "A", "explanation": "Brief explanation why this is correct", "topic": "Specific topic from the list"}"""
+
+    return header + """
+Return ONLY valid JSON with this exact structure (no markdown, no code blocks):
+{
+  "questions": [
+    {
+      "question": "Question text here?",
+      "options": {
+        "A": "Option A text",
+        "B": "Option B text",
+        "C": "Option C text",
+        "D": "Option D text"
+      },
+      "correct_answer": "A",
+      "explanation": "Brief explanation why this is correct",
+      "topic": "Specific topic from the list"
+    }
+  ]
+}"""
+
+
+def generate_questions(api_key, grade, subject, topics, difficulty, num_questions, base_url=None):
+    """
+    Ask the LLM for new questions; returns validated, hashed question dicts.
+    base_url points the client at another endpoint (e.g. openai_stub.py).
+    """
+    # Not cached: the same prompt should keep producing new questions for the bank
+    response = llm_gateway.chat(
+        [
+            {"role": "system", "content": "You are an educational quiz generator. Always return valid JSON only."},
+            {"role": "user", "content": build_prompt(grade, subject, topics, difficulty, num_questions)}
+        ],
+        model=MODEL,
+        cache=False,
+        api_key=api_key,
+        base_url=base_url,
+        temperature=0.7
+    )
+
+    quiz_data = json.loads(response.content)
+    questions = []
+    seen = set()
+    for raw in quiz_data.get('questions', []):
+        q = validate_question(raw, topics)
+        if q and q['content_hash'] not in seen:
+            seen.add(q['content_hash'])
+            questions.append(q)
+    return questions
+
+
+def iter_ndjson(chunks):
+    """
+    Parse streamed text chunks as newline-delimited JSON, yielding each object
+    as soon as its line is complete. Lines that aren't JSON objects (code
+    fences, stray prose, truncated output) are skipped.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            obj = _parse_line(line)
+            if obj is not None:
+                yield obj
+    obj = _parse_line(buffer)
+    if obj is not None:
+        yield obj
+
+
+def _parse_line(line):
+    line = line.strip().rstrip(",")
+    if not line.startswith("{"):
+        return None
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def stream_questions(api_key, grade, subject, topics, difficulty, num_questions, base_url=None):
+    """
+    Streaming counterpart of generate_questions: yields each validated,
+    hashed question as soon as the LLM has finished writing its line.
+    """
+    text = llm_gateway.stream_chat(
+        [
+            {"role": "system", "content": "You are an educational quiz generator. Output one JSON object per line only."},
+            {"role": "user", "content": build_prompt(grade, subject, topics, difficulty, num_questions, ndjson=True)}
+        ],
+        model=MODEL,
+        api_key=api_key,
+        base_url=base_url,
+        temperature=0.7
+    )
+
+    seen = set()
+    for raw in iter_ndjson(text):
+        q = validate_question(raw, topics)
+        if q and q['content_hash'] not in seen:
+            seen.add(q['content_hash'])
+            yield q
+
+
+def allocate(topics, num_questions):
+    """Spread num_questions across topics as evenly as possible, as {topic: count}"""
+    counts = {t: num_questions // len(topics) for t in topics}
+    for t in topics[:num_questions % len(topics)]:
+        counts[t] += 1
+    return counts
+
+
+def plan_requests(short, chunk_size=FANOUT_CHUNK):
+    """
+    Split a {topic: missing} shortfall into per-topic sub-requests of at most
+    chunk_size questions, topped up to MIN_GENERATION_BATCH in total.
+
+    Returns:
+        List of (topics, count) sub-requests
+    """
+    counts = dict(short)
+    topics = list(counts)
+    for i in range(max(MIN_GENERATION_BATCH - sum(counts.values()), 0)):
+        counts[topics[i % len(topics)]] += 1
+
+    requests = []
+    for topic, count in counts.items():
+        while count > 0:
+            requests.append(([topic], min(chunk_size, count)))
+            count -= chunk_size
+    return requests
+
+
+def fan_out(api_key, grade, subject, short, difficulty, concurrency=FANOUT_CONCURRENCY, base_url=None, stream=False):
+    """
+    Generate a shortfall as concurrent sub-requests, yielding unique questions
+    in the order they arrive (stream=True yields each as soon as its line is
+    written). With concurrency <= 1 or a single sub-request this is one
+    request for everything. Sub-requests that fail are retried together as
+    one request once the rest have finished.
+    """
+    generate = stream_questions if stream else generate_questions
+    seen = set()
+
+    def unique(questions):
+        for q in questions:
+            if q['content_hash'] not in seen:
+                seen.add(q['content_hash'])
+                yield q
+
+    requests = plan_requests(short)
+    if concurrency <= 1 or len(requests) == 1:
+        total = sum(count for _, count in requests)
+        yield from unique(generate(api_key, grade, subject, list(short), difficulty, total, base_url=base_url))
+        return
+
+    results = queue.Queue()
+
+    def worker(topics, count):
+        try:
+            for q in generate(api_key, grade, subject, topics, difficulty, count, base_url=base_url):
+                results.put(('question', q))
+            results.put(('done', None))
+        except Exception as e:
+            results.put(('failed', (topics, count, e)))
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for topics, count in requests:
+            pool.submit(worker, topics, count)
+        pending = len(requests)
+        while pending:
+            kind, value = results.get()
+            if kind == 'question':
+                yield from unique([value])
+            else:
+                pending -= 1
+                if kind == 'failed':
+                    failed.append(value)
+
+    if failed:
+        topics = list(dict.fromkeys(t for f_topics, _, _ in failed for t in f_topics))
+        yield from unique(generate(api_key, grade, subject, topics, difficulty,
+                                   sum(count for _, count, _ in failed), base_url=base_url))
+
+
+def _from_bank(grade, subject, difficulty, wanted):
+    """Bank questions for {topic: count} and the per-topic shortfall, as (questions, {topic: missing})"""
+    questions = db.sample_quiz_questions(grade, subject, difficulty, wanted)
+
+    have = {t: 0 for t in wanted}
+    for q in questions:
+        have[q['topic']] += 1
+    short = {t: n - have[t] for t, n in wanted.items() if have[t] < n}
+    return questions, short
+
+
+def stream_buckets(api_key, grade, subject, buckets, concurrency=FANOUT_CONCURRENCY, base_url=None):
+    """
+    Build a quiz from the bank, generating only what the bank can't supply.
+
+    buckets is {difficulty: {topic: count}}, e.g. a plan from adaptive.py or
+    {difficulty: allocate(topics, n)}. Yields quiz questions one at a time:
+    bank questions for every bucket first (shuffled), then each shortfall
+    generated bucket by bucket in the order the LLM streams them. Each
+    generated question is stored as it arrives, so it has a bank id when
+    yielded; extras beyond the quiz still go to the bank.
+    """
+    bank = []
+    pending = []
+    for difficulty, wanted in buckets.items():
+        questions, short = _from_bank(grade, subject, difficulty, wanted)
+        bank.extend(questions)
+        if short:
+            pending.append((difficulty, short, sum(wanted.values()) - len(questions)))
+
+    random.shuffle(bank)
+    yield from bank
+
+    seen = {q['id'] for q in bank}
+    for difficulty, short, remaining in pending:
+        leftovers = []
+        for q in fan_out(api_key, grade, subject, dict(short), difficulty, concurrency, base_url=base_url, stream=True):
+            stored = db.add_quiz_questions(grade, subject, difficulty, [q])
+            if not stored or stored[0]['id'] in seen:
+                continue
+            stored = stored[0]
+            seen.add(stored['id'])
+            if remaining and short.get(stored['topic'], 0) > 0:
+                short[stored['topic']] -= 1
+                remaining -= 1
+                yield stored
+            else:
+                leftovers.append(stored)
+
+        # Topics the LLM under-covered are made up from whatever else it produced
+        yield from leftovers[:remaining]
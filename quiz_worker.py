@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Quiz bank pre-generation worker.
+
+Keeps (grade, subject, topic, difficulty) buckets in quiz_questions topped
+up so quizzes are served from the bank instead of waiting on the LLM.
+Topics quizzed recently (quiz_results) are filled to --hot-target; with
+--all-topics every syllabus topic is also kept at --cold-target.
+
+Generation runs on a bounded thread pool behind a shared rate limiter, and
+failed calls are retried with exponential backoff and jitter.
+
+    python quiz_worker.py --once                     # one pass, then exit
+    python quiz_worker.py --interval 600             # keep watching
+    python quiz_worker.py --once --stub              # against a local openai_stub.py
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+import database as db
+import quiz_bank
+import syllabus
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+HOT_TARGET = 20           # questions kept per bucket for recently quizzed topics
+COLD_TARGET = 5           # questions kept per bucket for every other syllabus topic
+DEMAND_DAYS = 14
+MAX_BATCH = 10            # questions requested per LLM call
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads: at most `rate` calls per `per` seconds"""
+
+    def __init__(self, rate, per=60.0):
+        # A bucket smaller than one call would never fill up enough to release it
+        self.capacity = max(float(rate), 1.0)
+        self.tokens = self.capacity
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+def plan_jobs(fill, demand, syllabus_index, hot_target=HOT_TARGET, cold_target=COLD_TARGET, all_topics=False):
+    """
+    Buckets below target, most in-demand and emptiest first.
+
+    Returns:
+        List of (grade, subject, topic, difficulty, count) jobs, count <= MAX_BATCH
+    """
+    targets = {}
+    if all_topics:
+        for grade, subjects in syllabus_index.raw.items():
+            for subject, topics in subjects.items():
+                for topic in topics:
+                    for difficulty in DIFFICULTIES:
+                        targets[(grade, subject, topic, difficulty)] = cold_target
+    for (grade, subject, topic) in demand:
+        # quiz_results don't record difficulty, so demand warms every level
+        if syllabus_index.subject_of(grade, topic) is None:
+            continue
+        for difficulty in DIFFICULTIES:
+            targets[(grade, subject, topic, difficulty)] = hot_target
+
+    jobs = []
+    for bucket, target in targets.items():
+        deficit = target - fill.get(bucket, 0)
+        if deficit > 0:
+            jobs.append((demand.get(bucket[:3], 0), deficit, bucket))
+    jobs.sort(key=lambda j: (-j[0], -j[1]))
+
+    return [bucket + (min(deficit, MAX_BATCH),) for _, deficit, bucket in jobs]
+
+
+def run_job(job, api_key, base_url, limiter, max_retries):
+    """Generate and store one batch; returns the number of new questions stored"""
+    grade, subject, topic, difficulty, count = job
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            questions = quiz_bank.generate_questions(api_key, grade, subject, [topic], difficulty, count,
+                                                     base_url=base_url)
+            stored = db.add_quiz_questions(grade, subject, difficulty, questions, source='worker')
+            # Questions already in the bank come back too; only count what this batch added
+            return len({q['id'] for q in stored if q['new']})
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            # Exponential backoff with full jitter: 1s, 2s, 4s ... capped at 60s
+            delay = random.uniform(0, min(60, 2 ** attempt))
+            print(f"  retry {attempt + 1}/{max_retries} for {grade}/{subject}/{topic}/{difficulty} "
+                  f"in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+
+def run_pass(args, api_key, base_url, syllabus_index):
+    """Plan and run one top-up pass; returns (jobs, new questions stored, failures)"""
+    demand = db.get_recent_quiz_demand(args.demand_days, syllabus_index)
+    jobs = plan_jobs(db.get_quiz_bank_fill(), demand, syllabus_index,
+                     hot_target=args.hot_target, cold_target=args.cold_target, all_topics=args.all_topics)
+    if args.max_jobs:
+        jobs = jobs[:args.max_jobs]
+    if not jobs:
+        return 0, 0, 0
+
+    limiter = RateLimiter(args.rpm)
+    stored = failures = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {pool.submit(run_job, job, api_key, base_url, limiter, args.retries): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                stored += future.result()
+            except Exception as e:
+                failures += 1
+                print(f"  failed {'/'.join(job[:4])}: {e}")
+    return len(jobs), stored, failures
+
+
+def positive_float(text):
+    """argparse type for rates: a number above zero"""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+    return value
+
+
+def positive_int(text):
+    """argparse type for counts and intervals: a whole number above zero"""
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the quiz question bank topped up")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--interval", type=positive_int, default=600, help="Seconds between passes")
+    parser.add_argument("--concurrency", type=positive_int, default=4, help="Parallel LLM calls")
+    parser.add_argument("--rpm", type=positive_float, default=30, help="Max LLM requests per minute")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--hot-target", type=int, default=HOT_TARGET)
+    parser.add_argument("--cold-target", type=int, default=COLD_TARGET)
+    parser.add_argument("--demand-days", type=int, default=DEMAND_DAYS)
+    parser.add_argument("--all-topics", action="store_true", help="Also fill every syllabus topic to --cold-target")
+    parser.add_argument("--max-jobs", type=int, default=0, help="Cap jobs per pass (0 = no cap)")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"), help="Alternative API endpoint")
+    parser.add_argument("--stub", action="store_true", help="Start a local openai_stub.py and use it")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    base_url = args.base_url
+    if args.stub:
+        import openai_stub
+        _, base_url = openai_stub.start_stub()
+        api_key = api_key or "stub"
+        print(f"Using local stub at {base_url}")
+    if not api_key:
+        try:
+            api_key = st.secrets["OPENAI_API_KEY"]
+        except (KeyError, AttributeError):
+            raise SystemExit("OPENAI_API_KEY not set (environment or secrets.toml)")
+
+    syllabus_index = syllabus.load_syllabus()
+    while True:
+        start = time.perf_counter()
+        jobs, stored, failures = run_pass(args, api_key, base_url, syllabus_index)
+        print(f"Pass done in {time.perf_counter() - start:.1f}s: {jobs} buckets, "
+              f"{stored} new questions stored, {failures} failed")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
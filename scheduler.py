@@ -0,0 +1,224 @@
+"""
+Weekly study schedule generator for the Olympic Planner.
+
+plan_week() is a pure greedy heuristic: it fills each day up to the
+student's available minutes, spreads subjects evenly in proportion to the
+work left in each, and takes weak and pending topics first. It runs in well
+under a millisecond per student, so the same code serves the "Auto-plan"
+button and the nightly batch:
+
+    python scheduler.py --week 2026-10-19 --weekday-minutes 60 --weekend-minutes 120
+"""
+
+import math
+from datetime import timedelta
+
+# Study time recommendations (minutes per session)
+STUDY_PLAN = {
+    "Grade 1": {"Math": 30, "Science": 20, "English": 20},
+    "Grade 2": {"Math": 30, "Science": 25, "English": 25},
+    "Grade 3": {"Math": 45, "Science": 30, "English": 30},
+    "Grade 4": {"Math": 45, "Science": 35, "English": 35},
+    "Grade 5": {"Math": 60, "Science": 45, "English": 45},
+    "Grade 6": {"Math": 60, "Science": 45, "English": 45},
+    "Grade 7": {"Math": 60, "Science": 50, "English": 45},
+    "Grade 8": {"Math": 60, "Science": 50, "English": 45},
+    "Grade 9": {"Math": 75, "Science": 60, "English": 45},
+    "Grade 10": {"Math": 75, "Science": 60, "English": 45},
+    "Grade 11": {"Math": 90, "Science": 75, "English": 45},
+    "Grade 12": {"Math": 90, "Science": 75, "English": 45}
+}
+
+# Fallback when a preset topic has no estimated_hours
+DIFFICULTY_HOURS = {"Easy": 1.0, "Medium": 1.5, "Hard": 2.0}
+DIFFICULTY_RANK = {"Easy": 0, "Medium": 1, "Hard": 2}
+
+MIN_SESSION_MINUTES = 15
+MAX_TOPICS_PER_SESSION = 5
+WEAK_SCORE = 60              # quiz % below which a completed topic is revised
+UNTESTED_WEAKNESS = 0.5      # weakness assumed for topics never quizzed
+REVISION_SHARE = 0.5         # revision needs half the original study time
+
+
+def _topic_queue(topics, completed, topic_scores):
+    """
+    Order one subject's topics by priority.
+
+    Pending topics and weak completed topics come first (weakest, then hardest,
+    then syllabus order); other completed topics follow as revision material.
+    Entries are [topic, minutes left, tier], tier 0 being the outstanding work.
+    """
+    ranked = []
+    for index, t in enumerate(topics):
+        hours = float(t.get('estimated_hours') or DIFFICULTY_HOURS.get(t.get('difficulty'), 1.5))
+        score = topic_scores.get(t['topic'])
+        weakness = UNTESTED_WEAKNESS if score is None else 1 - score / 100.0
+        done = t['topic'] in completed
+
+        if done and (score is None or score >= WEAK_SCORE):
+            tier, minutes = 1, hours * 60 * REVISION_SHARE
+        elif done:
+            tier, minutes = 0, hours * 60 * REVISION_SHARE
+        else:
+            tier, minutes = 0, hours * 60
+
+        ranked.append((tier, -weakness, -DIFFICULTY_RANK.get(t.get('difficulty'), 1), index,
+                       t['topic'], minutes))
+
+    ranked.sort()
+    return [[topic, minutes, tier] for tier, _, _, _, topic, minutes in ranked]
+
+
+def plan_week(week_start, daily_minutes, topics, session_minutes,
+              completed=(), topic_scores=None, exam_date=None):
+    """
+    Build one week of planned sessions.
+
+    Args:
+        week_start: Monday of the week (date)
+        daily_minutes: 7 daily caps, Monday first
+        topics: preset_topics rows for the grade (subject, topic, difficulty, estimated_hours)
+        session_minutes: Preferred session length per subject (a STUDY_PLAN entry)
+        completed: Topic names already completed
+        topic_scores: Optional {topic: average quiz %} - low scores are studied first
+        exam_date: Optional exam date; nothing is planned on or after it, and daily
+                   time is raised (up to the cap) so pending work fits before it
+
+    Returns:
+        List of session dicts (plan_date, subject, topics, duration_minutes),
+        the shape database.save_week_plan() takes. Empty when every topic is
+        completed and none scores below WEAK_SCORE: revision of strong topics
+        only fills time alongside outstanding work, it is never planned alone.
+    """
+    completed = set(completed)
+    topic_scores = topic_scores or {}
+
+    queues = {}
+    for subject in session_minutes:
+        subject_topics = [t for t in topics if t['subject'] == subject]
+        queues[subject] = _topic_queue(subject_topics, completed, topic_scores)
+
+    if not any(tier == 0 for q in queues.values() for _, _, tier in q):
+        return []
+    pending = {s: sum(m for _, m, _ in q) for s, q in queues.items()}
+    total_pending = sum(pending.values())
+    share = {s: pending[s] / total_pending for s in queues}
+    allocated = {s: 0 for s in queues}
+    base_day = sum(session_minutes.values())
+
+    plan = []
+    for offset in range(7):
+        day = week_start + timedelta(days=offset)
+        if exam_date is not None and day >= exam_date:
+            break
+
+        budget = daily_minutes[offset]
+        if exam_date is not None:
+            days_left = (exam_date - day).days
+            remaining = sum(m for q in queues.values() for _, m, _ in q)
+            budget = min(budget, max(base_day, math.ceil(remaining / days_left)))
+        else:
+            budget = min(budget, base_day)
+
+        used_today = set()
+        while budget >= MIN_SESSION_MINUTES:
+            # Subject furthest behind its share of the week; prefer one not yet studied today
+            candidates = [s for s in queues if queues[s]]
+            if not candidates:
+                break
+            fresh = [s for s in candidates if s not in used_today] or candidates
+            subject = min(fresh, key=lambda s: (allocated[s] / share[s] if share[s] else math.inf, s))
+
+            length = min(session_minutes[subject], budget)
+            session_topics = []
+            left = length
+            queue = queues[subject]
+            while left > 0 and queue and len(session_topics) < MAX_TOPICS_PER_SESSION:
+                entry = queue[0]
+                session_topics.append(entry[0])
+                taken = min(left, entry[1])
+                entry[1] -= taken
+                left -= taken
+                if entry[1] <= 0:
+                    queue.pop(0)
+
+            plan.append({
+                'plan_date': day,
+                'subject': subject,
+                'topics': session_topics,
+                'duration_minutes': length
+            })
+            allocated[subject] += length
+            budget -= length
+            used_today.add(subject)
+
+    return plan
+
+
+def daily_caps(weekday_minutes, weekend_minutes):
+    """7 daily caps (Monday first) from separate weekday and weekend budgets"""
+    return [weekday_minutes] * 5 + [weekend_minutes] * 2
+
+
+def plan_all_students(week_start, weekday_minutes, weekend_minutes, exam_date=None, active_days=30):
+    """
+    Nightly batch: plan the week for every recently active student without a plan.
+
+    Inputs are loaded with one query each and all plans are written in one
+    transaction.
+
+    Returns:
+        (students planned, sessions written)
+    """
+    import database as db
+
+    students = db.get_students_needing_plan(week_start, active_days=active_days)
+    if not students:
+        return 0, 0
+
+    student_ids = [s['id'] for s in students]
+    topics_by_grade = {}
+    for t in db.get_preset_topics_for_grades({s['grade'] for s in students}):
+        topics_by_grade.setdefault(t['grade'], []).append(t)
+    completed_by_id = db.get_completed_topic_names(student_ids)
+    scores_by_id = db.get_topic_quiz_scores(student_ids)
+    caps = daily_caps(weekday_minutes, weekend_minutes)
+
+    plans = {}
+    for s in students:
+        if s['grade'] not in STUDY_PLAN:
+            continue
+        plans[s['id']] = plan_week(
+            week_start, caps, topics_by_grade.get(s['grade'], []), STUDY_PLAN[s['grade']],
+            completed=completed_by_id.get(s['id'], ()),
+            topic_scores=scores_by_id.get(s['id'], {}),
+            exam_date=exam_date
+        )
+
+    written = db.save_week_plans(week_start, plans)
+    return len(plans), written
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from datetime import date, datetime
+
+    parser = argparse.ArgumentParser(description="Generate weekly study plans for all active students")
+    parser.add_argument("--week", help="Any date in the target week (default: next week)")
+    parser.add_argument("--weekday-minutes", type=int, default=60)
+    parser.add_argument("--weekend-minutes", type=int, default=120)
+    parser.add_argument("--exam-date", help="Olympiad date (YYYY-MM-DD)")
+    parser.add_argument("--active-days", type=int, default=30,
+                        help="Only plan for students with a session in this many days")
+    args = parser.parse_args()
+
+    target = datetime.strptime(args.week, "%Y-%m-%d").date() if args.week else date.today() + timedelta(days=7)
+    monday = target - timedelta(days=target.weekday())
+    exam = datetime.strptime(args.exam_date, "%Y-%m-%d").date() if args.exam_date else None
+
+    start = time.perf_counter()
+    planned, sessions = plan_all_students(monday, args.weekday_minutes, args.weekend_minutes,
+                                          exam_date=exam, active_days=args.active_days)
+    print(f"Week of {monday}: planned {planned} students, {sessions} sessions "
+          f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,47 @@
+"""
+Threshold-band helpers shared by churn_scoring.py and upsell_scoring.py.
+
+A band table is a list of (op, threshold, value) tuples checked in order;
+the first band whose condition holds gives the value, otherwise the
+default applies. band_values() evaluates a table over a whole column with
+NumPy, band_value() over one number in plain Python.
+"""
+
+import operator
+
+import numpy as np
+
+OPS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq}
+
+
+def column(columns, name, n):
+    """columns[name] as a float array of length n; all NaN when the column is absent"""
+    values = columns.get(name)
+    if values is None:
+        return np.full(n, np.nan)
+    return np.asarray(values, dtype=float).reshape(n)
+
+
+def band_values(bands, x, default, missing):
+    """Vectorized band lookup over the float array x; NaN (not provided) gives `missing`"""
+    conditions = [OPS[op](x, threshold) for op, threshold, _ in bands]
+    return np.where(np.isnan(x), missing, np.select(conditions, [value for _, _, value in bands], default))
+
+
+def band_value(bands, v, default):
+    """Scalar band lookup; `default` is returned when no band matches"""
+    for op, threshold, value in bands:
+        if OPS[op](v, threshold):
+            return value
+    return default
+
+
+def flatten_metrics(account_data):
+    """Merge an app's nested account_data groups into one {metric: value} dict"""
+    flat = {}
+    for key, value in account_data.items():
+        if isinstance(value, dict):
+            flat.update(value)
+        else:
+            flat[key] = value
+    return flat
@@ -0,0 +1,149 @@
+"""
+Olympiad syllabus (IMO, NSO, IEO aligned), loaded once per process.
+
+The topic lists live in syllabus.json. They are validated on load:
+duplicate keys, missing subjects and repeated topics are errors, not
+silently collapsed the way a dict literal collapses them. The loaded
+Syllabus holds the lookup structures the app needs: frozen topic sets,
+topic -> subject maps, per-grade totals and stable integer topic ids.
+"""
+
+import json
+import os
+import zlib
+
+import streamlit as st
+
+SYLLABUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "syllabus.json")
+
+SUBJECTS = ("Math", "Science", "English")
+
+
+class SyllabusError(ValueError):
+    """Raised when syllabus.json fails validation"""
+
+
+def _reject_duplicate_keys(pairs):
+    result = {}
+    for key, value in pairs:
+        if key in result:
+            raise SyllabusError(f"Duplicate key {key!r} in syllabus")
+        result[key] = value
+    return result
+
+
+def topic_id(grade, subject, topic):
+    """Stable integer id for a topic, independent of its position in the list"""
+    return zlib.crc32(f"{grade}|{subject}|{topic}".encode("utf-8")) & 0x7FFFFFFF
+
+
+class Syllabus:
+    """Validated syllabus with precomputed lookups"""
+
+    def __init__(self, grades, version=1):
+        self.version = version
+        problems = []
+
+        self.raw = {}            # grade -> subject -> list of topics, in syllabus order
+        self.topic_sets = {}     # grade -> subject -> frozenset of topics
+        self.grade_topics = {}   # grade -> frozenset of every topic in the grade
+        self.topic_subject = {}  # grade -> topic -> subject
+        self.totals = {}         # grade -> total topic count
+        self.topic_ids = {}      # (grade, subject, topic) -> stable id
+
+        for grade, subjects in grades.items():
+            missing = [s for s in SUBJECTS if s not in subjects]
+            if missing:
+                problems.append(f"{grade}: missing {', '.join(missing)}")
+
+            self.raw[grade] = {}
+            self.topic_sets[grade] = {}
+            self.topic_subject[grade] = {}
+            for subject, topics in subjects.items():
+                repeated = sorted({t for t in topics if topics.count(t) > 1})
+                if repeated:
+                    problems.append(f"{grade} {subject}: repeated topics {', '.join(repeated)}")
+                if any(not isinstance(t, str) or not t.strip() for t in topics):
+                    problems.append(f"{grade} {subject}: empty topic name")
+
+                self.raw[grade][subject] = list(topics)
+                self.topic_sets[grade][subject] = frozenset(topics)
+                for topic in topics:
+                    # A topic listed under two subjects keeps the first subject
+                    self.topic_subject[grade].setdefault(topic, subject)
+                    self.topic_ids[(grade, subject, topic)] = topic_id(grade, subject, topic)
+
+            self.grade_topics[grade] = frozenset(self.topic_subject[grade])
+            self.totals[grade] = sum(len(s) for s in self.topic_sets[grade].values())
+
+        if len(set(self.topic_ids.values())) != len(self.topic_ids):
+            problems.append("topic id collision - rename one of the colliding topics")
+
+        if problems:
+            raise SyllabusError("Invalid syllabus: " + "; ".join(problems))
+
+    # Lookups
+    def topics(self, grade, subject):
+        """Topics for a grade and subject, in syllabus order"""
+        return self.raw.get(grade, {}).get(subject, [])
+
+    def subject_of(self, grade, topic):
+        """Subject a topic belongs to (None if not in the grade)"""
+        return self.topic_subject.get(grade, {}).get(topic)
+
+    def total(self, grade, subject=None):
+        """Number of topics in a grade, or in one subject of it"""
+        if subject is None:
+            return self.totals.get(grade, 0)
+        return len(self.topic_sets.get(grade, {}).get(subject, ()))
+
+    def completed_in(self, grade, subject, completed):
+        """Completed topics that belong to the subject, as a frozenset"""
+        return self.topic_sets.get(grade, {}).get(subject, frozenset()) & frozenset(completed)
+
+    def completed_count(self, grade, completed):
+        """How many completed topics belong to the grade"""
+        return len(self.grade_topics.get(grade, frozenset()) & frozenset(completed))
+
+    def split_topics(self, grade, text):
+        """
+        Topic names from a comma-joined quiz_results.topics string.
+
+        Several topics contain commas themselves ("Acids, Bases & Salts"), so
+        the pieces are re-joined greedily into the longest name the grade
+        knows; pieces that match nothing are kept as they are.
+        """
+        known = self.grade_topics.get(grade, frozenset())
+        parts = [p.strip() for p in (text or "").split(",")]
+        topics = []
+        i = 0
+        while i < len(parts):
+            for j in range(len(parts), i, -1):
+                name = ", ".join(parts[i:j])
+                if j == i + 1 or name in known:
+                    break
+            if name:
+                topics.append(name)
+            i = j
+        return topics
+
+    def progress(self, grade, completed):
+        """{subject: (completed, total)} for every subject of the grade"""
+        completed = frozenset(completed)
+        return {
+            subject: (len(topics & completed), len(topics))
+            for subject, topics in self.topic_sets.get(grade, {}).items()
+        }
+
+
+def load_syllabus(path=SYLLABUS_PATH):
+    """Read and validate syllabus.json"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f, object_pairs_hook=_reject_duplicate_keys)
+    return Syllabus(data["grades"], version=data.get("version", 1))
+
+
+@st.cache_resource
+def get_syllabus():
+    """Process-wide Syllabus, loaded and validated once"""
+    return load_syllabus()
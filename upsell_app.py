@@ -1,6 +1,10 @@
 import os
 import streamlit as st
-from openai import OpenAI
+import llm_gateway
+import upsell_scoring
+import scoring_bands
+import csv
+import io
 import json
 from datetime import datetime
 
@@ -10,8 +14,6 @@ if not api_key:
     st.error("⚠️ Please set OPENAI_API_KEY environment variable")
     st.stop()
 
-client = OpenAI(api_key=api_key)
-
 st.set_page_config(page_title="📈 Upsell Opportunity Analyzer", layout="wide")
 
 st.title("📈 Upsell Opportunity Analyzer")
@@ -46,6 +48,11 @@ with st.sidebar:
     - Success metrics
     """)
 
+    st.header("📐 Expansion Score")
+    st.markdown("\n".join(
+        f"- **{label}**: up to {max_points} points" for _, label, max_points in upsell_scoring.CATEGORIES
+    ))
+
 # Main form
 col1, col2 = st.columns(2)
 
@@ -92,6 +99,12 @@ additional_context = st.text_area(
     placeholder="e.g., 'Customer asked about advanced analytics in last QBR', 'Hiring 10 new team members next quarter'"
 )
 
+write_narrative = st.checkbox(
+    "✍️ Add GPT-4 product recommendations & talk track",
+    value=False,
+    help="The expansion score and signals are computed locally; GPT-4 only writes the recommendations"
+)
+
 if st.button("🔍 Analyze Upsell Opportunities", type="primary"):
     # Create structured data object
     account_data = {
@@ -142,171 +155,154 @@ if st.button("🔍 Analyze Upsell Opportunities", type="primary"):
             st.error(issue)
         st.warning("Please correct the data before proceeding.")
     else:
-        # Create upsell analysis prompt
-        context_prompt = """
-You are an expert Sales Operations AI that identifies expansion and upsell opportunities.
+        # Local scoring: the expansion score formula runs in microseconds, no LLM round trip
+        score = upsell_scoring.score_account(scoring_bands.flatten_metrics(account_data))
+        
+        # Optional narrative on top of the score; llm_gateway caches it per account data + score
+        narrative_prompt = """
+You are an expert Sales Operations AI that turns expansion scores into upsell plans.
+
+An account has already been scored by a fixed formula. You are given its metrics,
+expansion_score (0-100), expansion_potential, the points each signal contributed and
+the strongest signals. Do NOT change the score or the potential.
 
 Your job:
-- Analyze account metrics to calculate an Expansion Score (0-100)
-- Identify specific upsell products that match the account's usage patterns
+- Pick upsell products that match the account's signals
 - Provide data-driven reasoning for each recommendation
 - Estimate potential expansion ARR
 - Always return STRICT JSON only
 
 REQUIRED JSON FORMAT:
-{{
-  "expansion_score": <int 0-100>,
-  "expansion_potential": "Low" | "Medium" | "High" | "Very High",
+{
   "recommended_products": [
-    {{
+    {
       "product": "<product name>",
       "priority": "High" | "Medium" | "Low",
       "reasoning": "<data-based explanation>",
       "estimated_arr_impact": <int>
-    }}
+    }
   ],
-  "key_signals": ["<signal 1>", "<signal 2>", "<signal 3>"],
   "optimal_timing": "<when to approach>",
   "talk_track": "<suggested conversation starter based on data>"
-}}
-
-EXPANSION SCORE CALCULATION RULES:
-
-1. UTILIZATION (0-30 points):
-   - >90% utilization → 30 points (seats upsell opportunity)
-   - 70-90% → 20 points
-   - 50-70% → 10 points
-   - <50% → 5 points
-
-2. USAGE GROWTH (0-25 points):
-   - >30% growth → 25 points
-   - 15-30% → 20 points
-   - 5-15% → 10 points
-   - <5% → 5 points
-
-3. ENGAGEMENT & SUCCESS (0-20 points):
-   - High NPS (>40) + CSAT (>4) + milestones → 20 points
-   - Multiple champions → additional signal
-   - Feature adoption >60% → strong signal
-
-4. GROWTH SIGNALS (0-15 points):
-   - Team growth >15% → 15 points
-   - High exec engagement → 10 points
-   - API integration depth → technical stickiness
-
-5. READINESS (0-10 points):
-   - Budget cycle <90 days → 10 points
-   - Recent training engagement → buying interest
-   - Support interactions (exploratory, not issues) → positive signal
+}
 
 CONSTRAINTS:
 - Only recommend products from the available_upsell_products list
-- Base all reasoning on specific numeric metrics provided
+- Base all reasoning on specific numeric metrics and signal contributions provided
 - Do NOT make up data or assume information not given
-- If data is insufficient, state that clearly
 - Estimated ARR impact should be realistic based on current ARR
 """
-
-        prompt = f"""
-Analyze the following account for upsell and expansion opportunities using the rules above.
-
-Account Data:
-{json.dumps(account_data, indent=2)}
-
-Provide your analysis as JSON following the required format. Base all recommendations strictly on the data provided.
-"""
-
-        with st.spinner("🔄 Analyzing upsell opportunities..."):
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": context_prompt
-                        },
-                        {
-                            "role": "user", 
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.2
-                )
-                
-                output = response.choices[0].message.content
-                
-                # Store in session state
-                st.session_state.account_data = account_data
-                st.session_state.upsell_result = output
-                st.session_state.messages = []
-                
-                # Try to parse JSON for better display
+        
+        narrative = None
+        narrative_output = None
+        if write_narrative:
+            with st.spinner("✍️ Writing recommendations..."):
                 try:
-                    result_json = json.loads(output)
-                    
-                    st.success("✅ Analysis Complete")
-                    
-                    # Display key metrics
-                    col_a, col_b, col_c = st.columns(3)
-                    with col_a:
-                        st.metric("Expansion Score", f"{result_json.get('expansion_score', 'N/A')}/100")
-                    with col_b:
-                        st.metric("Potential", result_json.get('expansion_potential', 'N/A'))
-                    with col_c:
-                        est_impact = sum([p.get('estimated_arr_impact', 0) for p in result_json.get('recommended_products', [])])
-                        st.metric("Est. ARR Impact", f"${est_impact:,}")
-                    
-                    # Show recommendations
-                    st.markdown("---")
-                    st.markdown("### 🎯 Recommended Products")
-                    for product in result_json.get('recommended_products', []):
-                        with st.expander(f"**{product.get('product', 'Unknown')}** - Priority: {product.get('priority', 'N/A')}"):
-                            st.markdown(f"**Reasoning:** {product.get('reasoning', 'N/A')}")
-                            st.markdown(f"**Est. ARR Impact:** ${product.get('estimated_arr_impact', 0):,}")
-                    
-                    # Key signals
-                    st.markdown("### 📊 Key Expansion Signals")
-                    for signal in result_json.get('key_signals', []):
-                        st.markdown(f"- {signal}")
-                    
-                    # Timing and talk track
-                    st.markdown("### ⏰ Optimal Timing")
-                    st.info(result_json.get('optimal_timing', 'N/A'))
-                    
-                    st.markdown("### 💬 Suggested Talk Track")
-                    st.success(result_json.get('talk_track', 'N/A'))
-                    
+                    response = llm_gateway.chat(
+                        model="gpt-4",
+                        api_key=api_key,
+                        messages=[
+                            {"role": "system", "content": narrative_prompt},
+                            {"role": "user", "content": json.dumps({"account_data": account_data, **score}, indent=2)}
+                        ],
+                        temperature=0.2
+                    )
+                    narrative_output = response.content
+                    narrative = json.loads(narrative_output)
                 except json.JSONDecodeError:
-                    # Fallback to plain text
-                    st.success("✅ Analysis Complete")
-                    st.markdown(output)
-                
-                # Show input data for transparency
-                with st.expander("📊 Input Data Used"):
-                    st.json(account_data)
-                
-                # Timestamp
-                st.caption(f"Analysis generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # Download option
-                report = f"""UPSELL OPPORTUNITY ANALYSIS
+                    pass  # shown as plain text below
+                except Exception as e:
+                    st.warning(f"⚠️ Recommendations unavailable: {str(e)}")
+        
+        analysis = json.dumps(score, indent=2)
+        if narrative_output:
+            analysis += f"\n\nRECOMMENDATIONS:\n{narrative_output}"
+        
+        # Store in session state
+        st.session_state.account_data = account_data
+        st.session_state.upsell_result = analysis
+        st.session_state.messages = []
+        
+        st.success("✅ Analysis Complete")
+        
+        # Display key metrics
+        col_a, col_b, col_c = st.columns(3)
+        with col_a:
+            st.metric("Expansion Score", f"{score['expansion_score']}/100")
+        with col_b:
+            st.metric("Potential", score['expansion_potential'])
+        with col_c:
+            if narrative:
+                est_impact = sum([p.get('estimated_arr_impact', 0) for p in narrative.get('recommended_products', [])])
+                st.metric("Est. ARR Impact", f"${est_impact:,}")
+            else:
+                st.metric("Signals Provided", f"{score['coverage']:.0%}")
+        
+        # Score breakdown
+        st.markdown("### 📐 Score Breakdown")
+        for key, label, max_points in upsell_scoring.CATEGORIES:
+            points = score['category_points'][key]
+            st.progress(points / max_points, text=f"{label}: {points:g}/{max_points}")
+        
+        with st.expander("🔎 Points per Signal"):
+            metrics = scoring_bands.flatten_metrics(account_data)
+            st.dataframe([
+                {
+                    "Signal": upsell_scoring.SIGNALS[name][1],
+                    "Value": metrics.get(name),
+                    "Points": points
+                }
+                for name, points in score['contributions'].items()
+            ], use_container_width=True, hide_index=True)
+        
+        # Key signals
+        st.markdown("### 📊 Key Expansion Signals")
+        for signal in score['key_signals']:
+            st.markdown(f"- {signal}")
+        
+        if narrative:
+            # Show recommendations
+            st.markdown("---")
+            st.markdown("### 🎯 Recommended Products")
+            for product in narrative.get('recommended_products', []):
+                with st.expander(f"**{product.get('product', 'Unknown')}** - Priority: {product.get('priority', 'N/A')}"):
+                    st.markdown(f"**Reasoning:** {product.get('reasoning', 'N/A')}")
+                    st.markdown(f"**Est. ARR Impact:** ${product.get('estimated_arr_impact', 0):,}")
+            
+            # Timing and talk track
+            st.markdown("### ⏰ Optimal Timing")
+            st.info(narrative.get('optimal_timing', 'N/A'))
+            
+            st.markdown("### 💬 Suggested Talk Track")
+            st.success(narrative.get('talk_track', 'N/A'))
+        elif narrative_output:
+            # Fallback to plain text
+            st.markdown("### 🎯 Recommendations")
+            st.markdown(narrative_output)
+        
+        # Show input data for transparency
+        with st.expander("📊 Input Data Used"):
+            st.json(account_data)
+        
+        # Timestamp
+        st.caption(f"Analysis generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        # Download option
+        report = f"""UPSELL OPPORTUNITY ANALYSIS
 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 ACCOUNT DATA:
 {json.dumps(account_data, indent=2)}
 
 ANALYSIS:
-{output}
+{analysis}
 """
-                st.download_button(
-                    label="📥 Download Report",
-                    data=report,
-                    file_name=f"upsell_analysis_{account_id}_{datetime.now().strftime('%Y%m%d')}.txt",
-                    mime="text/plain"
-                )
-                
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)}")
+        st.download_button(
+            label="📥 Download Report",
+            data=report,
+            file_name=f"upsell_analysis_{account_id}_{datetime.now().strftime('%Y%m%d')}.txt",
+            mime="text/plain"
+        )
 
 # Chatbot for upsell questions
 if st.session_state.upsell_result is not None:
@@ -346,8 +342,9 @@ Provide a helpful answer based strictly on the data.
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    chat_response = client.chat.completions.create(
+                    chat_response = llm_gateway.chat(
                         model="gpt-4",
+                        api_key=api_key,
                         messages=[
                             {"role": "system", "content": "You are a helpful sales assistant focused on expansion deals. You only use provided data."},
                             {"role": "user", "content": context}
@@ -355,7 +352,7 @@ Provide a helpful answer based strictly on the data.
                         temperature=0.2
                     )
                     
-                    assistant_message = chat_response.choices[0].message.content
+                    assistant_message = chat_response.content
                     st.markdown(assistant_message)
                     st.session_state.messages.append({"role": "assistant", "content": assistant_message})
                     
@@ -366,6 +363,58 @@ Provide a helpful answer based strictly on the data.
         st.session_state.messages = []
         st.rerun()
 
+# Batch ranking - score a whole account list in one call
+st.markdown("---")
+with st.expander("📂 Rank Accounts by Expansion Potential (CSV)"):
+    st.markdown(
+        "Upload one row per account with columns named like the metrics above "
+        f"(`{'`, `'.join(upsell_scoring.INPUT_COLUMNS)}`, plus an optional `account_id`). "
+        "Percentages are 0-100; blank cells count as not provided."
+    )
+    uploaded_accounts = st.file_uploader("Accounts CSV", type=["csv"])
+    col_r1, col_r2 = st.columns(2)
+    with col_r1:
+        rank_by = st.radio(
+            "Rank by", ["score", "arr"], horizontal=True,
+            format_func=lambda by: "Expansion score" if by == "score" else "Score-weighted ARR"
+        )
+    with col_r2:
+        top_n = st.number_input("Accounts to show", min_value=1, value=25)
+
+    if uploaded_accounts is not None and st.button("📊 Rank Accounts", type="primary"):
+        try:
+            header, columns, scores, invalid = upsell_scoring.read_csv(
+                io.TextIOWrapper(uploaded_accounts, encoding="utf-8-sig", newline="")
+            )
+            order = upsell_scoring.rank(scores, by=rank_by)
+
+            st.success(f"✅ Ranked {len(order):,} accounts")
+            if invalid:
+                st.warning(f"⚠️ {invalid:,} unparseable cells were treated as not provided")
+            ids = columns.get("account_id")
+            st.dataframe([
+                {
+                    "Rank": position,
+                    "Account": ids[row] if ids else f"Row {row + 1}",
+                    "Expansion Score": int(scores.expansion_score[row]),
+                    "Potential": str(scores.expansion_potential[row]),
+                    "Current ARR": None if scores.current_arr[row] != scores.current_arr[row] else f"${scores.current_arr[row]:,.0f}",
+                    "Key Signals": "; ".join(upsell_scoring.key_signals(scores, row))
+                }
+                for position, row in enumerate(order[:top_n], start=1)
+            ], use_container_width=True, hide_index=True)
+
+            ranked_csv = io.StringIO()
+            csv.writer(ranked_csv).writerows(upsell_scoring.ranked_rows(header, columns, scores, order))
+            st.download_button(
+                label="📥 Download Ranked Accounts",
+                data=ranked_csv.getvalue(),
+                file_name=f"upsell_ranking_{datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv"
+            )
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Deterministic upsell propensity scoring for the upsell app (upsell_app.py).
+
+This is the expansion score that used to be described to GPT-4 in the
+upsell system prompt, evaluated locally with NumPy:
+
+- Each signal earns points from its threshold bands: utilization up to 30,
+  usage growth 25, engagement & success 20, growth signals 15 and
+  readiness 10. The five categories add up to the 0-100 expansion_score.
+- A category's signals are added up and capped at its maximum. When the cap
+  applies, the signal contributions are scaled down with it, so the
+  per-signal contributions always add up to the score.
+- Missing signals earn nothing. coverage is the share of signals provided.
+- The score maps to expansion_potential: 80 and above is Very High, 60-79
+  High, 40-59 Medium, below 40 Low.
+
+score_columns() scores column arrays, so thousands of accounts are scored
+in one call, and rank() orders them by expansion potential. read_csv()
+streams an accounts CSV through churn_batch's chunked reader and scores it
+chunk by chunk.
+score_account() applies the same bands to one account in plain Python.
+current_arr is not scored; it breaks ties and weights ARR-based ranking.
+
+    python upsell_scoring.py accounts.csv --top 20
+    python upsell_scoring.py accounts.csv --by arr --output ranked.csv
+"""
+
+import csv
+import math
+from collections import namedtuple
+
+import numpy as np
+
+import churn_batch
+import scoring_bands
+
+# (key, label, max points)
+CATEGORIES = (
+    ("utilization", "Utilization", 30),
+    ("usage_growth", "Usage growth", 25),
+    ("engagement", "Engagement & success", 20),
+    ("growth", "Growth signals", 15),
+    ("readiness", "Readiness", 10),
+)
+CATEGORY_KEYS = tuple(key for key, _, _ in CATEGORIES)
+CATEGORY_MAX = np.array([points for _, _, points in CATEGORIES], dtype=float)
+
+# Lowest score for each potential, highest first
+POTENTIAL_BANDS = ((80, "Very High"), (60, "High"), (40, "Medium"), (0, "Low"))
+
+KEY_SIGNAL_COUNT = 3
+
+# metric -> (category, label, bands [(op, threshold, points)] checked in order (else 0), text)
+SIGNALS = {
+    "utilization_rate_percent": ("utilization", "License utilization",
+                                 [('>', 90, 30), ('>=', 70, 20), ('>=', 50, 10), ('>=', 0, 5)],
+                                 lambda v: f"License utilization is {v:.0f}%."),
+    "usage_30d_change_percent": ("usage_growth", "Usage growth (30d)",
+                                 [('>', 30, 25), ('>=', 15, 20), ('>=', 5, 10), ('>', -math.inf, 5)],
+                                 lambda v: f"Usage {'grew' if v >= 0 else 'dropped'} {abs(v):.0f}% in the last 30 days."),
+    "nps_score": ("engagement", "NPS", [('>', 40, 7), ('>', 0, 3)],
+                  lambda v: f"NPS is {v:.0f}."),
+    "csat_score": ("engagement", "CSAT", [('>', 4, 6), ('>=', 4, 3)],
+                   lambda v: f"CSAT is {v:.1f} out of 5."),
+    "success_milestone_hits_90d": ("engagement", "Success milestones (90d)", [('>=', 3, 7), ('>=', 1, 3)],
+                                   lambda v: f"{v:.0f} success milestones hit in the last 90 days."),
+    "active_champions": ("engagement", "Active champions", [('>=', 2, 4), ('>=', 1, 2)],
+                         lambda v: f"{v:.0f} active champions."),
+    "feature_adoption_score_percent": ("engagement", "Feature adoption", [('>', 60, 4), ('>=', 40, 2)],
+                                       lambda v: f"Feature adoption is {v:.0f}%."),
+    "team_size_growth_6mo_percent": ("growth", "Team growth (6mo)", [('>', 15, 15), ('>', 5, 7)],
+                                     lambda v: f"The team grew {v:.0f}% in the last 6 months."),
+    "exec_engagement_score": ("growth", "Executive engagement", [('>=', 7, 10), ('>=', 4, 5)],
+                              lambda v: f"Executive engagement is {v:.0f}/10."),
+    "api_integration_depth": ("growth", "API integration depth", [('>=', 7, 5), ('>=', 4, 2)],
+                              lambda v: f"API integration depth is {v:.0f}/10."),
+    "budget_cycle_proximity_days": ("readiness", "Budget cycle proximity", [('<', 90, 10)],
+                                    lambda v: f"The next budget cycle is {v:.0f} days away."),
+    "training_sessions_attended_90d": ("readiness", "Training attended (90d)", [('>=', 3, 5), ('>=', 1, 3)],
+                                       lambda v: f"{v:.0f} training sessions attended in the last 90 days."),
+    "recent_support_interactions_30d": ("readiness", "Support interactions (30d)", [('>=', 1, 2)],
+                                        lambda v: f"{v:.0f} support interactions in the last 30 days."),
+}
+SIGNAL_NAMES = tuple(SIGNALS)
+SIGNAL_CATEGORY = np.array([CATEGORY_KEYS.index(SIGNALS[name][0]) for name in SIGNAL_NAMES])
+INPUT_COLUMNS = SIGNAL_NAMES + ("active_users", "licensed_seats", "current_arr")
+UTILIZATION_INDEX = SIGNAL_NAMES.index("utilization_rate_percent")
+
+# Batch results: arrays with one row per account
+UpsellScores = namedtuple('UpsellScores', [
+    'expansion_score',      # int array, 0-100
+    'expansion_potential',  # str array: Low / Medium / High / Very High
+    'coverage',             # share of signals provided, 0-1
+    'category_points',      # (n, 5) float array in CATEGORIES order
+    'signal_values',        # (n, 13) float array in SIGNAL_NAMES order, NaN where missing
+    'contributions',        # (n, 13) points each signal adds to the score
+    'current_arr',          # float array, NaN where missing
+])
+
+
+def _signal_points(name, x):
+    # Vectorized band lookup; missing (NaN) earns nothing
+    return scoring_bands.band_values(SIGNALS[name][2], x, 0.0, 0.0)
+
+
+def _signal_point(name, v):
+    # Scalar band lookup for score_account
+    return float(scoring_bands.band_value(SIGNALS[name][2], v, 0.0))
+
+
+def _potential(score):
+    for lowest, potential in POTENTIAL_BANDS:
+        if score >= lowest:
+            return potential
+
+
+def score_columns(columns):
+    """
+    Score many accounts at once.
+
+    Args:
+        columns: {metric: sequence of numbers}, all the same length; NaN or a
+                 missing column means "not provided". Percentages are 0-100;
+                 utilization_rate_percent falls back to active_users /
+                 licensed_seats where it is missing.
+
+    Returns:
+        UpsellScores
+    """
+    n = len(next(iter(columns.values()))) if columns else 0
+    utilization = scoring_bands.column(columns, "utilization_rate_percent", n)
+    active, seats = scoring_bands.column(columns, "active_users", n), scoring_bands.column(columns, "licensed_seats", n)
+    derived = np.isnan(utilization) & ~np.isnan(active) & ~np.isnan(seats)
+    utilization = np.where(derived, 100 * active / np.maximum(seats, 1), utilization)
+
+    values = np.empty((n, len(SIGNAL_NAMES)))
+    raw = np.empty_like(values)
+    for i, name in enumerate(SIGNAL_NAMES):
+        values[:, i] = utilization if i == UTILIZATION_INDEX else scoring_bands.column(columns, name, n)
+        raw[:, i] = _signal_points(name, values[:, i])
+
+    # Cap each category and scale its signals' points with it
+    raw_totals = np.zeros((n, len(CATEGORIES)))
+    for c in range(len(CATEGORIES)):
+        raw_totals[:, c] = raw[:, SIGNAL_CATEGORY == c].sum(axis=1)
+    category_points = np.minimum(raw_totals, CATEGORY_MAX)
+    scale = np.where(raw_totals > 0, category_points / np.maximum(raw_totals, 1e-9), 0.0)
+    contributions = raw * scale[:, SIGNAL_CATEGORY]
+
+    expansion_score = np.clip(np.rint(category_points.sum(axis=1)), 0, 100).astype(int)
+    potential = np.select([expansion_score >= lowest for lowest, _ in POTENTIAL_BANDS],
+                          [name for _, name in POTENTIAL_BANDS], "Low")
+    coverage = (~np.isnan(values)).mean(axis=1)
+
+    return UpsellScores(expansion_score, potential, coverage, category_points, values, contributions,
+                        scoring_bands.column(columns, "current_arr", n))
+
+
+def rank(scores, by="score", top=None):
+    """
+    Row indexes ordered by expansion potential, best first.
+
+    Args:
+        by: "score" - expansion_score, ties broken by current_arr; or
+            "arr" - expansion_score / 100 * current_arr (expansion-weighted ARR)
+        top: Only the first `top` rows
+    """
+    arr = np.nan_to_num(scores.current_arr)
+    if by == "arr":
+        order = np.lexsort((-scores.expansion_score, -(scores.expansion_score / 100.0 * arr)))
+    elif by == "score":
+        order = np.lexsort((-arr, -scores.expansion_score))
+    else:
+        raise ValueError(f"Unknown ranking: {by}")
+    return order[:top] if top else order
+
+
+def _key_signals(values, contributions):
+    # The signals adding the most points, as sentences
+    order = sorted((i for i in range(len(SIGNAL_NAMES)) if contributions[i] > 0),
+                   key=lambda i: -contributions[i])[:KEY_SIGNAL_COUNT]
+    return [SIGNALS[SIGNAL_NAMES[i]][3](values[i]) for i in order]
+
+
+def _result(expansion_score, expansion_potential, coverage, category_points, values, contributions):
+    return {
+        'expansion_score': int(expansion_score),
+        'expansion_potential': str(expansion_potential),
+        'coverage': float(coverage),
+        'category_points': {key: round(float(p), 1) for key, p in zip(CATEGORY_KEYS, category_points)},
+        'contributions': {
+            name: round(float(p), 1)
+            for name, v, p in zip(SIGNAL_NAMES, values, contributions) if not math.isnan(v)
+        },
+        'key_signals': _key_signals(values, contributions),
+    }
+
+
+def key_signals(scores, row):
+    """The strongest signal sentences for one account of an UpsellScores batch"""
+    return _key_signals(scores.signal_values[row], scores.contributions[row])
+
+
+def result_for(scores, row):
+    """One account of an UpsellScores batch as a plain dict (same shape as score_account)"""
+    return _result(scores.expansion_score[row], scores.expansion_potential[row], scores.coverage[row],
+                   scores.category_points[row], scores.signal_values[row], scores.contributions[row])
+
+
+def score_account(metrics):
+    """
+    Score a single account with the same bands and caps as score_columns.
+
+    Args:
+        metrics: {metric: value}; None or absent metrics are not provided
+
+    Returns:
+        {'expansion_score', 'expansion_potential', 'coverage', 'category_points',
+         'contributions' (provided signals only), 'key_signals'}
+    """
+    def value(name):
+        v = metrics.get(name)
+        return math.nan if v is None else float(v)
+
+    values = [value(name) for name in SIGNAL_NAMES]
+    active, seats = value("active_users"), value("licensed_seats")
+    if math.isnan(values[UTILIZATION_INDEX]) and not math.isnan(active) and not math.isnan(seats):
+        values[UTILIZATION_INDEX] = 100 * active / max(seats, 1)
+    raw = [0.0 if math.isnan(v) else _signal_point(name, v) for name, v in zip(SIGNAL_NAMES, values)]
+
+    raw_totals = [0.0] * len(CATEGORIES)
+    for points, c in zip(raw, SIGNAL_CATEGORY):
+        raw_totals[c] += points
+    category_points = [min(total, cap) for total, (_, _, cap) in zip(raw_totals, CATEGORIES)]
+    scale = [p / t if t > 0 else 0.0 for p, t in zip(category_points, raw_totals)]
+    contributions = [points * scale[c] for points, c in zip(raw, SIGNAL_CATEGORY)]
+
+    expansion_score = min(max(round(sum(category_points)), 0), 100)  # half-to-even, like np.rint
+    coverage = sum(not math.isnan(v) for v in values) / len(values)
+    return _result(expansion_score, _potential(expansion_score), coverage, category_points, values, contributions)
+
+
+def read_csv(stream, keep=None, chunk_rows=churn_batch.CHUNK_ROWS):
+    """
+    Read an accounts CSV (text stream) in chunks, scoring each chunk as it is read.
+
+    Only the scoring inputs are parsed; blank or unparseable cells count as
+    not provided, and blank lines are skipped.
+
+    Args:
+        keep: Column names whose text cells are returned (None: every column)
+
+    Returns:
+        (header, {kept column: list of str}, UpsellScores for every row, unparseable cell count)
+    """
+    header, kept, parts, invalid = [], {}, [], 0
+    for header, columns, n in churn_batch.csv_chunks(stream, chunk_rows):
+        metrics = {}
+        for name, cells in zip(header, columns):
+            if name in INPUT_COLUMNS:
+                metrics[name], bad = churn_batch.to_float(cells)
+                invalid += bad
+            if keep is None or name in keep:
+                kept.setdefault(name, []).extend(cells)
+        parts.append(score_columns(metrics or {SIGNAL_NAMES[0]: np.full(n, np.nan)}))
+    if not parts:
+        return header, kept, score_columns({}), 0
+    return header, kept, UpsellScores(*(np.concatenate(field) for field in zip(*parts))), invalid
+
+
+def ranked_rows(header, columns, scores, order):
+    """CSV rows (with header) for the accounts in order: rank, the input columns, then the scores"""
+    labels = [f"points_{name}" for name in SIGNAL_NAMES]
+    yield ["rank"] + header + ["expansion_score", "expansion_potential", "coverage"] + labels
+    for position, row in enumerate(order, start=1):
+        yield ([position] + [columns[name][row] for name in header]
+               + [int(scores.expansion_score[row]), str(scores.expansion_potential[row]),
+                  round(float(scores.coverage[row]), 3)]
+               + [round(float(p), 1) for p in scores.contributions[row]])
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="Score and rank accounts by upsell propensity")
+    parser.add_argument("input", help="Accounts CSV, columns named as in INPUT_COLUMNS")
+    parser.add_argument("--by", choices=["score", "arr"], default="score", help="Ranking: score, or score-weighted ARR")
+    parser.add_argument("--top", type=int, default=20, help="Accounts to print")
+    parser.add_argument("--output", help="Write every account, ranked, to this CSV")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.input, newline="", encoding="utf-8-sig") as f:
+        # The input text is only kept when it is written back out
+        header, columns, scores, invalid = read_csv(f, keep=None if args.output else {"account_id"})
+    order = rank(scores, by=args.by)
+    elapsed = time.perf_counter() - start
+    print(f"Read, scored and ranked {len(order):,} accounts in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    if invalid:
+        print(f"{invalid:,} unparseable cells treated as not provided", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            csv.writer(f).writerows(ranked_rows(header, columns, scores, order))
+    ids = columns.get("account_id")
+    for position, row in enumerate(order[:args.top], start=1):
+        account = ids[row] if ids else f"row {row + 1}"
+        print(f"{position:>4}. {account:<16} {scores.expansion_score[row]:>3} "
+              f"{scores.expansion_potential[row]:<9} {'; '.join(key_signals(scores, row))}")
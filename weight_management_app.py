@@ -1,22 +1,19 @@
 import streamlit as st
 from datetime import datetime, timedelta
 import json
-from openai import OpenAI
+import llm_gateway
 
 st.set_page_config(page_title="💪 FitLife - Weight Management", layout="wide", page_icon="💪")
 
-# Initialize OpenAI client
-@st.cache_resource
-def get_openai_client():
+# OpenAI access goes through the shared gateway (pooled client, response cache)
+def get_openai_key():
     try:
-        api_key = st.secrets.get("OPENAI_API_KEY", "")
-        if api_key:
-            return OpenAI(api_key=api_key)
-        return None
+        return st.secrets.get("OPENAI_API_KEY", "") or None
     except:
         return None
 
-client = get_openai_client()
+api_key = get_openai_key()
+client = llm_gateway.get_client(api_key) if api_key else None
 
 # Initialize session state
 if 'user_profile' not in st.session_state:
@@ -58,8 +55,10 @@ def generate_ai_meal_plan(profile):
         Format the response as a structured weekly plan.
         """
         
-        response = client.chat.completions.create(
+        response = llm_gateway.chat(
             model="gpt-4",
+            api_key=api_key,
+            cache=False,  # creative output: a fresh generation on every click
             messages=[
                 {"role": "system", "content": "You are a professional nutritionist and dietitian specializing in personalized meal planning for weight management."},
                 {"role": "user", "content": prompt}
@@ -68,7 +67,7 @@ def generate_ai_meal_plan(profile):
             max_tokens=2000
         )
         
-        return response.choices[0].message.content
+        return response.content
     except Exception as e:
         st.error(f"Error generating AI meal plan: {str(e)}")
         return None
@@ -108,8 +107,10 @@ def generate_ai_tips(profile, progress_logs):
         Format as a numbered list with clear, concise advice.
         """
         
-        response = client.chat.completions.create(
+        response = llm_gateway.chat(
             model="gpt-4",
+            api_key=api_key,
+            cache=False,  # creative output: a fresh generation on every click
             messages=[
                 {"role": "system", "content": "You are a motivating fitness coach and nutritionist who provides personalized, practical advice."},
                 {"role": "user", "content": prompt}
@@ -118,7 +119,7 @@ def generate_ai_tips(profile, progress_logs):
             max_tokens=800
         )
         
-        return response.choices[0].message.content
+        return response.content
     except Exception as e:
         st.error(f"Error generating AI tips: {str(e)}")
         return None
@@ -154,8 +155,10 @@ def analyze_progress_with_ai(profile, progress_logs):
         Keep it encouraging and constructive!
         """
         
-        response = client.chat.completions.create(
+        response = llm_gateway.chat(
             model="gpt-4",
+            api_key=api_key,
+            cache=False,  # creative output: a fresh generation on every click
             messages=[
                 {"role": "system", "content": "You are an encouraging fitness coach analyzing progress data to provide constructive feedback."},
                 {"role": "user", "content": prompt}
@@ -164,7 +167,7 @@ def analyze_progress_with_ai(profile, progress_logs):
             max_tokens=500
         )
         
-        return response.choices[0].message.content
+        return response.content
     except Exception as e:
         st.error(f"Error analyzing progress: {str(e)}")
         return None
@@ -192,8 +195,10 @@ def get_ai_recipe(meal_type, diet_type, calories):
         5. Prep time and cooking time
         """
         
-        response = client.chat.completions.create(
+        response = llm_gateway.chat(
             model="gpt-4",
+            api_key=api_key,
+            cache=False,  # creative output: a fresh generation on every click
             messages=[
                 {"role": "system", "content": "You are a professional chef and nutritionist who creates healthy, delicious recipes."},
                 {"role": "user", "content": prompt}
@@ -202,7 +207,7 @@ def get_ai_recipe(meal_type, diet_type, calories):
             max_tokens=800
         )
         
-        return response.choices[0].message.content
+        return response.content
     except Exception as e:
         st.error(f"Error getting recipe: {str(e)}")
         return None
@@ -630,8 +635,10 @@ elif page == "🤖 AI Coach":
             if user_question:
                 with st.spinner("🤖 Coach is thinking..."):
                     try:
-                        response = client.chat.completions.create(
+                        response = llm_gateway.chat(
                             model="gpt-4",
+                            api_key=api_key,
+                            cache=False,  # creative output: a fresh generation on every click
                             messages=[
                                 {"role": "system", "content": f"You are a personal fitness coach helping someone with this profile: Goal: {profile['goal']}, Current Weight: {profile['current_weight']}kg, Target: {profile['target_weight']}kg, Diet: {profile['diet_type']}. Provide helpful, motivating, and practical advice."},
                                 {"role": "user", "content": user_question}
@@ -640,7 +647,7 @@ elif page == "🤖 AI Coach":
                             max_tokens=800
                         )
                         
-                        answer = response.choices[0].message.content
+                        answer = response.content
                         st.success("🎓 Coach's Response:")
                         st.markdown(answer)
                     except Exception as e:
@@ -679,8 +686,10 @@ elif page == "🤖 AI Coach":
                     Include: Name, Ingredients, Instructions, Nutrition, Time
                     """
                     
-                    response = client.chat.completions.create(
+                    response = llm_gateway.chat(
                         model="gpt-4",
+                        api_key=api_key,
+                        cache=False,  # creative output: a fresh generation on every click
                         messages=[
                             {"role": "system", "content": "You are a professional chef and nutritionist creating healthy recipes."},
                             {"role": "user", "content": prompt}
@@ -689,7 +698,7 @@ elif page == "🤖 AI Coach":
                         max_tokens=1000
                     )
                     
-                    recipe = response.choices[0].message.content
+                    recipe = response.content
                     st.success("✅ Recipe Generated!")
                     st.markdown(recipe)
                     
@@ -745,8 +754,10 @@ elif page == "🤖 AI Coach":
                     - Include an emoji or two
                     """
                     
-                    response = client.chat.completions.create(
+                    response = llm_gateway.chat(
                         model="gpt-4",
+                        api_key=api_key,
+                        cache=False,  # a new message on every click
                         messages=[
                             {"role": "system", "content": "You are a motivational fitness coach providing daily encouragement."},
                             {"role": "user", "content": prompt}
@@ -755,7 +766,7 @@ elif page == "🤖 AI Coach":
                         max_tokens=200
                     )
                     
-                    motivation = response.choices[0].message.content
+                    motivation = response.content
                     st.success(motivation)
                     st.balloons()
                     